@@ -0,0 +1,42 @@
+from typing import Optional
+from fastapi import Request
+from services.maps_service import GoogleMapsService
+from services.openai_service import OpenAIService
+from services.photo_service import PhotoService
+from services.prefetch import Prefetcher
+from services.recommendation_cache import RecommendationCache
+from services.registry import ServiceRegistry
+from services.session_store import SessionStore
+from services.spatial_index import SpatialIndex
+
+
+def get_services(request: Request) -> ServiceRegistry:
+    return request.app.state.services
+
+
+def get_openai_service(request: Request) -> OpenAIService:
+    return request.app.state.services.openai
+
+
+def get_maps_service(request: Request) -> GoogleMapsService:
+    return request.app.state.services.maps
+
+
+def get_photo_service(request: Request) -> PhotoService:
+    return request.app.state.services.photos
+
+
+def get_recommendation_cache(request: Request) -> RecommendationCache:
+    return request.app.state.services.recommendations
+
+
+def get_spatial_index(request: Request) -> SpatialIndex:
+    return request.app.state.services.places
+
+
+def get_session_store(request: Request) -> SessionStore:
+    return request.app.state.services.sessions
+
+
+def get_prefetcher(request: Request) -> Optional[Prefetcher]:
+    return request.app.state.services.prefetcher
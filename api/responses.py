@@ -0,0 +1,33 @@
+from typing import Any, Optional
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+class ModelResponse(Response):
+    """JSON response for models the route has already built and validated.
+
+    Returning a Response makes FastAPI skip the `response_model` pass, which
+    would validate the model again and walk it with jsonable_encoder before
+    encoding. Here the model is dumped once and encoded with orjson. Keep
+    `response_model` on the route for the OpenAPI schema.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            content = content.model_dump()
+        elif isinstance(content, list):
+            content = [item.model_dump() if isinstance(item, BaseModel) else item for item in content]
+        return orjson.dumps(content)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names `etag` (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
@@ -0,0 +1,38 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from config import settings
+from api.dependencies import get_openai_service, get_prefetcher
+from models.schemas import ModelRoutesResponse, PrefetchStatusResponse
+from services.openai_service import OpenAIService
+from services.prefetch import Prefetcher
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    if settings.admin_token and not hmac.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/admin/prefetch", response_model=PrefetchStatusResponse, dependencies=[Depends(require_admin)])
+async def get_prefetch_status(prefetcher: Optional[Prefetcher] = Depends(get_prefetcher)):
+    """Progress of the background prefetcher and the share of cache hits it supplies"""
+    if prefetcher is None:
+        return PrefetchStatusResponse(enabled=False)
+    return PrefetchStatusResponse(enabled=True, **prefetcher.status())
+
+
+@router.get("/admin/model-routes", response_model=ModelRoutesResponse, dependencies=[Depends(require_admin)])
+async def get_model_routes(openai_service: OpenAIService = Depends(get_openai_service)):
+    """Requests, latency and token usage per model route since startup"""
+    model_router = openai_service.router
+    return ModelRoutesResponse(
+        enabled=model_router.enabled,
+        models={
+            "quick": model_router.quick_model,
+            "standard": model_router.default_model,
+            "detailed": model_router.detailed_model
+        },
+        routes=model_router.stats()
+    )
@@ -1,30 +1,42 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
-from models.schemas import ChatRequest, ChatResponse, ErrorResponse
-from services.openai_service import OpenAIService
-from services.maps_service import GoogleMapsService
+import math
+from typing import AsyncIterator, List, Tuple
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from config import settings
+from models.schemas import (
+    ChatRequest, ChatResponse, ChatStreamEvent, ChatBatchRequest, ChatBatchItem, ChatBatchResponse,
+    ChatSessionResponse, ErrorResponse, Location
+)
+from api.dependencies import get_services, get_session_store
+from api.responses import ModelResponse
+from services import metrics
+from services.cache import normalize_key
+from services.registry import ServiceRegistry
+from services.resilience import UpstreamUnavailable
+from services.session_store import ConversationSession, SessionStore, estimate_tokens
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-openai_service = OpenAIService()
-maps_service = GoogleMapsService()
-
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(
+    request: ChatRequest,
+    services: ServiceRegistry = Depends(get_services)
+):
+    maps_service = services.maps
     try:
         logger.info(f"Chat request: {request.message[:100]}...")
         
         # Get AI recommendations
-        chat_response, location_data = await openai_service.get_travel_recommendations(
-            user_message=request.message,
-            city=request.city,
-            context=request.context
-        )
+        session, history = await _start_turn(request, services)
+        chat_response, location_data, cache_status = await _get_recommendations(request, services, history)
         
         if not chat_response:
             raise HTTPException(status_code=500, detail="Failed to generate AI response")
+        services.sessions.record_turn(session, request.message, chat_response, location_data, request.city)
         
         # Geocode locations if any were provided
         locations = []
@@ -32,25 +44,257 @@ async def chat_endpoint(request: ChatRequest):
         
         if location_data:
             try:
-                locations = await maps_service.geocode_locations(location_data)
+                locations = await maps_service.geocode_locations(location_data, request.include_photos)
                 if locations:
                     map_bounds = maps_service.calculate_map_bounds(locations)
             except Exception as e:
                 logger.warning(f"Geocoding failed: {str(e)}")
                 # Continue with chat response even if geocoding fails
         
-        return ChatResponse(
+        return ModelResponse(ChatResponse(
             success=True,
             chat_response=chat_response,
             locations=locations,
-            map_bounds=map_bounds
-        )
+            map_bounds=map_bounds,
+            cache_status=cache_status,
+            session_id=session.id
+        ), headers={"X-Cache": cache_status})
         
     except HTTPException:
         raise
+    except UpstreamUnavailable as e:
+        logger.warning(f"Chat endpoint upstream unavailable: {str(e)}")
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after is not None else None
+        raise HTTPException(
+            status_code=503,
+            detail="AI service temporarily unavailable",
+            headers=headers
+        )
     except Exception as e:
         logger.error(f"Chat endpoint error: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="Unable to process request"
-        )
\ No newline at end of file
+        )
+
+
+async def _start_turn(request: ChatRequest, services: ServiceRegistry) -> Tuple[ConversationSession, List[dict]]:
+    """The request's conversation session and its history, compacted to the prompt token budget"""
+    session = await services.sessions.get_or_create(request.session_id, request.city)
+    history = services.sessions.prompt_messages(session, settings.session_history_tokens)
+    metrics.chat_history_tokens.observe(sum(estimate_tokens(message["content"]) for message in history))
+    return session, history
+
+
+async def _get_recommendations(
+    request: ChatRequest,
+    services: ServiceRegistry,
+    history: List[dict]
+) -> Tuple[str, List[dict], str]:
+    # Replies that depend on earlier turns of a conversation aren't reusable elsewhere
+    if settings.recommendation_cache_enabled and not history:
+        return await services.recommendations.get_travel_recommendations(
+            user_message=request.message,
+            city=request.city,
+            context=request.context
+        )
+    
+    chat_response, location_data = await services.openai.get_travel_recommendations(
+        user_message=request.message,
+        city=request.city,
+        context=request.context,
+        history=history
+    )
+    return chat_response, location_data, "bypass"
+
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch_endpoint(request: ChatBatchRequest, services: ServiceRegistry = Depends(get_services)):
+    """Answer several chat requests (e.g. one per city) with one shared geocoding pass"""
+    maps_service = services.maps
+    logger.info(f"Chat batch request: {len(request.requests)} items")
+    semaphore = asyncio.Semaphore(settings.chat_batch_concurrency)
+    
+    async def recommend(item: ChatRequest):
+        session, history = await _start_turn(item, services)
+        async with semaphore:
+            return (*await _get_recommendations(item, services, history), session)
+    
+    outcomes = await asyncio.gather(
+        *(recommend(item) for item in request.requests),
+        return_exceptions=True
+    )
+    
+    # Geocode every distinct location across the batch once
+    unique = {}
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            continue
+        for loc_data in outcome[1]:
+            unique.setdefault(normalize_key(loc_data.get('name'), loc_data.get('address')), loc_data)
+    
+    keys = list(unique)
+    geocoded = {}
+    include_photos = any(item.include_photos for item in request.requests)
+    if keys:
+        results = await asyncio.gather(
+            *(maps_service.geocode_location(unique[key], include_photos) for key in keys),
+            return_exceptions=True
+        )
+        for key, result in zip(keys, results):
+            # Drop only the places that failed (out of budget, cancelled, upstream error)
+            if isinstance(result, BaseException):
+                logger.warning(
+                    f"Failed to geocode location {unique[key].get('name', 'Unknown')}: {str(result) or type(result).__name__}"
+                )
+            elif result:
+                geocoded[key] = result
+    
+    results = []
+    all_locations = []
+    for item, outcome in zip(request.requests, outcomes):
+        if isinstance(outcome, Exception) or not outcome[0]:
+            logger.error(f"Chat batch item error: {str(outcome)}")
+            results.append(ChatBatchItem(success=False, error="Unable to process request"))
+            continue
+        
+        chat_response, location_data, cache_status, session = outcome
+        services.sessions.record_turn(session, item.message, chat_response, location_data, item.city)
+        locations = []
+        for loc_data in location_data:
+            location = geocoded.get(normalize_key(loc_data.get('name'), loc_data.get('address')))
+            if location:
+                # Keep this item's own wording for a place shared with other items
+                locations.append(location.model_copy(update={
+                    'name': loc_data['name'],
+                    'description': loc_data['description'],
+                    'category': loc_data['category'],
+                    'photo_url': location.photo_url if item.include_photos else None
+                }))
+        all_locations.extend(locations)
+        results.append(ChatBatchItem(
+            success=True,
+            chat_response=chat_response,
+            locations=locations,
+            map_bounds=maps_service.calculate_map_bounds(locations),
+            cache_status=cache_status,
+            session_id=session.id
+        ))
+    
+    return ModelResponse(ChatBatchResponse(
+        success=any(result.success for result in results),
+        results=results,
+        map_bounds=maps_service.calculate_map_bounds(all_locations)
+    ))
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, services: ServiceRegistry = Depends(get_services)):
+    """Stream the chat response as NDJSON events while locations are geocoded"""
+    logger.info(f"Chat stream request: {request.message[:100]}...")
+    return StreamingResponse(
+        _chat_stream_events(request, services),
+        media_type="application/x-ndjson"
+    )
+
+
+async def _chat_stream_events(request: ChatRequest, services: ServiceRegistry) -> AsyncIterator[str]:
+    maps_service = services.maps
+    queue: asyncio.Queue = asyncio.Queue()
+    locations: List[Location] = []
+    suggested: List[dict] = []
+    tasks = set()
+    session, history = await _start_turn(request, services)
+    
+    async def geocode(loc_data: dict):
+        try:
+            location = await maps_service.geocode_location(loc_data, request.include_photos)
+        except Exception as e:
+            logger.warning(f"Geocoding failed: {str(e)}")
+            location = None
+        await queue.put(("location", location))
+    
+    async def produce():
+        try:
+            async for event_type, payload in services.openai.stream_travel_recommendations(
+                user_message=request.message,
+                city=request.city,
+                context=request.context,
+                history=history
+            ):
+                if event_type == "location":
+                    # Start geocoding as soon as the location object is complete
+                    suggested.append(payload)
+                    tasks.add(asyncio.create_task(geocode(payload)))
+                else:
+                    await queue.put((event_type, payload))
+        except Exception as e:
+            logger.error(f"Chat stream error: {str(e)}")
+            await queue.put(("error", "Unable to process request"))
+    
+    producer = asyncio.create_task(produce())
+    chat_response = None
+    resolved = 0
+    try:
+        while True:
+            event_type, payload = await queue.get()
+            
+            if event_type == "text":
+                yield ChatStreamEvent(type="text", delta=payload).model_dump_json(exclude_none=True) + "\n"
+            elif event_type == "location":
+                resolved += 1
+                if payload:
+                    locations.append(payload)
+                    yield ChatStreamEvent(
+                        type="location",
+                        location=payload,
+                        map_bounds=maps_service.calculate_map_bounds(locations)
+                    ).model_dump_json(exclude_none=True) + "\n"
+            elif event_type == "error":
+                yield ChatStreamEvent(type="error", error=payload).model_dump_json(exclude_none=True) + "\n"
+                return
+            elif event_type == "done":
+                chat_response = payload
+            
+            # The producer has finished once "done" arrives, so no more tasks are added
+            if chat_response is not None and resolved == len(tasks):
+                break
+        
+        if chat_response:
+            services.sessions.record_turn(session, request.message, chat_response, suggested, request.city)
+        yield ChatStreamEvent(
+            type="done",
+            chat_response=chat_response,
+            locations=locations,
+            map_bounds=maps_service.calculate_map_bounds(locations),
+            session_id=session.id
+        ).model_dump_json(exclude_none=True) + "\n"
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+@router.get("/chat/session/{session_id}", response_model=ChatSessionResponse)
+async def get_chat_session(session_id: str, sessions: SessionStore = Depends(get_session_store)):
+    """What the server remembers of a conversation and what its next prompt would carry"""
+    session = await sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    history = sessions.prompt_messages(session, settings.session_history_tokens)
+    return ChatSessionResponse(
+        session_id=session.id,
+        city=session.city,
+        turns=len(session.summary) + len(session.turns),
+        summary=session.summary,
+        recommended_locations=list(session.locations.values()),
+        history_tokens=sum(estimate_tokens(message["content"]) for message in history)
+    )
+
+
+@router.delete("/chat/session/{session_id}")
+async def delete_chat_session(session_id: str, sessions: SessionStore = Depends(get_session_store)):
+    """Forget a conversation; the next message with this id starts afresh"""
+    if not await sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"success": True, "message": "Session deleted"}
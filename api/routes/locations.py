@@ -0,0 +1,79 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from models.schemas import LocationCategory, LocationsResponse, NearbyLocation, NearbyLocationsResponse
+from api.dependencies import get_spatial_index
+from services.cache import normalize_key
+from services.spatial_index import SpatialIndex
+from services.trip_service import trip_service, ANONYMOUS_USER
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/locations/nearby", response_model=NearbyLocationsResponse)
+async def nearby_locations(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, le=100000, description="Search radius in metres"),
+    category: Optional[LocationCategory] = None,
+    limit: int = Query(50, ge=1, le=500),
+    index: SpatialIndex = Depends(get_spatial_index),
+    user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")
+):
+    """Known locations within `radius` metres of a point, nearest first"""
+    saved_places = await _saved_places(user_id)
+    matches = _unique(
+        index.nearby(lat, lng, radius, category=category, limit=limit)
+        + saved_places.nearby(lat, lng, radius, category=category, limit=limit),
+        key=lambda match: match[0]
+    )
+    matches = sorted(matches, key=lambda match: match[1])[:limit]
+    return NearbyLocationsResponse(
+        success=True,
+        locations=[NearbyLocation(location=location, distance_m=round(distance, 1)) for location, distance in matches]
+    )
+
+
+@router.get("/locations/within", response_model=LocationsResponse)
+async def locations_within_bounds(
+    north: float = Query(..., ge=-90, le=90),
+    south: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    west: float = Query(..., ge=-180, le=180),
+    category: Optional[LocationCategory] = None,
+    limit: int = Query(500, ge=1, le=2000),
+    index: SpatialIndex = Depends(get_spatial_index),
+    user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")
+):
+    """Known locations inside a map viewport (`west` > `east` crosses the antimeridian)"""
+    if south > north:
+        raise HTTPException(status_code=400, detail="south must not be greater than north")
+    saved_places = await _saved_places(user_id)
+    locations = _unique(
+        index.within_bounds(north, south, east, west, category=category, limit=limit)
+        + saved_places.within_bounds(north, south, east, west, category=category, limit=limit),
+        key=lambda location: location
+    )[:limit]
+    return LocationsResponse(success=True, locations=locations)
+
+
+async def _saved_places(user_id: str) -> SpatialIndex:
+    """The caller's own trip items: other users' saved places (and the photo URLs
+    they sent with them) are never listed"""
+    saved_places = SpatialIndex()
+    saved_places.extend(await trip_service.owned_locations(user_id))
+    return saved_places
+
+
+def _unique(items: list, key) -> list:
+    """Drop places listed by both indexes, keeping the geocoded entry (listed first)"""
+    seen = set()
+    unique = []
+    for item in items:
+        location = key(item)
+        place = normalize_key(location.name, location.address)
+        if place not in seen:
+            seen.add(place)
+            unique.append(item)
+    return unique
@@ -0,0 +1,42 @@
+import logging
+import math
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Response
+from config import settings
+from api.dependencies import get_photo_service
+from api.responses import etag_matches
+from services.maps_service import PhotoNotFound
+from services.photo_service import PhotoService, photo_etag, photo_width
+from services.resilience import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/photos/{reference}")
+async def get_photo(
+    reference: str = Path(..., max_length=1024, pattern=r"^[\w-]+$"),
+    maxwidth: int = Query(400, ge=1, le=1600),
+    if_none_match: str = Header(None),
+    photos: PhotoService = Depends(get_photo_service)
+):
+    """A place photo, fetched from Google on first use and cached after that"""
+    headers = {
+        "ETag": photo_etag(reference, photo_width(maxwidth)),
+        "Cache-Control": f"public, max-age={settings.photo_client_max_age}"
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        photo = await photos.get(reference, maxwidth)
+    except PhotoNotFound:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    except UpstreamUnavailable as e:
+        logger.warning(f"Photo upstream unavailable: {str(e)}")
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after is not None else None
+        raise HTTPException(status_code=503, detail="Photo service temporarily unavailable", headers=headers)
+    except Exception as e:
+        logger.error(f"Photo fetch error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch photo")
+
+    return Response(content=photo.data, media_type=photo.content_type, headers=headers)
@@ -1,8 +1,13 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from models.schemas import TripResponse, Location
-from services.trip_service import trip_service
+from typing import List
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+from config import settings
+from models.schemas import TripResponse, TripRouteResponse, Location, Trip
+from api.responses import ModelResponse, etag_matches
+from services.route_optimizer import plan_trip
+from services.trip_service import trip_service, ANONYMOUS_USER
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -13,27 +18,110 @@ class AddLocationRequest(BaseModel):
     trip_id: str = None
 
 
+class AddLocationsRequest(BaseModel):
+    locations: List[Location] = Field(..., max_length=500)
+    trip_id: str = None
+
+
+class RemoveLocationsRequest(BaseModel):
+    item_ids: List[str] = Field(..., max_length=500)
+    trip_id: str = None
+
+
+class CreateTripRequest(BaseModel):
+    name: str = "My Trip"
+
+
 @router.get("/trip/{trip_id}", response_model=TripResponse)
 @router.get("/trip", response_model=TripResponse)
-async def get_trip(trip_id: str = None):
-    """Get a trip by ID, or default trip"""
+async def get_trip(
+    trip_id: str = None,
+    user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id"),
+    if_none_match: str = Header(None)
+):
+    """Get a trip by ID, or default trip; 304 if the client's copy is current"""
     try:
-        trip = trip_service.get_trip(trip_id)
+        version = await trip_service.get_trip_version(trip_id, user_id)
+        if not version:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        # Read before the trip, so a concurrent change can only make the ETag older than the body
+        headers = {"ETag": f'"{version[0]}.{version[1]}"', "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        trip = await trip_service.get_trip(version[0], user_id)
         if not trip:
             raise HTTPException(status_code=404, detail="Trip not found")
-        
-        return TripResponse(success=True, trip=trip)
+
+        return ModelResponse(TripResponse(success=True, trip=trip), headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get trip error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get trip")
 
 
+@router.get("/trip/{trip_id}/optimize", response_model=TripRouteResponse)
+async def optimize_trip(
+    trip_id: str,
+    start_item_id: str = None,
+    hours_per_day: float = Query(None, gt=0, le=24, description="Split the route into days of this many hours"),
+    user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")
+):
+    """Suggest a visiting order for the trip's locations"""
+    try:
+        trip = await trip_service.get_trip(trip_id, user_id)
+        if not trip:
+            raise HTTPException(status_code=404, detail="Trip not found")
+
+        # CPU-bound for large trips; keep it off the event loop
+        return await asyncio.to_thread(
+            plan_trip,
+            trip,
+            start_item_id=start_item_id,
+            hours_per_day=hours_per_day,
+            travel_speed_kmh=settings.route_travel_speed_kmh,
+            default_visit_minutes=settings.route_default_visit_minutes
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Optimize trip error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to optimize trip")
+
+
+@router.post("/trip", response_model=TripResponse)
+async def create_trip(request: CreateTripRequest, user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")):
+    """Create a new trip owned by the caller"""
+    try:
+        trip = await trip_service.create_trip(request.name, user_id)
+        return ModelResponse(TripResponse(success=True, trip=trip))
+    except Exception as e:
+        logger.error(f"Create trip error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create trip")
+
+
+@router.get("/trips", response_model=List[Trip])
+async def list_trips(user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")):
+    """List the caller's trips"""
+    try:
+        return ModelResponse(await trip_service.list_trips(user_id))
+    except Exception as e:
+        logger.error(f"List trips error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to list trips")
+
+
 @router.post("/trip/add-location", response_model=TripResponse)
-async def add_location_to_trip(request: AddLocationRequest):
+async def add_location_to_trip(
+    request: AddLocationRequest,
+    user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")
+):
     """Add a location to a trip"""
     try:
-        trip = trip_service.add_location_to_trip(request.location, request.trip_id)
-        return TripResponse(success=True, trip=trip)
+        trip = await trip_service.add_location_to_trip(request.location, request.trip_id, user_id)
+        return ModelResponse(TripResponse(success=True, trip=trip))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -41,12 +129,41 @@ async def add_location_to_trip(request: AddLocationRequest):
         raise HTTPException(status_code=500, detail="Failed to add location to trip")
 
 
+@router.post("/trip/add-locations", response_model=TripResponse)
+async def add_locations_to_trip(
+    request: AddLocationsRequest,
+    user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")
+):
+    """Add several locations to a trip in one call"""
+    try:
+        trip = await trip_service.add_locations_to_trip(request.locations, request.trip_id, user_id)
+        return ModelResponse(TripResponse(success=True, trip=trip))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Add locations error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to add locations to trip")
+
+
+@router.post("/trip/remove-locations", response_model=TripResponse)
+async def remove_locations_from_trip(request: RemoveLocationsRequest, user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")):
+    """Remove several locations from a trip in one call"""
+    try:
+        trip = await trip_service.remove_locations_from_trip(request.item_ids, request.trip_id, user_id)
+        return ModelResponse(TripResponse(success=True, trip=trip))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Remove locations error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to remove locations from trip")
+
+
 @router.delete("/trip/remove-location/{item_id}")
-async def remove_location_from_trip(item_id: str, trip_id: str = None):
+async def remove_location_from_trip(item_id: str, trip_id: str = None, user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")):
     """Remove a location from a trip"""
     try:
-        trip = trip_service.remove_location_from_trip(item_id, trip_id)
-        return TripResponse(success=True, trip=trip)
+        trip = await trip_service.remove_location_from_trip(item_id, trip_id, user_id)
+        return ModelResponse(TripResponse(success=True, trip=trip))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -55,6 +172,6 @@ async def remove_location_from_trip(item_id: str, trip_id: str = None):
 
 
 @router.get("/trip/default/id")
-async def get_default_trip_id():
+async def get_default_trip_id(user_id: str = Header(ANONYMOUS_USER, alias="X-User-Id")):
     """Get the default trip ID"""
-    return {"trip_id": trip_service.get_default_trip_id()}
\ No newline at end of file
+    return {"trip_id": await trip_service.get_default_trip_id(user_id)}
@@ -0,0 +1,144 @@
+"""Concurrent chats geocoding overlapping places, with and without the geocode batcher.
+
+Each chat asks for a handful of places drawn from a small pool of popular
+ones, spelled with varying case and punctuation. Chats arrive a few
+milliseconds apart, so many of them look up the same places at once. The
+report shows, per mode, upstream requests, how many place resolutions ran
+(each one walks the caches and single-flight), chat latency and the deepest
+the batcher's queue got; every chat must get all its places back with its
+own descriptions.
+
+Usage: python -m benchmarks.bench_geocode_batching [--chats 200] [--pool 30] [--window 0.01]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from benchmarks.fake_maps import FakeMapsServer
+
+SPELLINGS = (str, str.lower, str.upper, lambda name: f"{name}!")
+
+
+def make_chats(chats: int, pool: int, per_chat: int, seed: int = 7):
+    rng = random.Random(seed)
+    # A few places are asked for far more often than the rest
+    weights = [1 / (rank + 1) for rank in range(pool)]
+    requests = []
+    for chat in range(chats):
+        places = set()
+        while len(places) < per_chat:
+            places.add(rng.choices(range(pool), weights)[0])
+        requests.append([
+            {
+                "name": rng.choice(SPELLINGS)(f"Popular Place {place}"),
+                "description": f"Chat {chat}",
+                "category": "landmark",
+                "address": f"{place} Benchmark Avenue, Paris"
+            }
+            for place in sorted(places)
+        ])
+    return requests
+
+
+async def run(service, chats, arrival: float):
+    """Chat latencies and the places each chat got back"""
+    resolve = service._resolve_location
+    resolutions = 0
+
+    async def counted(loc_data, include_photos=True):
+        nonlocal resolutions
+        resolutions += 1
+        return await resolve(loc_data, include_photos)
+
+    service._resolve_location = counted
+    if service.batcher is not None:
+        service.batcher.resolve = counted
+    peak = 0
+
+    async def sample_queue():
+        nonlocal peak
+        while True:
+            peak = max(peak, sum(service.batcher.queue_depth().values()))
+            await asyncio.sleep(0.001)
+
+    async def chat(locations, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        result = await service.geocode_locations(locations)
+        return time.perf_counter() - start, locations, result
+
+    sampler = asyncio.ensure_future(sample_queue()) if service.batcher is not None else None
+    results = await asyncio.gather(*(chat(locations, i * arrival) for i, locations in enumerate(chats)))
+    if sampler is not None:
+        sampler.cancel()
+    return results, resolutions, peak
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] if samples else 0.0
+
+
+async def main(args):
+    from config import settings
+    settings.maps_queries_per_second = 10000
+    chats = make_chats(args.chats, args.pool, args.per_chat)
+
+    report = {}
+    for mode, window in (("unbatched", 0.0), ("batched", args.window)):
+        server = FakeMapsServer(latency=args.latency)
+        with server as url:
+            settings.google_maps_base_url = url
+            from services.maps_service import GoogleMapsService
+            service = GoogleMapsService(batch_window=window)
+            results, resolutions, peak = await run(service, chats, args.arrival)
+            service.close()
+        latencies = [seconds * 1000 for seconds, _, _ in results]
+        complete = all(
+            [loc.description for loc in got] == [loc["description"] for loc in asked]
+            for _, asked, got in results
+        )
+        report[mode] = {
+            "upstream": sum(server.hits.values()),
+            "resolutions": resolutions,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "peak": peak,
+            "complete": complete
+        }
+
+    distinct = len({(loc["name"].lower().rstrip("!"), loc["address"]) for chat in chats for loc in chat})
+    lookups = sum(len(chat) for chat in chats)
+    print(f"{args.chats} chats, {lookups} lookups of {distinct} distinct places, "
+          f"{args.arrival * 1000:.0f} ms apart, window {args.window * 1000:.0f} ms")
+    print(f"{'mode':<10} {'upstream':>9} {'resolutions':>12} {'p50 ms':>8} {'p95 ms':>8} {'peak queue':>11}")
+    for mode, row in report.items():
+        print(f"{mode:<10} {row['upstream']:>9} {row['resolutions']:>12} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+              f"{row['peak'] if mode == 'batched' else '-':>11}")
+
+    unbatched, batched = report["unbatched"], report["batched"]
+    ok = (
+        unbatched["complete"] and batched["complete"]
+        and batched["upstream"] <= unbatched["upstream"]
+        # Places looked up again after their first resolution finished go through
+        # the batcher again (and hit the cache), so some repeats are expected
+        and batched["resolutions"] * 5 <= unbatched["resolutions"]
+        and batched["p50"] <= unbatched["p50"] * 1.15 + args.window * 1000
+    )
+    print(f"{'PASS' if ok else 'FAIL'}  batched: {batched['resolutions']} resolutions for {distinct} places "
+          f"(unbatched {unbatched['resolutions']}), every chat got its own places back")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--pool", type=int, default=30, help="distinct popular places")
+    parser.add_argument("--per-chat", type=int, default=5)
+    parser.add_argument("--arrival", type=float, default=0.002, help="seconds between chat arrivals")
+    parser.add_argument("--window", type=float, default=0.01, help="batch window (s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Maps latency (s)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""Compare sequential, concurrent and cache-warm geocoding against the fake Maps server.
+
+Usage: python -m benchmarks.bench_geocoding [--latency 0.05] [--locations 5] [--chats 1 5 10]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from benchmarks.fake_maps import FakeMapsServer
+
+
+def make_locations(chat: int, count: int):
+    return [
+        {
+            "name": f"Place {chat}-{i}",
+            "description": "Benchmark location",
+            "category": "landmark",
+            "address": f"{i} Benchmark Avenue, Paris"
+        }
+        for i in range(count)
+    ]
+
+
+async def sequential_geocode(service, locations):
+    """The previous implementation: one location at a time, blocking client calls on the loop"""
+    results = []
+    for loc_data in locations:
+        places = service.client.places(query=f"{loc_data['name']} {loc_data['address']}")
+        details = service.client.place(place_id=places['results'][0]['place_id'])
+        results.append(service._create_location_from_place(loc_data, details['result']))
+    return results
+
+
+async def run(geocode, service, chats: int, count: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(geocode(service, make_locations(c, count)) for c in range(chats)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    from config import settings
+
+    with FakeMapsServer(latency=args.latency) as url:
+        settings.google_maps_base_url = url
+        settings.maps_queries_per_second = 10000
+
+        from services.maps_service import GoogleMapsService
+        service = GoogleMapsService()
+
+        async def concurrent_geocode(svc, locations):
+            return await svc.geocode_locations(locations)
+
+        print(f"{args.locations} locations per chat, {args.latency * 1000:.0f}ms upstream latency, "
+              f"concurrency limit {settings.maps_concurrency_limit}")
+        print(f"{'chats':>6} {'sequential':>12} {'concurrent':>12} {'speedup':>8} {'warm cache':>12}")
+        for chats in args.chats:
+            for cache in (service.search_cache, service.details_cache, service.geocode_cache):
+                cache.clear()
+            seq = await run(sequential_geocode, service, chats, args.locations)
+            conc = await run(concurrent_geocode, service, chats, args.locations)
+            warm = await run(concurrent_geocode, service, chats, args.locations)
+            print(f"{chats:>6} {seq:>11.3f}s {conc:>11.3f}s {seq / conc:>7.1f}x {warm:>11.4f}s")
+
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--locations", type=int, default=5)
+    parser.add_argument("--chats", type=int, nargs="+", default=[1, 5, 10])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""Load-test the middleware stack: the previous BaseHTTPMiddleware classes vs pure ASGI.
+
+Both apps serve the real /health and /api/trip routes through an in-process
+ASGI client, so the numbers isolate middleware overhead.
+
+Usage: python -m benchmarks.bench_middleware [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from api.routes import trips
+from middleware import ErrorHandlingMiddleware, LoggingMiddleware, RateLimitMiddleware
+from services.rate_limiter import InMemoryRateLimitBackend, RateLimiter
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, limiter: RateLimiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request: Request, call_next):
+        result = await self.limiter.hit(request.client.host, request.url.path)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"success": False})
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        return response
+
+
+class LegacyErrorHandlingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"success": False})
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        logging.getLogger("middleware").info(
+            f"{request.method} {request.url.path} - Status: {response.status_code} - "
+            f"Time: {time.time() - start_time:.3f}s"
+        )
+        return response
+
+
+def build_app(logging_cls, error_cls, rate_limit_cls) -> FastAPI:
+    app = FastAPI()
+    limiter = RateLimiter(InMemoryRateLimitBackend(), default_limit=10 ** 9)
+    app.add_middleware(logging_cls)
+    app.add_middleware(error_cls)
+    app.add_middleware(rate_limit_cls, limiter=limiter)
+    app.include_router(trips.router, prefix="/api")
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "version": "1.0.0"}
+
+    return app
+
+
+async def load(app: FastAPI, path: str, total: int, concurrency: int):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(count: int):
+            for _ in range(count):
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(total // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000
+    }
+
+
+async def main(args):
+    logging.getLogger("middleware").setLevel(logging.WARNING)
+    apps = {
+        "BaseHTTPMiddleware": build_app(LegacyLoggingMiddleware, LegacyErrorHandlingMiddleware, LegacyRateLimitMiddleware),
+        "pure ASGI": build_app(LoggingMiddleware, ErrorHandlingMiddleware, RateLimitMiddleware)
+    }
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'path':<10} {'stack':<20} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for path in ("/health", "/api/trip"):
+        for name, app in apps.items():
+            await load(app, path, args.concurrency * 10, args.concurrency)  # warm up
+            result = await load(app, path, args.requests, args.concurrency)
+            print(f"{path:<10} {name:<20} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""Model routing against the fake OpenAI server: one fixed model and budget vs routed tiers.
+
+The fake generates replies shaped by the system prompt (number of places,
+description length), cuts them off at max_tokens and takes longer for
+more output tokens and for the large model. The same mix of quick lookups,
+ordinary questions and itinerary requests is sent with routing off and on;
+the report shows the route each request took, latency and tokens per route,
+and how many replies were cut off or came back without places.
+
+Usage: python -m benchmarks.bench_model_routing [--repeat 3] [--token-latency 0.004]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+SMALL_MODEL = "small-fast-model"
+LARGE_MODEL = "large-model"
+
+REQUESTS = [
+    ("Best coffee in Lisbon", None),
+    ("3 museums in Paris", None),
+    ("Where should I eat tonight?", "Rome"),
+    ("Good rooftop bars", "Tokyo"),
+    ("What should I see in Berlin if I like modern architecture and street art?", None),
+    ("Somewhere relaxing for a rainy afternoon with kids, not too expensive", "London"),
+    ("Recommend places", None),
+    ("Plan a 3 day itinerary in Kyoto with temples, food markets and a day trip", None),
+    ("Compare the Louvre and the Musée d'Orsay for a first visit", "Paris"),
+    ("Give me 8 places for a food-focused weekend in Mexico City", None),
+]
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] if samples else 0.0
+
+
+async def run(service, repeat: int):
+    """(route, seconds, locations) for every request, `repeat` passes with distinct wording"""
+    results = []
+    for attempt in range(repeat):
+        for message, city in REQUESTS:
+            # Vary the text so the single-flight and the fake's reply don't repeat
+            text = message if attempt == 0 else f"{message} (take {attempt})"
+            route = service.router.route(text, city)
+            start = time.perf_counter()
+            _, locations = await service.get_travel_recommendations(text, city)
+            results.append((route.name, time.perf_counter() - start, len(locations)))
+    return results
+
+
+async def main(args):
+    from openai import AsyncOpenAI
+    from services.model_router import ModelRouter
+    from services.openai_service import OpenAIService
+
+    fake = FakeOpenAIServer(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        model_latency={SMALL_MODEL: 0.4, LARGE_MODEL: 1.5}
+    )
+    with fake as url:
+        client = AsyncOpenAI(api_key="sk-benchmark", base_url=url, max_retries=0)
+        routers = {
+            "fixed": ModelRouter(enabled=False, default_model="standard-model", max_tokens=1000),
+            "routed": ModelRouter(
+                default_model="standard-model", quick_model=SMALL_MODEL, detailed_model=LARGE_MODEL,
+                max_tokens=1000, detailed_max_tokens=1600
+            )
+        }
+        totals = {}
+        for name, router in routers.items():
+            service = OpenAIService(client=client, router=router)
+            results = await run(service, args.repeat)
+            stats = router.stats()
+            print(f"\n{name}: {len(results)} requests")
+            print(f"{'route':<10} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'prompt tok':>11} {'output tok':>11} "
+                  f"{'places':>7} {'cut off':>8}")
+            by_route = defaultdict(list)
+            for route, seconds, locations in results:
+                by_route[route].append((seconds, locations))
+            for route, rows in by_route.items():
+                latencies = [seconds * 1000 for seconds, _ in rows]
+                print(f"{route:<10} {len(rows):>8} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+                      f"{stats[route]['avg_prompt_tokens']:>11.0f} {stats[route]['avg_completion_tokens']:>11.0f} "
+                      f"{sum(n for _, n in rows) / len(rows):>7.1f} {stats[route]['truncated']:>8}")
+            totals[name] = {
+                "mean_ms": sum(seconds for _, seconds, _ in results) / len(results) * 1000,
+                "tokens": sum(s["requests"] * (s["avg_prompt_tokens"] + s["avg_completion_tokens"]) for s in stats.values()),
+                "truncated": sum(s["truncated"] for s in stats.values()),
+                "empty": sum(1 for _, _, locations in results if not locations)
+            }
+            await asyncio.sleep(0)
+        await client.close()
+
+    fixed, routed = totals["fixed"], totals["routed"]
+    print(f"\nmean latency {fixed['mean_ms']:.1f} ms -> {routed['mean_ms']:.1f} ms "
+          f"({routed['mean_ms'] / fixed['mean_ms'] - 1:+.0%}), "
+          f"tokens {fixed['tokens']:.0f} -> {routed['tokens']:.0f} ({routed['tokens'] / fixed['tokens'] - 1:+.0%})")
+    ok = routed["truncated"] == 0 and routed["empty"] == 0 and routed["mean_ms"] < fixed["mean_ms"]
+    print(f"{'PASS' if ok else 'FAIL'}  routed replies: {routed['truncated']} cut off, {routed['empty']} without places")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="fake seconds per output token")
+    logging.disable(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""Parse success rate and parse time for model replies, old json.loads vs tolerant parser.
+
+The corpus is generated deterministically from --seed and covers the reply
+shapes seen in practice: clean JSON, markdown fences, chatty preambles, raw
+newlines inside strings, replies cut off by max_tokens, and plain prose.
+
+Usage: python -m benchmarks.bench_parsing [--replies 500] [--seed 7]
+"""
+import argparse
+import json
+import random
+import time
+
+from services.json_stream import parse_recommendations
+
+CATEGORIES = ["museum", "restaurant", "landmark", "activity", "shopping"]
+
+
+def make_reply(rng: random.Random) -> dict:
+    return {
+        "chat_response": "Here are some places you'll love. " * rng.randint(1, 4),
+        "locations": [
+            {
+                "name": f"Place {i}",
+                "description": " ".join(rng.choice(["Historic", "cozy", "vibrant", "quiet", "\"iconic\""]) for _ in range(40)),
+                "category": rng.choice(CATEGORIES),
+                "address": f"{rng.randint(1, 200)} Rue Example, Paris"
+            }
+            for i in range(rng.randint(3, 5))
+        ]
+    }
+
+
+def complete_objects(text: str, reply: dict) -> int:
+    """How many location objects were written out in full before the text ends"""
+    return sum(1 for loc in reply["locations"] if json.dumps(loc) in text)
+
+
+def build_corpus(count: int, seed: int):
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(count):
+        reply = make_reply(rng)
+        body = json.dumps(reply)
+        kind = ["clean", "fenced", "preamble", "raw newlines", "truncated", "prose"][n % 6]
+        if kind == "fenced":
+            text = f"```json\n{body}\n```"
+        elif kind == "preamble":
+            text = f"Sure! Here are my recommendations:\n```json\n{body}\n```"
+        elif kind == "raw newlines":
+            text = body.replace(". ", ".\n")
+        elif kind == "truncated":
+            text = body[:int(len(body) * rng.uniform(0.3, 0.95))]
+        elif kind == "prose":
+            text = reply["chat_response"]
+        else:
+            text = body
+        expected = 0 if kind == "prose" else complete_objects(json.dumps(reply), reply) if kind != "truncated" \
+            else complete_objects(text, reply)
+        corpus.append((kind, text, expected))
+    return corpus
+
+
+def legacy_parse(content: str):
+    """The previous behaviour: json.loads on the whole reply or nothing"""
+    try:
+        data = json.loads(content)
+        return data.get("chat_response", ""), data.get("locations", [])
+    except json.JSONDecodeError:
+        return content, []
+
+
+def tolerant_parse(content: str):
+    chat_response, locations, _ = parse_recommendations(content)
+    return chat_response, locations
+
+
+def run(parse, corpus):
+    by_kind = {}
+    for kind, text, expected in corpus:
+        start = time.perf_counter()
+        _, locations = parse(text)
+        elapsed = time.perf_counter() - start
+        stats = by_kind.setdefault(kind, {"expected": 0, "recovered": 0, "time": 0.0, "n": 0})
+        stats["expected"] += expected
+        stats["recovered"] += min(len(locations), expected)
+        stats["time"] += elapsed
+        stats["n"] += 1
+    return by_kind
+
+
+def main(args):
+    corpus = build_corpus(args.replies, args.seed)
+    results = {"json.loads": run(legacy_parse, corpus), "tolerant": run(tolerant_parse, corpus)}
+
+    print(f"{args.replies} replies; locations recovered / fully written, mean parse time")
+    print(f"{'kind':<14} " + " ".join(f"{name:>24}" for name in results))
+    for kind in results["tolerant"]:
+        cells = []
+        for stats in (results[name][kind] for name in results):
+            rate = stats["recovered"] / stats["expected"] if stats["expected"] else 1.0
+            cells.append(f"{rate:>8.0%} {stats['time'] / stats['n'] * 1e6:>10.1f}us")
+        print(f"{kind:<14} " + " ".join(f"{cell:>24}" for cell in cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replies", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+"""Upstream photo fetches and latency for the /api/photos proxy.
+
+Simulates `--clients` browsers that each load the photos of the same
+`--places` places, as they would after a shared chat answer. Before the proxy
+every image load went to Google (and carried our API key); with it each
+photo is fetched once, concurrent first loads share the download, and
+revalidations with If-None-Match are answered 304 without touching the cache.
+
+Usage: python -m benchmarks.bench_photos [--clients 50] [--places 10] [--latency 0.1]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from benchmarks.fake_maps import FakeMapsServer
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+async def load_all(photos, references, clients, etags=None):
+    """Every client loads every photo at once; returns per-load latencies and ETags"""
+    from services.photo_service import photo_etag, photo_width
+    latencies, seen = [], {}
+
+    async def load(reference):
+        start = time.perf_counter()
+        if etags and reference in etags:
+            # A browser revalidating: the route answers 304 from the ETag alone
+            assert photo_etag(reference, photo_width(200)) == etags[reference]
+        else:
+            photo = await photos.get(reference, 200)
+            seen[reference] = photo.etag
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(load(reference) for _ in range(clients) for reference in references))
+    return latencies, seen
+
+
+async def main(args):
+    from config import settings
+    from services.cache import ByteCache
+    from services.maps_service import GoogleMapsService
+    from services.photo_service import PhotoService
+
+    with FakeMapsServer(latency=args.latency) as url:
+        settings.google_maps_base_url = url
+        maps = GoogleMapsService()
+        photos = PhotoService(maps, ByteCache("photos", max_bytes=64 * 2 ** 20))
+        references = [f"photo-place-{i}" for i in range(args.places)]
+        loads = args.clients * args.places
+
+        print(f"{args.clients} clients x {args.places} photos = {loads} image loads")
+        print(f"direct Google URLs: {loads} upstream fetches, API key in every response")
+
+        start = time.perf_counter()
+        cold, etags = await load_all(photos, references, args.clients)
+        cold_elapsed = time.perf_counter() - start
+        upstream = photos.stats()["upstream_calls"]
+        print(f"proxy, cold:        {upstream} upstream fetches, {photos.stats()['coalesced']} coalesced, "
+              f"p50 {percentile(cold, 50) * 1000:.1f} ms, p99 {percentile(cold, 99) * 1000:.1f} ms, {cold_elapsed:.2f}s total")
+
+        warm, _ = await load_all(photos, references, args.clients)
+        print(f"proxy, warm cache:  {photos.stats()['upstream_calls'] - upstream} upstream fetches, "
+              f"p50 {percentile(warm, 50) * 1000:.3f} ms, p99 {percentile(warm, 99) * 1000:.3f} ms")
+
+        revalidated, _ = await load_all(photos, references, args.clients, etags=etags)
+        print(f"proxy, 304:         0 upstream fetches, 0 bytes sent, p50 {percentile(revalidated, 50) * 1000:.3f} ms")
+
+        ok = photos.stats()["upstream_calls"] == args.places
+        print(f"{'PASS' if ok else 'FAIL'}  one upstream fetch per photo ({photos.stats()['upstream_calls']} for {args.places})")
+        maps.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--places", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
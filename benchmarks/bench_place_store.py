@@ -0,0 +1,225 @@
+"""Memory of cached places: Pydantic models vs compact records in the place store.
+
+Sizes are measured with tracemalloc as the memory still held once a
+structure is built, with the models it was built from discarded. Places
+have realistic field sizes: a 60-word description, a formatted address,
+opening hours, a website and a photo URL.
+
+- places: 100k distinct geocoded places, held as Location models and as
+  records, plus the spatial index that now holds them
+- shared: 100k references to 10k places (the same places saved in many
+  trips or cache entries), models vs records sharing one PlaceRecord
+- trip: one 10k-item trip in InMemoryTripStore, which keeps the models
+  themselves: its memory next to the bare Trip model, and read and add
+  timings, which must not depend on the trip's size
+- caches: the recommendation and place-details caches keep JSON-shaped
+  entries (they round-trip through SQLite), so instead of records they
+  intern their strings: 10k cached replies recommending 1k places between
+  them, and 10k place details, with and without interning
+
+Usage: python -m benchmarks.bench_place_store [--places 100000] [--trip-items 10000]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from models.schemas import Location, Trip, TripItem
+from services.cache import TTLCache
+from services.place_store import PlaceStore, intern_strings
+from services.spatial_index import SpatialIndex
+from services.trip_store import InMemoryTripStore
+
+DESCRIPTION_WORDS = (
+    "A favourite with locals for its quiet courtyard, seasonal menu and long opening hours, "
+    "this spot rewards an unhurried visit; come early to avoid queues, stay for the view over "
+    "the river and ask about the guided tour that runs most afternoons in summer"
+).split()
+
+
+def make_location(place: int, variant: int = 0) -> Location:
+    """A freshly parsed Location, as geocoding or a request body produces it"""
+    words = DESCRIPTION_WORDS[variant % 7:] + DESCRIPTION_WORDS[:variant % 7]
+    return Location.model_validate({
+        "name": f"Popular Place {place}",
+        "description": " ".join(words) + f" ({place})",
+        "category": ("museum", "restaurant", "landmark", "activity", "shopping")[place % 5],
+        "address": f"{place % 300} Rue de l'Exemple {place}, 750{place % 20:02d} Paris, France",
+        "lat": 48.80 + (place % 1000) / 5000,
+        "lng": 2.25 + (place % 997) / 5000,
+        "additional_info": {
+            "opening_hours": "Monday: 9:00 AM – 6:00 PM",
+            "price_range": "$$",
+            "rating": 4.0 + (place % 10) / 10,
+            "website": f"https://example.com/places/{place}"
+        },
+        "photo_url": f"/api/photos/AWU5eFg{place:032d}?maxwidth=200"
+    })
+
+
+def make_reply(reply: int, distinct: int) -> dict:
+    """A cached recommendation as parsed from the model's JSON: five places, own descriptions"""
+    places = [(reply * 7 + n * 13) % distinct for n in range(5)]
+    return json.loads(json.dumps({
+        "chat_response": f"Here are five places you might enjoy ({reply}).",
+        "locations": [
+            {
+                "name": f"Popular Place {place}",
+                "description": " ".join(DESCRIPTION_WORDS[:40]) + f" ({reply}.{place})",
+                "category": ("museum", "restaurant", "landmark", "activity", "shopping")[place % 5],
+                "address": f"{place % 300} Rue de l'Exemple {place}, 750{place % 20:02d} Paris, France"
+            }
+            for place in places
+        ]
+    }))
+
+
+def make_details(place: int) -> dict:
+    """A cached place-details result as the Maps client decodes it"""
+    return json.loads(json.dumps({
+        "name": f"Popular Place {place}",
+        "formatted_address": f"{place % 300} Rue de l'Exemple {place}, 750{place % 20:02d} Paris, France",
+        "geometry": {"location": {"lat": 48.80 + (place % 1000) / 5000, "lng": 2.25 + (place % 997) / 5000}},
+        "opening_hours": {"weekday_text": ["Monday: 9:00 AM – 6:00 PM", "Tuesday: 9:00 AM – 6:00 PM"]},
+        "price_level": 2,
+        "rating": 4.0 + (place % 10) / 10,
+        "website": f"https://example.com/places/{place}",
+        "photos": [{"photo_reference": f"AWU5eFg{place:032d}", "height": 800, "width": 1200}]
+    }))
+
+
+def filled_cache(entries, compact) -> TTLCache:
+    cache = TTLCache("bench", max_size=len(entries), compact=compact)
+    for key, value in enumerate(entries):
+        cache.set(str(key), value)
+    return cache
+
+
+def retained(build):
+    """(bytes held by what `build` returns, the result)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def report(label: str, count: int, models: int, compact: int):
+    print(f"{label:<44} {models / count:>9.0f} B {compact / count:>9.0f} B {compact / models:>8.0%}")
+    return compact / models
+
+
+async def main(args):
+    ratios = []
+    print(f"{'':<44} {'models':>11} {'records':>11} {'ratio':>8}")
+
+    models, held = retained(lambda: [make_location(i) for i in range(args.places)])
+    del held
+    store = PlaceStore()
+    compact, held = retained(lambda: [store.location(make_location(i)) for i in range(args.places)])
+    del held
+    ratios.append(report(f"{args.places} places, per place", args.places, models, compact))
+    index, held = retained(lambda: _indexed(args.places))
+    del held
+    print(f"{'  spatial index holding them, per place':<44} {'':>11} {index / args.places:>9.0f} B")
+
+    distinct = args.places // 10
+    models, held = retained(lambda: [make_location(i % distinct, i // distinct) for i in range(args.places)])
+    del held
+    store = PlaceStore()
+    compact, held = retained(lambda: [store.location(make_location(i % distinct, i // distinct)) for i in range(args.places)])
+    del held
+    ratios.append(report(f"{args.places} references to {distinct} places, per ref", args.places, models, compact))
+
+    now = datetime.now()
+    items = args.trip_items
+
+    def trip_model():
+        return Trip(id="trip", name="Big trip", created_at=now, items=[
+            TripItem(id=f"item-{i:08d}-0000-0000-0000-000000000000", location=make_location(i), added_at=now)
+            for i in range(items)
+        ])
+
+    models, held = retained(trip_model)
+    del held
+
+    async def fill():
+        trip_store = InMemoryTripStore()
+        await trip_store.create_trip(Trip(id="trip", name="Big trip", created_at=now), "user")
+        await trip_store.add_items("trip", [
+            TripItem(id=f"item-{i:08d}-0000-0000-0000-000000000000", location=make_location(i), added_at=now)
+            for i in range(items)
+        ])
+        return trip_store
+    gc.collect()
+    tracemalloc.start()
+    trip_store = await fill()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{f'{items}-item trip in the store, per item':<44} {models / items:>9.0f} B {size / items:>9.0f} B {size / models:>8.0%}")
+
+    before = await trip_store.get_trip("trip")
+    start = time.perf_counter()
+    for _ in range(100):
+        await trip_store.get_trip("trip")
+    get_ms = (time.perf_counter() - start) / 100 * 1000
+    extra = [TripItem(id=f"extra-{i}", location=make_location(items + i), added_at=now) for i in range(20)]
+    start = time.perf_counter()
+    for item in extra:
+        await trip_store.add_items("trip", [item])
+    add_ms = (time.perf_counter() - start) / 20 * 1000
+    start = time.perf_counter()
+    for i in range(20):
+        await trip_store.remove_items("trip", [f"extra-{i}"])
+    remove_ms = (time.perf_counter() - start) / 20 * 1000
+    print(f"{'  get / add one item / remove one item':<44} {get_ms:>9.3f} ms {add_ms:>8.3f} ms {remove_ms:>8.3f} ms")
+    # Trips already handed out don't change under their readers
+    unchanged = len(before.items) == items
+
+    replies, distinct = args.places // 10, args.places // 100
+    print(f"\n{'':<44} {'plain':>11} {'interned':>11} {'ratio':>8}")
+    for label, count, make in (
+        (f"{replies} cached replies ({distinct} places), per place", replies * 5,
+         lambda: [make_reply(i, distinct) for i in range(replies)]),
+        (f"{replies} cached place details, per place", replies, lambda: [make_details(i) for i in range(replies)])
+    ):
+        # Entries are decoded inside the measurement, as they arrive from upstream; with
+        # interning the decoded copies are dropped once cached
+        plain, held = retained(lambda: filled_cache(make(), None))
+        del held
+        interned, held = retained(lambda: filled_cache(make(), intern_strings))
+        del held
+        ratios.append(report(label, count, plain, interned))
+
+    # Distinct places are mostly their own text, which records keep too; shared places
+    # are stored once. Trips stay models, so reads hand out the stored model and writes
+    # only copy the list of item references. Cache entries share names, addresses and keys
+    places, shared, replies_ratio, details_ratio = ratios
+    trip = size / models
+    ok = (places < 0.65 and shared < 0.25 and trip < 1.1 and get_ms < 0.05 and add_ms < 1 and remove_ms < 1
+          and unchanged and replies_ratio < 0.8 and details_ratio < 0.8)
+    print(f"{'PASS' if ok else 'FAIL'}  records: {places:.0%} of models per distinct place, {shared:.0%} per shared "
+          f"reference; trip store {trip:.0%} of its models, get {get_ms:.3f} ms, add {add_ms:.3f} ms; "
+          f"interned caches {replies_ratio:.0%} (replies) and {details_ratio:.0%} (details) of plain")
+
+
+def _indexed(places: int) -> SpatialIndex:
+    index = SpatialIndex(max_size=places, places=PlaceStore())
+    index.extend(make_location(i) for i in range(places))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--places", type=int, default=100000)
+    parser.add_argument("--trip-items", type=int, default=10000)
+    asyncio.run(main(parser.parse_args()))
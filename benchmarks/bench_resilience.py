@@ -0,0 +1,135 @@
+"""Exercise timeouts, retries, hedging, the circuit breaker and request deadlines
+against the fake Maps server with injected faults.
+
+Usage: python -m benchmarks.bench_resilience [--calls 200] [--latency 0.02] [--concurrency 5]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from benchmarks.fake_maps import Faults, FakeMapsServer
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return [samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000 for p in (50, 95, 99)]
+
+
+def make_service(**overrides):
+    from config import settings
+    from services.maps_service import GoogleMapsService
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    return GoogleMapsService()
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    try:
+        await coro
+        ok = True
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+async def run_calls(service, args, prefix: str):
+    """Issue calls `args.concurrency` at a time, below the service's own limit, so
+    latencies reflect the upstream rather than queueing"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await timed(service._get_place_details(f"{prefix}-{i}"))
+
+    return await asyncio.gather(*(one(i) for i in range(args.calls)))
+
+
+def report(label, outcomes):
+    ok = sum(1 for success, _ in outcomes if success)
+    p50, p95, p99 = percentiles([elapsed for _, elapsed in outcomes])
+    print(f"  {label:<22} success {ok / len(outcomes):>6.1%}  p50 {p50:>7.1f}ms  p95 {p95:>7.1f}ms  p99 {p99:>7.1f}ms")
+
+
+async def flaky(server, args):
+    print("Flaky upstream: 30% of responses are UNKNOWN_ERROR")
+    server.set_faults(Faults(error_rate=0.3))
+    for retries in (0, 2):
+        service = make_service(maps_max_retries=retries, maps_hedge_delay=0.0, circuit_failure_threshold=10**6)
+        report(f"{retries} retries", await run_calls(service, args, f"flaky{retries}"))
+        service.close()
+
+
+async def tail_latency(server, args):
+    print("Tail latency: 5% of responses take 1s")
+    server.set_faults(Faults(slow_rate=0.05, slow_latency=1.0))
+    for hedge in (0.0, 0.1):
+        service = make_service(maps_max_retries=0, maps_hedge_delay=hedge, maps_concurrency_limit=50)
+        label = f"hedge after {hedge * 1000:.0f}ms" if hedge else "no hedging"
+        report(label, await run_calls(service, args, f"tail{hedge}"))
+        service.close()
+
+
+async def hung_upstream(server, args):
+    print("Hung upstream: every request hangs; 0.3s call timeout, breaker opens after 5 failures")
+    server.set_faults(Faults(hang_rate=1.0, hang_time=5.0))
+    service = make_service(
+        maps_max_retries=0, maps_hedge_delay=0.0, maps_call_timeout=0.3,
+        circuit_failure_threshold=5, circuit_reset_timeout=1.0
+    )
+    before = sum(server.hits.values())
+    outcomes = [await timed(service._get_place_details(f"hung-{i}")) for i in range(args.calls // 10)]
+    sent = sum(server.hits.values()) - before
+    report("while hung", outcomes)
+    print(f"  {len(outcomes)} calls, {sent} reached the upstream, breaker {service.upstream.breaker.state}")
+
+    server.set_faults(Faults())
+    await asyncio.sleep(1.0)
+    probe = await timed(service._get_place_details("recovered"))
+    print(f"  after recovery: probe {'succeeded' if probe[0] else 'failed'}, breaker {service.upstream.breaker.state}")
+    service.close()
+
+
+async def deadline_budget(server, args):
+    from services.resilience import DeadlineExceeded, deadline
+    print("Request deadline: upstream hangs, 10s call timeout, 0.5s request budget")
+    server.set_faults(Faults(hang_rate=1.0, hang_time=5.0))
+    service = make_service(maps_max_retries=2, maps_call_timeout=10.0, circuit_failure_threshold=10**6)
+    start = time.perf_counter()
+    try:
+        with deadline(0.5):
+            await service._get_place_details("deadline")
+        outcome = "answered"
+    except DeadlineExceeded:
+        outcome = "DeadlineExceeded"
+    print(f"  {outcome} after {(time.perf_counter() - start) * 1000:.0f}ms")
+    server.set_faults(Faults())
+    service.close()
+
+
+async def main(args):
+    from config import settings
+    # Retry and circuit breaker warnings would drown out the results
+    logging.disable(logging.WARNING)
+    settings.maps_queries_per_second = 10000
+    settings.maps_cache_size = args.calls * 4
+    settings.retry_base_delay = 0.05
+    for scenario in (flaky, tail_latency, hung_upstream, deadline_budget):
+        # A fresh server per scenario, so stragglers from the last one don't skew request counts
+        server = FakeMapsServer(latency=args.latency, seed=args.seed)
+        with server as url:
+            settings.google_maps_base_url = url
+            await scenario(server, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+"""Route optimization time and quality on synthetic trips of increasing size.
+
+Compares the stored order, the nearest-neighbour tour, and nearest-neighbour
+improved with 2-opt and Or-opt.
+
+Usage: python -m benchmarks.bench_route_optimizer [--sizes 10 50 100 200 500] [--repeats 3]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from services.route_optimizer import distance_matrix, nearest_neighbor, optimize_route
+
+
+def make_stops(count: int, rng: random.Random):
+    """Stops clustered around a few neighbourhoods of one city"""
+    centres = [(48.8566 + rng.gauss(0, 0.03), 2.3522 + rng.gauss(0, 0.05)) for _ in range(max(1, count // 25))]
+    stops = [rng.choice(centres) for _ in range(count)]
+    return [lat + rng.gauss(0, 0.005) for lat, _ in stops], [lng + rng.gauss(0, 0.008) for _, lng in stops]
+
+
+def path_km(order, dist) -> float:
+    order = np.asarray(order)
+    return float(dist[order[:-1], order[1:]].sum()) / 1000
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    print(f"{'stops':>6} {'stored':>10} {'nearest':>10} {'optimized':>10} {'saved':>7} "
+          f"{'matrix':>9} {'nn':>9} {'total':>9}")
+    for size in args.sizes:
+        rows = []
+        for _ in range(args.repeats):
+            lats, lngs = make_stops(size, rng)
+
+            start = time.perf_counter()
+            dist = distance_matrix(np.array(lats), np.array(lngs))
+            matrix_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            greedy = nearest_neighbor(dist, int(np.argmax(dist.sum(axis=1))))
+            nn_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            plan = optimize_route(lats, lngs)
+            total_time = time.perf_counter() - start
+
+            rows.append((
+                path_km(range(size), dist), path_km(greedy, dist), plan.distance_m / 1000,
+                matrix_time, nn_time, total_time
+            ))
+
+        stored, greedy_km, optimized, matrix_time, nn_time, total_time = np.mean(rows, axis=0)
+        print(f"{size:>6} {stored:>8.1f}km {greedy_km:>8.1f}km {optimized:>8.1f}km {1 - optimized / stored:>6.0%} "
+              f"{matrix_time * 1000:>7.2f}ms {nn_time * 1000:>7.2f}ms {total_time * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 500])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
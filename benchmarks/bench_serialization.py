@@ -0,0 +1,122 @@
+"""Response serialization cost across trip sizes, and GET /api/trip with and without ETags.
+
+"response_model" is FastAPI's default path for a route returning a model:
+validate it again against response_model, walk it with jsonable_encoder,
+then json.dumps. "ModelResponse" dumps the already-built model once and
+encodes it with orjson. The end-to-end part calls the real route in-process
+(in-memory trip store) for a full response and for a 304 revalidation.
+
+Usage: python -m benchmarks.bench_serialization [--sizes 10 100 500 2000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+os.environ["TRIP_STORE_BACKEND"] = "memory"
+os.environ["CLIENT_WARM_UP"] = "false"
+os.environ["MAX_REQUESTS_PER_MINUTE"] = "100000000"
+
+
+def make_locations(count: int):
+    from models.schemas import AdditionalInfo, Location
+    return [
+        Location(
+            name=f"Place {i}",
+            description="A well-loved spot with a long history and a view worth the climb. " * 2,
+            category="landmark",
+            address=f"{i} Example Street, Paris",
+            lat=48.80 + i / 10000,
+            lng=2.30 + i / 10000,
+            additional_info=AdditionalInfo(opening_hours="Monday: 9:00 AM – 6:00 PM", price_range="$$", rating=4.5),
+            photo_url=f"/api/photos/photo-{i}?maxwidth=200"
+        )
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    """Median milliseconds per call"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+async def timed_async(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+async def main(args):
+    import httpx
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from api.responses import ModelResponse
+    from models.schemas import Trip, TripItem, TripResponse
+    import main as app_module
+
+    field = create_response_field(name="response", type_=TripResponse)
+
+    print("render only (ms, median)")
+    print(f"{'items':>6} {'response_model':>15} {'ModelResponse':>14} {'speed-up':>9} {'bytes':>9}")
+    for size in args.sizes:
+        trip = Trip(id="bench", name="Bench", created_at=datetime.now(), items=[
+            TripItem(id=f"item-{i}", location=location, added_at=datetime.now())
+            for i, location in enumerate(make_locations(size))
+        ])
+        model = TripResponse(success=True, trip=trip)
+
+        async def default_path():
+            content = await serialize_response(field=field, response_content=model)
+            return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+        default_ms = await timed_async(default_path, args.repeat)
+        fast_ms = timed(lambda: ModelResponse(model), args.repeat)
+        body = ModelResponse(model).body
+        if json.loads(body) != json.loads(await default_path()):
+            print("FAIL  ModelResponse body differs from the response_model body")
+        print(f"{size:>6} {default_ms:>15.3f} {fast_ms:>14.3f} {default_ms / fast_ms:>8.1f}x {len(body):>9}")
+
+    print("\nGET /api/trip/{id} end to end (ms, median)")
+    print(f"{'items':>6} {'200':>9} {'304':>9}")
+    app = app_module.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for size in args.sizes:
+                headers = {"X-User-Id": f"bench-{size}"}
+                trip_id = (await client.post("/api/trip", json={"name": "Bench"}, headers=headers)).json()["trip"]["id"]
+                locations = make_locations(size)
+                for start in range(0, size, 500):
+                    await client.post("/api/trip/add-locations", headers=headers, json={
+                        "trip_id": trip_id,
+                        "locations": [location.model_dump() for location in locations[start:start + 500]]
+                    })
+                etag = (await client.get(f"/api/trip/{trip_id}", headers=headers)).headers["etag"]
+
+                full_ms = await timed_async(lambda: client.get(f"/api/trip/{trip_id}", headers=headers), args.repeat)
+                revalidate = {**headers, "If-None-Match": etag}
+                not_modified_ms = await timed_async(
+                    lambda: client.get(f"/api/trip/{trip_id}", headers=revalidate), args.repeat
+                )
+                print(f"{size:>6} {full_ms:>9.3f} {not_modified_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=50)
+    # The app logs every request
+    logging.disable(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
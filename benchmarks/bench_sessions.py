@@ -0,0 +1,85 @@
+"""Prompt size and request payload per turn as a conversation grows, and memory per session.
+
+"client context" is the old way: the client resends every earlier turn and
+recommended location in `context`, and the full history goes into the
+prompt. "session store" sends only the session id; the server keeps the
+history and compacts it to SESSION_HISTORY_TOKENS.
+
+Usage: python -m benchmarks.bench_sessions [--turns 50] [--sessions 2000]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from benchmarks.fake_openai import make_reply
+from services.session_store import SessionStore, estimate_tokens
+
+BUDGET = 600
+
+
+def prompt_tokens(messages) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def conversation(turns: int):
+    for turn in range(turns):
+        message = f"Turn {turn}: what else should we see? We liked the last places, maybe something quieter."
+        reply = make_reply(f"{message}\nCurrent city: Paris")
+        yield message, reply["chat_response"], reply["locations"]
+
+
+def run(turns: int):
+    store = SessionStore()
+    session = asyncio.run(store.get_or_create(city="Paris"))
+    full_history, previous_locations = [], []
+    print(f"{'turn':>5} {'client ctx tokens':>18} {'client ctx bytes':>17} {'session tokens':>15} {'session bytes':>14} {'build ms':>9}")
+    worst = 0
+    for turn, (message, chat_response, locations) in enumerate(conversation(turns), start=1):
+        naive_body = {"message": message, "city": "Paris", "context": {
+            "history": full_history, "previous_locations": previous_locations
+        }}
+        session_body = {"message": message, "city": "Paris", "session_id": session.id}
+
+        start = time.perf_counter()
+        history = store.prompt_messages(session, BUDGET)
+        build_ms = (time.perf_counter() - start) * 1000
+        worst = max(worst, prompt_tokens(history))
+
+        if turn in (1, 2, 5, 10, 20, 50, 100) or turn == turns:
+            print(f"{turn:>5} {prompt_tokens(full_history):>18} {len(json.dumps(naive_body)):>17} "
+                  f"{prompt_tokens(history):>15} {len(json.dumps(session_body)):>14} {build_ms:>9.3f}")
+
+        store.record_turn(session, message, chat_response, locations, "Paris")
+        names = ", ".join(location["name"] for location in locations)
+        full_history += [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": f"{chat_response}\nRecommended: {names}"}
+        ]
+        previous_locations += locations
+
+    ok = worst <= BUDGET
+    print(f"{'PASS' if ok else 'FAIL'}  session history stays within {BUDGET} tokens (max {worst})")
+
+
+def memory(sessions: int, turns: int):
+    tracemalloc.start()
+    store = SessionStore(max_sessions=sessions)
+    replies = list(conversation(turns))
+    for _ in range(sessions):
+        session = asyncio.run(store.get_or_create(city="Paris"))
+        for message, chat_response, locations in replies:
+            store.record_turn(session, message, chat_response, locations, "Paris")
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"\n{sessions} sessions x {turns} turns: {current / 2 ** 20:.1f} MB, {current / sessions / 1024:.1f} KB per session")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.turns)
+    memory(args.sessions, args.turns)
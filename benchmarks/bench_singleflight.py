@@ -0,0 +1,128 @@
+"""Stress identical concurrent lookups and count how many reach the upstream.
+
+N callers geocode the same location and send the same chat prompt at the same
+time. With single-flight coalescing each upstream sees exactly one call. The
+script also checks that an upstream error reaches every caller, and that
+cancelling some callers doesn't cancel the call for the rest.
+
+Usage: python -m benchmarks.bench_singleflight [--callers 200] [--latency 0.1]
+"""
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from benchmarks.fake_maps import FakeMapsServer
+
+LOCATION = {
+    "name": "Louvre Museum",
+    "description": "Benchmark location",
+    "category": "museum",
+    "address": "Rue de Rivoli, Paris"
+}
+REPLY = '{"chat_response": "Try the Louvre.", "locations": [{"name": "Louvre Museum", ' \
+        '"description": "Art", "category": "museum", "address": "Rue de Rivoli, Paris"}]}'
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, counting create() calls"""
+
+    def __init__(self, latency: float, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.error:
+            raise self.error
+        message = SimpleNamespace(content=REPLY, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+def fake_openai(latency: float, error: Exception = None):
+    from services.openai_service import OpenAIService
+    completions = FakeCompletions(latency, error)
+    return OpenAIService(client=SimpleNamespace(chat=SimpleNamespace(completions=completions))), completions
+
+
+def check(label: str, ok: bool, detail: str):
+    print(f"{'PASS' if ok else 'FAIL'}  {label}: {detail}")
+    return ok
+
+
+async def main(args):
+    from config import settings
+    results = []
+
+    maps_server = FakeMapsServer(latency=args.latency)
+    with maps_server as url:
+        settings.google_maps_base_url = url
+        settings.maps_queries_per_second = 10000
+        from services.maps_service import GoogleMapsService
+        maps = GoogleMapsService()
+
+        start = time.perf_counter()
+        locations = await asyncio.gather(*(maps.geocode_location(dict(LOCATION)) for _ in range(args.callers)))
+        elapsed = time.perf_counter() - start
+        hits = dict(maps_server.hits)
+        results.append(check(
+            "maps", all(locations) and hits == {"/maps/api/place/textsearch/json": 1, "/maps/api/place/details/json": 1},
+            f"{args.callers} callers -> {sum(hits.values())} upstream requests {hits} in {elapsed:.3f}s"
+        ))
+        maps.close()
+
+    service, completions = fake_openai(args.latency)
+    start = time.perf_counter()
+    replies = await asyncio.gather(*(
+        service.get_travel_recommendations("Museums?", city="Paris") for _ in range(args.callers)
+    ))
+    elapsed = time.perf_counter() - start
+    results.append(check(
+        "openai", completions.calls == 1 and all(locs for _, locs in replies),
+        f"{args.callers} callers -> {completions.calls} completion in {elapsed:.3f}s"
+    ))
+    replies[0][1][0]["name"] = "mutated"
+    results.append(check(
+        "openai isolation", replies[1][1][0]["name"] == "Louvre Museum", "callers get their own copy of locations"
+    ))
+
+    service, completions = fake_openai(args.latency, error=RuntimeError("upstream down"))
+    outcomes = await asyncio.gather(*(
+        service.get_travel_recommendations("Museums?", city="Paris") for _ in range(args.callers)
+    ), return_exceptions=True)
+    failed = sum(1 for o in outcomes if isinstance(o, Exception) and "upstream down" in str(o))
+    results.append(check(
+        "error propagation", completions.calls == 1 and failed == args.callers,
+        f"{failed}/{args.callers} callers saw the error from {completions.calls} call"
+    ))
+
+    service, completions = fake_openai(args.latency)
+    tasks = [
+        asyncio.ensure_future(service.get_travel_recommendations("Museums?", city="Paris"))
+        for _ in range(args.callers)
+    ]
+    await asyncio.sleep(args.latency / 4)
+    for task in tasks[: args.callers // 2]:
+        task.cancel()
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    cancelled = sum(1 for o in outcomes if isinstance(o, asyncio.CancelledError))
+    answered = sum(1 for o in outcomes if isinstance(o, tuple))
+    results.append(check(
+        "partial cancellation", completions.calls == 1 and answered == args.callers - cancelled,
+        f"{cancelled} cancelled, {answered} still answered by {completions.calls} call"
+    ))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
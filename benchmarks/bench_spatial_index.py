@@ -0,0 +1,97 @@
+"""Query latency of the spatial index against a brute-force scan.
+
+Usage: python -m benchmarks.bench_spatial_index [--locations 50000] [--queries 1000]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from models.schemas import Location
+from services.spatial_index import SpatialIndex, haversine_m
+
+CITIES = [(48.8566, 2.3522), (51.5074, -0.1278), (40.7128, -74.0060), (35.6762, 139.6503), (-33.8688, 151.2093)]
+CATEGORIES = ["museum", "restaurant", "landmark", "activity", "shopping"]
+
+
+def make_locations(count: int, rng: random.Random):
+    for i in range(count):
+        lat, lng = rng.choice(CITIES)
+        yield Location(
+            name=f"Place {i}",
+            description="Benchmark location",
+            category=rng.choice(CATEGORIES),
+            address=f"{i} Benchmark Street",
+            lat=lat + rng.gauss(0, 0.1),
+            lng=lng + rng.gauss(0, 0.1)
+        )
+
+
+def brute_force_nearby(locations, lat, lng, radius_m, category):
+    """What a search looks like without an index: scan every location"""
+    lats = np.fromiter((loc.lat for loc in locations), dtype=np.float64, count=len(locations))
+    lngs = np.fromiter((loc.lng for loc in locations), dtype=np.float64, count=len(locations))
+    distances = haversine_m(lat, lng, lats, lngs)
+    return sorted(
+        (d, i) for i, d in enumerate(distances) if d <= radius_m and locations[i].category == category
+    )
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {p: samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000 for p in (50, 95, 99)}
+
+
+def report(label, samples):
+    p = percentiles(samples)
+    print(f"{label:<24} p50 {p[50]:>8.3f}ms  p95 {p[95]:>8.3f}ms  p99 {p[99]:>8.3f}ms")
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    locations = list(make_locations(args.locations, rng))
+
+    index = SpatialIndex(max_size=args.locations)
+    start = time.perf_counter()
+    index.extend(locations)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for location in locations[:args.queries]:
+        index.add(location)
+    add = (time.perf_counter() - start) / args.queries
+    print(f"{args.locations} locations bulk-indexed in {build * 1000:.0f}ms, then {add * 1e6:.1f}us per add")
+
+    queries = []
+    for _ in range(args.queries):
+        lat, lng = rng.choice(CITIES)
+        queries.append((lat + rng.gauss(0, 0.05), lng + rng.gauss(0, 0.05), rng.choice(CATEGORIES)))
+
+    nearby, bounds, brute = [], [], []
+    for lat, lng, category in queries:
+        start = time.perf_counter()
+        index.nearby(lat, lng, args.radius, category=category)
+        nearby.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.within_bounds(lat + 0.01, lat - 0.01, lng + 0.01, lng - 0.01, category=category)
+        bounds.append(time.perf_counter() - start)
+
+    for lat, lng, category in queries[:args.brute_force_queries]:
+        start = time.perf_counter()
+        brute_force_nearby(locations, lat, lng, args.radius, category)
+        brute.append(time.perf_counter() - start)
+
+    report(f"nearby ({args.radius:.0f}m)", nearby)
+    report("within bounds", bounds)
+    report("brute-force nearby", brute)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--brute-force-queries", type=int, default=50)
+    parser.add_argument("--radius", type=float, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+"""Benchmark add/remove/get against the in-memory and SQLite trip stores.
+
+Each store is populated with --trips trips of --items items, then a sample
+of operations is timed against random trips.
+
+Usage: python -m benchmarks.bench_trip_store [--trips 10000] [--items 100] [--ops 500]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-benchmark-key")
+
+from models.schemas import Location, Trip, TripItem
+from services.trip_service import TripService
+from services.trip_store import InMemoryTripStore, SQLiteTripStore
+
+
+def make_location(n: int) -> Location:
+    return Location(
+        name=f"Place {n}",
+        description="A benchmark location with a description of typical length for a recommendation.",
+        category="landmark",
+        address=f"{n} Benchmark Avenue, Paris",
+        lat=48.8 + (n % 1000) / 10000,
+        lng=2.3 + (n % 997) / 10000
+    )
+
+
+def make_trip(n: int, items: int) -> Trip:
+    now = datetime.now()
+    return Trip(
+        id=str(uuid.uuid4()),
+        name=f"Trip {n}",
+        created_at=now,
+        items=[
+            TripItem(id=str(uuid.uuid4()), location=make_location(n * items + i), added_at=now)
+            for i in range(items)
+        ]
+    )
+
+
+async def timed(ops):
+    latencies = []
+    for op in ops:
+        start = time.perf_counter()
+        await op()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.mean(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+async def bench(name: str, service: TripService, args):
+    start = time.perf_counter()
+    trip_ids = []
+    for n in range(args.trips):
+        trip = await service.store.create_trip(make_trip(n, args.items), "bench-user")
+        trip_ids.append(trip.id)
+    populate = time.perf_counter() - start
+
+    sample = random.sample(trip_ids, min(args.ops, len(trip_ids)))
+    added = {}
+
+    async def add(trip_id):
+        trip = await service.add_location_to_trip(make_location(-1), trip_id, "bench-user")
+        added[trip_id] = trip.items[-1].id
+
+    get = await timed([lambda t=t: service.get_trip(t, "bench-user") for t in sample])
+    add_stats = await timed([lambda t=t: add(t) for t in sample])
+    remove = await timed([lambda t=t: service.remove_location_from_trip(added[t], t, "bench-user") for t in sample])
+
+    print(f"{name:<8} populate {populate:>7.1f}s | "
+          f"get {get[0]:>7.3f}/{get[1]:>7.3f}ms | "
+          f"add {add_stats[0]:>7.3f}/{add_stats[1]:>7.3f}ms | "
+          f"remove {remove[0]:>7.3f}/{remove[1]:>7.3f}ms")
+    await service.close()
+
+
+async def main(args):
+    print(f"{args.trips} trips x {args.items} items, {args.ops} sampled ops (mean/p95)")
+    await bench("memory", TripService(InMemoryTripStore()), args)
+    with tempfile.TemporaryDirectory() as tmp:
+        await bench("sqlite", TripService(SQLiteTripStore(os.path.join(tmp, "trips.db"))), args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trips", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--ops", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,154 @@
+"""Local stand-in for the Google Maps places/place/geocode web services.
+
+Faults can be injected per request with `FakeMapsServer(faults=Faults(...))`
+or changed while it runs with `server.set_faults(...)`.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+@dataclass
+class Faults:
+    # Shape of the log-normal factor applied to the base latency (0 keeps it fixed)
+    latency_sigma: float = 0.0
+    # Fraction of requests answered with an UNKNOWN_ERROR status (worth retrying)
+    error_rate: float = 0.0
+    # Fraction of requests that take `slow_latency` seconds instead of the usual latency
+    slow_rate: float = 0.0
+    slow_latency: float = 1.0
+    # Fraction of requests that hang for `hang_time` seconds before answering
+    hang_rate: float = 0.0
+    hang_time: float = 30.0
+
+
+class FakeMapsHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        with self.server.hits_lock:
+            self.server.hits[url.path] += 1
+            faults = self.server.faults
+            roll, error_roll = self.server.rng.random(), self.server.rng.random()
+            latency = self.latency * self.server.rng.lognormvariate(0, faults.latency_sigma)
+
+        if roll < faults.hang_rate:
+            time.sleep(faults.hang_time)
+        elif roll < faults.hang_rate + faults.slow_rate:
+            time.sleep(faults.slow_latency)
+        else:
+            time.sleep(latency)
+        if error_roll < faults.error_rate:
+            self._send_json({"status": "UNKNOWN_ERROR", "results": []})
+            return
+
+        if url.path == "/maps/api/place/textsearch/json":
+            query = params.get("query", [""])[0]
+            body = {"status": "OK", "results": [{"place_id": f"fake-{abs(hash(query))}"}]}
+        elif url.path == "/maps/api/place/details/json":
+            place_id = params.get("placeid", params.get("place_id", [""]))[0]
+            body = {
+                "status": "OK",
+                "result": {
+                    "name": place_id,
+                    "formatted_address": "1 Fake Street, Paris",
+                    "geometry": {"location": {"lat": 48.8606, "lng": 2.3376}},
+                    "rating": 4.6,
+                    "price_level": 2
+                }
+            }
+            if "photo" in params.get("fields", [""])[0].split(","):
+                body["result"]["photos"] = [{"photo_reference": f"photo-{place_id}", "width": 1600, "height": 1200}]
+        elif url.path == "/maps/api/geocode/json":
+            body = {
+                "status": "OK",
+                "results": [{
+                    "formatted_address": "1 Fake Street, Paris",
+                    "geometry": {"location": {"lat": 48.8606, "lng": 2.3376}}
+                }]
+            }
+        elif url.path == "/maps/api/place/photo":
+            reference = params.get("photoreference", [""])[0]
+            if not reference.startswith("photo-"):
+                self._send_json({"status": "INVALID_REQUEST"}, status=400)
+                return
+            width = int(params.get("maxwidth", ["400"])[0])
+            # Stand-in image bytes, larger for wider photos
+            payload = b"\xff\xd8\xff\xe0" + reference.encode() * (width * 20 // max(len(reference), 1))
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            try:
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+        else:
+            self.send_error(404)
+            return
+        self._send_json(body)
+
+    def _send_json(self, body: dict, status: int = 200):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up waiting, e.g. after a timeout
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMapsServer:
+    """Run the fake Maps API on a background thread: `with FakeMapsServer() as url: ...`"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        faults: Faults = None,
+        seed: int = 0
+    ):
+        handler = type("Handler", (FakeMapsHandler,), {"latency": latency})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        # Requests received per API path, for benchmarks that count upstream calls
+        self.httpd.hits = Counter()
+        self.httpd.hits_lock = threading.Lock()
+        self.httpd.faults = faults or Faults()
+        self.httpd.rng = random.Random(seed)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def hits(self) -> Counter:
+        return self.httpd.hits
+
+    def set_faults(self, faults: Faults):
+        with self.httpd.hits_lock:
+            self.httpd.faults = faults
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,228 @@
+"""Local stand-in for the OpenAI chat-completions API.
+
+Answers `POST /v1/chat/completions` with a recommendations reply derived from
+the prompt, so identical prompts get identical replies. The number of
+locations and description length follow what the system prompt asks for
+("3-5 ... location", "20-40 words"), and replies longer than `max_tokens`
+are cut off with finish_reason "length". Supports streaming (server-sent
+events), JSON and function-calling output modes, and injects latency and
+errors from configurable distributions; latency can also grow with the
+number of tokens generated and differ per model.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+CATEGORIES = ["museum", "restaurant", "landmark", "activity", "shopping"]
+
+
+def make_reply(prompt: str, count: Optional[Tuple[int, int]] = None, words: int = 30) -> dict:
+    """A plausible reply whose content depends only on the prompt (and the requested shape)"""
+    rng = random.Random(hashlib.md5(prompt.encode()).hexdigest())
+    match = re.search(r"Current city: (.+)", prompt)
+    city = match.group(1).strip() if match and "Not specified" not in match.group(1) else "Paris"
+    low, high = count or (3, 5)
+    return {
+        "chat_response": f"Here are some places in {city} I think you'll enjoy.",
+        "locations": [
+            {
+                "name": f"{city} {rng.choice(['Gallery', 'Bistro', 'Tower', 'Market', 'Park'])} {rng.randint(1, 99)}",
+                "description": " ".join(rng.choice(["Historic", "cozy", "lively", "quiet", "famous"]) for _ in range(words)),
+                "category": rng.choice(CATEGORIES),
+                "address": f"{rng.randint(1, 200)} Example Street, {city}"
+            }
+            for _ in range(rng.randint(low, high))
+        ]
+    }
+
+
+def requested_shape(messages: list) -> Tuple[Optional[Tuple[int, int]], int]:
+    """(location count range, description words) asked for by the system prompt"""
+    system = " ".join(message.get("content") or "" for message in messages if message.get("role") == "system")
+    count = re.search(r"(\d+)(?:-(\d+))? (?:specific )?location", system)
+    words = re.search(r"(\d+)-(\d+) words", system)
+    return (
+        (int(count.group(1)), int(count.group(2) or count.group(1))) if count else None,
+        (int(words.group(1)) + int(words.group(2))) // 2 if words else 30
+    )
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.hits[self.path] += 1
+            server.requests.append(body)
+            latency = server.latency * server.rng.lognormvariate(0, server.latency_sigma) if server.latency else 0.0
+            roll = server.rng.random()
+        speed = server.model_latency.get(body.get("model"), 1.0)
+
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        time.sleep(latency * speed)
+        if roll < server.error_rate:
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+        if roll < server.error_rate + server.rate_limit_rate:
+            self._send_json(429, {"error": {"message": "Injected rate limit", "type": "rate_limit_error"}})
+            return
+
+        messages = body["messages"]
+        count, words = requested_shape(messages)
+        content = json.dumps(make_reply(messages[-1]["content"], count, words))
+        finish_reason = "stop"
+        max_tokens = body.get("max_tokens")
+        if max_tokens and len(content) // 4 > max_tokens:
+            content = content[:max_tokens * 4]
+            finish_reason = "length"
+        use_tool = bool(body.get("tools"))
+        if use_tool and finish_reason == "stop":
+            finish_reason = "tool_calls"
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        if body.get("stream"):
+            self._stream(body, content, use_tool, finish_reason, speed)
+        else:
+            time.sleep(server.token_latency * speed * (len(content) // 4))
+            self._send_json(200, self._completion(body, content, use_tool, prompt_tokens, finish_reason))
+
+    def _completion(self, body: dict, content: str, use_tool: bool, prompt_tokens: int, finish_reason: str) -> dict:
+        message = {"role": "assistant", "content": None if use_tool else content}
+        if use_tool:
+            message["tool_calls"] = [{
+                "id": "call_fake",
+                "type": "function",
+                "function": {"name": "recommend_locations", "arguments": content}
+            }]
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4
+            }
+        }
+
+    def _stream(self, body: dict, content: str, use_tool: bool, finish_reason: str, speed: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_size = self.server.chunk_size
+        try:
+            for start in range(0, len(content), chunk_size):
+                piece = content[start:start + chunk_size]
+                delta = (
+                    {"tool_calls": [{"index": 0, "function": {"arguments": piece}}]} if use_tool
+                    else {"content": piece}
+                )
+                self._event(self._chunk(body, delta, None))
+                time.sleep(self.server.chunk_delay + self.server.token_latency * speed * (chunk_size // 4))
+            self._event(self._chunk(body, {}, finish_reason))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading
+
+    def _chunk(self, body: dict, delta: dict, finish_reason: Optional[str]) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    def _event(self, payload: dict):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer:
+    """Run the fake OpenAI API on a background thread: `with FakeOpenAIServer() as base_url: ...`
+
+    Latency is `latency` seconds scaled by a log-normal factor with shape
+    `latency_sigma` (0 for a fixed latency), plus `token_latency` seconds per
+    generated token; `model_latency` scales both per model name (e.g. 0.4 for
+    a small, fast model). `error_rate` and `rate_limit_rate` are the
+    fractions of requests answered with 500 and 429.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        latency_sigma: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        chunk_size: int = 40,
+        chunk_delay: float = 0.005,
+        token_latency: float = 0.0,
+        model_latency: Optional[Dict[str, float]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0
+    ):
+        self.httpd = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.latency_sigma = latency_sigma
+        self.httpd.error_rate = error_rate
+        self.httpd.rate_limit_rate = rate_limit_rate
+        self.httpd.chunk_size = chunk_size
+        self.httpd.chunk_delay = chunk_delay
+        self.httpd.token_latency = token_latency
+        self.httpd.model_latency = model_latency or {}
+        self.httpd.rng = random.Random(seed)
+        self.httpd.lock = threading.Lock()
+        self.httpd.hits = Counter()
+        self.httpd.requests = []
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def hits(self) -> Counter:
+        return self.httpd.hits
+
+    @property
+    def requests(self) -> list:
+        """Request bodies received, oldest first (model, max_tokens, messages, ...)"""
+        return self.httpd.requests
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
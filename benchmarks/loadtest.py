@@ -0,0 +1,432 @@
+"""Scenario-based load test of the whole app against fake OpenAI and Maps servers.
+
+By default the app runs in-process (through its lifespan, with every upstream
+pointed at the local fakes), so no API keys or network are needed. Pass
+--url to load-test a server started separately instead, or --workers to
+start serve.py with each given number of worker processes (shared SQLite
+trips and sessions, fakes as upstreams) and report how throughput scales.
+The load generator is a single process, so give it a core of its own when
+measuring scaling.
+
+Reports throughput, latency percentiles per endpoint, error counts and memory,
+saves the results under benchmarks/results/ and compares them with the
+previous run of the same scenario.
+
+Usage:
+    python -m benchmarks.loadtest --scenario mixed --requests 1000 --concurrency 20
+    python -m benchmarks.loadtest --scenario chat --openai-latency 0.8 --openai-error-rate 0.05
+    python -m benchmarks.loadtest --scenario trips --compare benchmarks/results/trips-....json --fail-on-regression 0.1
+    python -m benchmarks.loadtest --scenario trips --workers 1 2 4 --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_maps import Faults, FakeMapsServer
+from benchmarks.fake_openai import FakeOpenAIServer
+
+ROOT = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+CITIES = ["Paris", "Rome", "Tokyo", "Lisbon", "New York"]
+TOPICS = ["museums", "street food", "viewpoints", "markets", "hidden gems", "rainy day ideas", "nightlife"]
+
+
+class LoadContext:
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, worker: int, prompt_pool: int):
+        self.client = client
+        self.rng = rng
+        self.user_id = f"load-user-{worker}"
+        self.prompts = [
+            (f"What are the best {TOPICS[i % len(TOPICS)]} (#{i})?", CITIES[i % len(CITIES)])
+            for i in range(prompt_pool)
+        ]
+        # (label, seconds, status); status 0 means the request raised
+        self.samples: List[tuple] = []
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        headers = {"X-User-Id": self.user_id}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            await response.aread()
+        except httpx.HTTPError:
+            self.samples.append((label, time.perf_counter() - start, 0))
+            return None
+        self.samples.append((label, time.perf_counter() - start, response.status_code))
+        return response
+
+
+async def health(ctx: LoadContext):
+    await ctx.request("GET /health", "GET", "/health")
+
+
+async def chat(ctx: LoadContext):
+    message, city = ctx.rng.choice(ctx.prompts)
+    await ctx.request("POST /api/chat", "POST", "/api/chat", json={"message": message, "city": city})
+
+
+async def chat_stream(ctx: LoadContext):
+    message, city = ctx.rng.choice(ctx.prompts)
+    await ctx.request("POST /api/chat/stream", "POST", "/api/chat/stream", json={"message": message, "city": city})
+
+
+async def trip_session(ctx: LoadContext):
+    """Create a trip, add locations, read it back, remove one and list trips"""
+    response = await ctx.request("POST /api/trip", "POST", "/api/trip", json={"name": "Load test"})
+    if response is None or response.status_code != 200:
+        return
+    trip_id = response.json()["trip"]["id"]
+    city = ctx.rng.choice(CITIES)
+    locations = [
+        {
+            "name": f"{city} stop {i}",
+            "description": "Load test location",
+            "category": "landmark",
+            "address": f"{i} Load Street, {city}",
+            "lat": 48.85 + ctx.rng.random() / 10,
+            "lng": 2.30 + ctx.rng.random() / 10
+        }
+        for i in range(5)
+    ]
+    response = await ctx.request(
+        "POST /api/trip/add-locations", "POST", "/api/trip/add-locations",
+        json={"trip_id": trip_id, "locations": locations}
+    )
+    await ctx.request("GET /api/trip/{id}", "GET", f"/api/trip/{trip_id}")
+    if response is not None and response.status_code == 200:
+        item_id = response.json()["trip"]["items"][0]["id"]
+        await ctx.request(
+            "POST /api/trip/remove-locations", "POST", "/api/trip/remove-locations",
+            json={"trip_id": trip_id, "item_ids": [item_id]}
+        )
+    await ctx.request("GET /api/trips", "GET", "/api/trips")
+
+
+# Each scenario is a weighted mix of operations; one operation may issue several requests
+SCENARIOS = {
+    "health": [(1.0, health)],
+    "chat": [(0.8, chat), (0.2, chat_stream)],
+    "trips": [(1.0, trip_session)],
+    "mixed": [(0.3, health), (0.2, chat), (0.05, chat_stream), (0.45, trip_session)]
+}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def summarize(samples: List[tuple], elapsed: float) -> dict:
+    def stats(rows):
+        latencies = sorted(seconds for _, seconds, _ in rows)
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 1),
+            "errors": sum(1 for _, _, status in rows if status == 0 or status >= 500),
+            "rejected": sum(1 for _, _, status in rows if 400 <= status < 500),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+        }
+
+    by_label = defaultdict(list)
+    for row in samples:
+        by_label[row[0]].append(row)
+    return {
+        "overall": stats(samples),
+        "endpoints": {label: stats(rows) for label, rows in sorted(by_label.items())}
+    }
+
+
+async def run_load(client: httpx.AsyncClient, args) -> List[tuple]:
+    operations = SCENARIOS[args.scenario]
+    weights = [weight for weight, _ in operations]
+    remaining = {"warmup": args.warmup, "ops": args.requests}
+    contexts = []
+
+    async def worker(index: int):
+        ctx = LoadContext(client, random.Random(args.seed * 1000 + index), index, args.prompt_pool)
+        contexts.append(ctx)
+        while remaining["warmup"] > 0 or remaining["ops"] > 0:
+            warmup = remaining["warmup"] > 0
+            remaining["warmup" if warmup else "ops"] -= 1
+            operation = ctx.rng.choices(operations, weights)[0][1]
+            before = len(ctx.samples)
+            await operation(ctx)
+            if warmup:
+                del ctx.samples[before:]
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return [sample for ctx in contexts for sample in ctx.samples]
+
+
+def rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_fakes(args):
+    faults = Faults(latency_sigma=args.latency_sigma, error_rate=args.maps_error_rate)
+    maps = FakeMapsServer(latency=args.maps_latency, faults=faults, seed=args.seed)
+    openai = FakeOpenAIServer(
+        latency=args.openai_latency,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.openai_error_rate,
+        seed=args.seed
+    )
+    return maps, openai
+
+
+def fake_env(maps_url: str, openai_url: str) -> Dict[str, str]:
+    """Settings pointing the app at the fakes, with limits out of the way"""
+    return {
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": openai_url,
+        "GOOGLE_MAPS_API_KEY": "AIza-load-test",
+        "GOOGLE_MAPS_BASE_URL": maps_url,
+        "MAPS_QUERIES_PER_SECOND": "100000",
+        "MAX_REQUESTS_PER_MINUTE": "100000000",
+        "CLIENT_WARM_UP": "false"
+    }
+
+
+async def run_in_process(args) -> dict:
+    maps, openai = make_fakes(args)
+    with maps as maps_url, openai as openai_url:
+        os.environ.update(fake_env(maps_url, openai_url))
+        if "main" in sys.modules:
+            raise RuntimeError("run the load test in a fresh process so settings pick up the fakes")
+        import main
+
+        rss_before = rss_mb()
+        if args.tracemalloc:
+            tracemalloc.start()
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+                start = time.perf_counter()
+                samples = await run_load(client, args)
+                elapsed = time.perf_counter() - start
+        memory = {"peak_rss_mb": round(rss_mb(), 1), "rss_growth_mb": round(rss_mb() - rss_before, 1)}
+        if args.tracemalloc:
+            memory["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.stop()
+        upstream = {"openai_requests": sum(openai.hits.values()), "maps_requests": sum(maps.hits.values())}
+    return {"samples": samples, "elapsed": elapsed, "memory": memory, "upstream": upstream}
+
+
+async def run_remote(url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        samples = await run_load(client, args)
+        elapsed = time.perf_counter() - start
+    return {"samples": samples, "elapsed": elapsed, "memory": None, "upstream": None}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(url: str, workers: int, timeout: float = 60) -> int:
+    """Poll /ready on fresh connections until every worker has answered (or time runs out); return how many did"""
+    ready = set()
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=5, headers={"Connection": "close"}) as client:
+        while len(ready) < workers and time.monotonic() < deadline:
+            try:
+                response = await client.get("/ready")
+                if response.status_code == 200:
+                    ready.add(response.json()["pid"])
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.05)
+    if not ready:
+        raise RuntimeError(f"server at {url} never became ready")
+    return len(ready)
+
+
+async def run_workers(args, workers: int) -> dict:
+    """Start serve.py with `workers` processes against the fakes and load-test it over HTTP"""
+    maps, openai = make_fakes(args)
+    with maps as maps_url, openai as openai_url, tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = {
+            **os.environ,
+            **fake_env(maps_url, openai_url),
+            "TRIP_STORE_BACKEND": "sqlite",
+            "TRIP_DB_PATH": f"{tmp}/trips.db",
+            "SESSION_DB_PATH": f"{tmp}/sessions.db",
+            "DRAIN_DELAY": "0"
+        }
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            seen = await wait_ready(url, workers)
+            if seen < workers:
+                print(f"only {seen} of {workers} workers answered /ready before the run")
+            outcome = await run_remote(url, args)
+        finally:
+            server.terminate()
+            exit_code = server.wait(timeout=120)
+        outcome["upstream"] = {"openai_requests": sum(openai.hits.values()), "maps_requests": sum(maps.hits.values())}
+        outcome["shutdown_exit_code"] = exit_code
+    return outcome
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout
+        return commit + ("-dirty" if dirty.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict):
+    overall = result["summary"]["overall"]
+    print(f"\n{result['scenario']} @ {result['commit']}: {overall['requests']} requests in {result['elapsed_s']}s, "
+          f"concurrency {result['config']['concurrency']}")
+    print(f"{'endpoint':<32} {'requests':>8} {'req/s':>8} {'errors':>7} {'4xx':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(result["summary"]["endpoints"].items()) + [("overall", overall)]
+    for label, stats in rows:
+        print(f"{label:<32} {stats['requests']:>8} {stats['throughput_rps']:>8.1f} {stats['errors']:>7} "
+              f"{stats['rejected']:>5} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    if result["memory"]:
+        print("memory: " + ", ".join(f"{key} {value}" for key, value in result["memory"].items()))
+    if result["upstream"]:
+        print("upstream: " + ", ".join(f"{key} {value}" for key, value in result["upstream"].items()))
+    if "shutdown_exit_code" in result:
+        print(f"server exit code after SIGTERM: {result['shutdown_exit_code']}")
+
+
+def previous_result(scenario: str, exclude: Path) -> Optional[Path]:
+    candidates = sorted(path for path in RESULTS_DIR.glob(f"{scenario}-*.json") if path != exclude)
+    return candidates[-1] if candidates else None
+
+
+def compare(current: dict, previous: dict, threshold: Optional[float]) -> bool:
+    """Print the change per metric; return True if any moved the wrong way by more than `threshold`"""
+    print(f"\ncompared with {previous['scenario']} @ {previous['commit']} ({previous['timestamp']}):")
+    regressed = False
+    before, after = previous["summary"]["overall"], current["summary"]["overall"]
+    for metric, higher_is_better in (("throughput_rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)):
+        old, new = before[metric], after[metric]
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if threshold is not None and worse > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"  {metric:<15} {old:>10.2f} -> {new:>10.2f} ({change:+.1%}){flag}")
+    return regressed
+
+
+def print_scaling(results: List[dict]):
+    base = results[0]["summary"]["overall"]["throughput_rps"] / results[0]["config"]["workers"]
+    print(f"\n{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'speed-up':>9} {'efficiency':>10}")
+    for result in results:
+        workers = result["config"]["workers"]
+        overall = result["summary"]["overall"]
+        speed_up = overall["throughput_rps"] / base if base else 0.0
+        print(f"{workers:>7} {overall['throughput_rps']:>9.1f} {overall['p50_ms']:>9.2f} {overall['p95_ms']:>9.2f} "
+              f"{speed_up:>8.2f}x {speed_up / workers:>10.0%}")
+
+
+def main(args):
+    logging.basicConfig(level=logging.ERROR)
+    if args.workers:
+        results = [run_and_report(args, workers) for workers in args.workers]
+        print_scaling(results)
+        if any(result["regressed"] for result in results):
+            sys.exit(1)
+        return
+    if run_and_report(args)["regressed"]:
+        sys.exit(1)
+
+
+def run_and_report(args, workers: Optional[int] = None) -> dict:
+    if workers:
+        runner = run_workers(args, workers)
+    else:
+        runner = run_remote(args.url, args) if args.url else run_in_process(args)
+    outcome = asyncio.run(runner)
+    # Runs with different worker counts are compared separately
+    scenario = f"{args.scenario}-{workers}w" if workers else args.scenario
+    config = {key: value for key, value in vars(args).items() if key not in ("compare", "fail_on_regression")}
+    config["workers"] = workers
+
+    result = {
+        "scenario": scenario,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "elapsed_s": round(outcome["elapsed"], 2),
+        "summary": summarize(outcome["samples"], outcome["elapsed"]),
+        "memory": outcome["memory"],
+        "upstream": outcome["upstream"]
+    }
+    if "shutdown_exit_code" in outcome:
+        result["shutdown_exit_code"] = outcome["shutdown_exit_code"]
+    print_report(result)
+
+    path = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{scenario}-{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json"
+        path.write_text(json.dumps(result, indent=2))
+        print(f"\nsaved {path}")
+
+    regressed = False
+    baseline = Path(args.compare) if args.compare else previous_result(scenario, path)
+    if baseline and baseline.exists():
+        regressed = compare(result, json.loads(baseline.read_text()), args.fail_on_regression)
+    return {**result, "regressed": regressed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--requests", type=int, default=500, help="operations to run after warm-up")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--prompt-pool", type=int, default=20, help="distinct chat prompts; fewer means more cache hits")
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--maps-latency", type=float, default=0.05)
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="log-normal spread of upstream latency")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--maps-error-rate", type=float, default=0.0)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak (slower)")
+    parser.add_argument("--url", help="load-test a running server instead of the in-process app")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="start serve.py with each of these worker counts and compare throughput")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", help="result file to compare with (default: previous run of the scenario)")
+    parser.add_argument("--fail-on-regression", type=float, metavar="FRACTION",
+                        help="exit 1 if throughput or a latency percentile is this much worse than the baseline")
+    main(parser.parse_args())
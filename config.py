@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import List
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
@@ -12,13 +13,146 @@ class Settings(BaseSettings):
     google_maps_api_key: str = ""
     cors_origins: str = "http://localhost:5173,http://localhost:3000,https://yourdomain.com"
     
-    # OpenAI Configuration
+    # OpenAI Configuration (empty base URL uses the public API)
+    openai_base_url: str = ""
     openai_model: str = "gpt-3.5-turbo"
     openai_temperature: float = 0.7
     openai_max_tokens: int = 1000
+    # "text" (JSON requested in the prompt), "json_object" (JSON mode) or "function" (tool call)
+    openai_output_mode: str = "text"
+    # Model routing: each request is classified as quick, standard or detailed from its length,
+    # whether it names a place, how many places it asks for and itinerary words. Tiers without a
+    # model of their own use openai_model; max_tokens is sized to the reply each tier asks for,
+    # capped by openai_max_tokens (openai_max_tokens_detailed for the detailed tier)
+    openai_routing_enabled: bool = True
+    openai_model_quick: str = ""
+    openai_model_detailed: str = ""
+    openai_max_tokens_detailed: int = 1600
+    # Concurrent OpenAI calls per /api/chat/batch request
+    chat_batch_concurrency: int = 4
+    
+    # Upstream HTTP clients, opened in the app lifespan
+    openai_pool_size: int = 20
+    openai_timeout: float = 30.0
+    openai_max_retries: int = 2
+    client_connect_timeout: float = 5.0
+    client_keepalive_expiry: float = 30.0
+    client_warm_up: bool = True
+    
+    # Google Maps Configuration
+    google_maps_base_url: str = "https://maps.googleapis.com"
+    # Also the size of the Maps connection pool
+    maps_concurrency_limit: int = 10
+    maps_call_timeout: float = 10.0
+    maps_queries_per_second: int = 60
+    maps_max_retries: int = 2
+    # Start a second place-details request if the first is slower than this (0 disables hedging)
+    maps_hedge_delay: float = 0.0
+    
+    # Shared resilience settings: retry backoff, circuit breakers, per-request deadline (0 disables)
+    retry_base_delay: float = 0.2
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    request_deadline: float = 45.0
+    
+    # Geocode/place-details cache (empty db path keeps it in memory only)
+    maps_cache_size: int = 5000
+    maps_cache_ttl: int = 7 * 24 * 3600
+    maps_cache_db_path: str = ""
+    
+    # Location lookups from all requests are collected for `geocode_batch_window` seconds
+    # (or until `geocode_batch_max_size` distinct places wait), deduplicated by name and
+    # address, and resolved at most `geocode_batch_concurrency` at a time (window 0 disables)
+    geocode_batch_window: float = 0.01
+    geocode_batch_max_size: int = 50
+    geocode_batch_concurrency: int = 10
+    
+    # Photo proxy (/api/photos): image bytes cached in memory and, with a directory, on disk
+    photo_cache_memory_bytes: int = 32 * 2 ** 20
+    photo_cache_dir: str = ""
+    photo_cache_disk_bytes: int = 512 * 2 ** 20
+    photo_cache_ttl: int = 7 * 24 * 3600
+    photo_client_max_age: int = 24 * 3600
+    # Where clients reach this API: photo_urls in responses are absolute, since the
+    # frontend is served from another origin and would resolve a bare path against its own
+    public_base_url: str = "http://localhost:8000"
+    
+    # Geocoded places kept for /api/locations queries and to skip repeat lookups. Locations
+    # saved in trips are only listed to their owner, and never stand in for a Maps lookup,
+    # since clients can send any coordinates and photo
+    spatial_index_size: int = 50000
+    
+    # Recommendation cache (similarity threshold 0 disables embedding lookups)
+    recommendation_cache_enabled: bool = True
+    recommendation_cache_size: int = 1000
+    recommendation_cache_ttl: int = 6 * 3600
+    recommendation_cache_similarity: float = 0.0
+    recommendation_cache_db_path: str = ""
+    
+    # Background prefetch of popular destinations, e.g. "Paris:museum,Paris:restaurant,Tokyo"
+    # (categories: museum, restaurant, landmark, activity, shopping; none means general).
+    # Refreshes start `prefetch_refresh_margin` seconds before the cached reply expires and
+    # wait while more than `prefetch_busy_threshold` live requests are in flight.
+    prefetch_enabled: bool = False
+    prefetch_targets: str = ""
+    prefetch_max_per_minute: float = 6
+    prefetch_refresh_margin: int = 15 * 60
+    prefetch_busy_threshold: int = 4
+    # With several workers only the one holding this file lock prefetches. The default is
+    # shared by every worker on the host; give each deployment on one host its own path
+    prefetch_lock_path: str = os.path.join(tempfile.gettempdir(), "travel-api-prefetch.lock")
+    
+    # Token required in X-Admin-Token for /api/admin endpoints (empty leaves them open)
+    admin_token: str = ""
+    
+    # Chat sessions: history kept server-side per session id, and the token budget
+    # for the part of it sent with each prompt
+    session_max_sessions: int = 10000
+    session_ttl: int = 3600
+    session_max_turns: int = 6
+    session_max_locations: int = 50
+    session_history_tokens: int = 600
+    # SQLite file shared by all workers (empty keeps sessions in each process's memory)
+    session_db_path: str = ""
+    
+    # Trip storage: "memory" (per process) or "sqlite" (durable, shared across workers)
+    trip_store_backend: str = "memory"
+    trip_db_path: str = "trips.db"
+    trip_db_pool_size: int = 4
+    # Users whose default trip id is remembered (the rest are looked up in the store)
+    default_trip_cache_size: int = 10000
+    default_trip_cache_ttl: int = 3600
+    
+    # Trip route optimization: travel speed between stops and visit length when a place has none
+    route_travel_speed_kmh: float = 15.0
+    route_default_visit_minutes: int = 60
+    
+    # Production server (python serve.py). On SIGTERM each worker fails /ready for
+    # `drain_delay` seconds while still serving, so load balancers stop routing to it,
+    # then stops accepting and gives open requests up to `graceful_timeout` seconds
+    workers: int = 1
+    host: str = "0.0.0.0"
+    port: int = 8000
+    drain_delay: float = 5.0
+    graceful_timeout: int = 30
+    
+    # Add a Server-Timing header with upstream call timings to each response
+    server_timing_enabled: bool = False
     
     # Rate limiting
     max_requests_per_minute: int = 10
+    # Per-route overrides by path prefix, e.g. "/api/chat=10,/api/trip=60"
+    rate_limit_routes: str = ""
+    # /api/photos has its own bucket: one chat reply loads a photo per place, and
+    # browsers fetch them in parallel (RATE_LIMIT_ROUTES can still override it)
+    rate_limit_photos_per_minute: int = 300
+    # /api/chat/batch too: one batch makes up to 10 OpenAI calls, so by default a
+    # client gets the completions of one full batch a minute, like the default limit
+    rate_limit_chat_batch_per_minute: int = 1
+    # "memory" (per process) or "redis" (shared across workers)
+    rate_limit_backend: str = "memory"
+    rate_limit_idle_ttl: int = 300
+    redis_url: str = "redis://localhost:6379/0"
     
     class Config:
         env_file = ".env"
@@ -1,18 +1,50 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import time
 from config import settings
-from api.routes import chat, trips
-from middleware import RateLimitMiddleware, ErrorHandlingMiddleware, LoggingMiddleware
+from api.routes import admin, chat, locations, photos, trips
+from middleware import (
+    RateLimitMiddleware, ErrorHandlingMiddleware, LoggingMiddleware, MetricsMiddleware, DeadlineMiddleware
+)
+from services import metrics
+from services.lifecycle import lifecycle
+from services.rate_limiter import create_rate_limiter
+from services.registry import ServiceRegistry
+from services.trip_service import trip_service
+
+rate_limiter = create_rate_limiter(settings)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.basicConfig(level=logging.INFO)
     logging.info("Application starting up...")
+    app.state.services = ServiceRegistry(settings)
+    await app.state.services.start()
+    
+    def collect_cache_stats():
+        for name, stats in app.state.services.maps.cache_stats().items():
+            metrics.record_cache_stats(name, stats)
+        metrics.record_cache_stats("recommendations", app.state.services.recommendations.stats())
+        metrics.record_cache_stats("photos", app.state.services.photos.stats())
+        metrics.chat_sessions.set(len(app.state.services.sessions))
+    
+    metrics.registry.add_collector(collect_cache_stats)
+    if app.state.services.prefetcher:
+        app.state.services.prefetcher.start()
+    lifecycle.ready = True
     yield
     logging.info("Application shutting down...")
+    lifecycle.ready = False
+    metrics.registry.remove_collector(collect_cache_stats)
+    await app.state.services.close()
+    await rate_limiter.close()
+    await trip_service.close()
 
 
 app = FastAPI(
@@ -25,7 +57,9 @@ app = FastAPI(
 # Add middleware in correct order
 app.add_middleware(LoggingMiddleware)
 app.add_middleware(ErrorHandlingMiddleware)
-app.add_middleware(RateLimitMiddleware, calls_limit=settings.max_requests_per_minute, time_window=60)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, exempt_paths=("/live", "/ready"))
+app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing_enabled)
+app.add_middleware(DeadlineMiddleware, budget=settings.request_deadline)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,13 +71,62 @@ app.add_middleware(
 
 app.include_router(chat.router, prefix="/api")
 app.include_router(trips.router, prefix="/api")
+app.include_router(locations.router, prefix="/api")
+app.include_router(photos.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "1.0.0"}
+    return {"status": "healthy", "version": "1.0.0", "circuits": app.state.services.circuit_states()}
+
+
+@app.get("/live")
+async def liveness():
+    """The worker's event loop is responsive; restart the process if this stops answering"""
+    return {"status": "alive", "pid": os.getpid(), "uptime_s": round(lifecycle.uptime(), 1)}
+
+
+@app.get("/ready")
+async def readiness():
+    """Whether this worker should receive traffic: started, not draining, trip store reachable.
+
+    Open circuits are reported but don't fail readiness: every worker shares
+    the same upstreams, and trips still work without them. Neither does the
+    rate limiter, which lets requests through while its backend is down.
+    """
+    checks = {}
+    for name, ping in (("trip_store", trip_service.ping),):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(ping(), timeout=2.0)
+            checks[name] = {"ok": True, "ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            checks[name] = {"ok": False, "error": str(e) or type(e).__name__}
+
+    if lifecycle.draining:
+        status = "draining"
+    elif not lifecycle.ready:
+        status = "starting"
+    elif not all(check["ok"] for check in checks.values()):
+        status = "unavailable"
+    else:
+        status = "ready"
+    body = {
+        "status": status,
+        "pid": os.getpid(),
+        "checks": checks,
+        "circuits": app.state.services.circuit_states() if lifecycle.ready else {}
+    }
+    return JSONResponse(body, status_code=200 if status == "ready" else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
+    # Development server; see serve.py for the multi-worker production server
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,59 +1,86 @@
+import math
 import time
 import logging
-from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
-from datetime import datetime, timedelta
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services import metrics
+from services.rate_limiter import RateLimiter
+from services.resilience import deadline
 
 logger = logging.getLogger(__name__)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, calls_limit: int = 10, time_window: int = 60):
-        super().__init__(app)
-        self.calls_limit = calls_limit
-        self.time_window = time_window
-        self.calls = defaultdict(list)
-    
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        now = datetime.now()
-        
-        # Clean old requests
-        self.calls[client_ip] = [
-            call_time for call_time in self.calls[client_ip]
-            if now - call_time < timedelta(seconds=self.time_window)
-        ]
-        
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limiter: RateLimiter, exempt_paths: tuple = ()):
+        self.app = app
+        self.limiter = limiter
+        # Load balancer probes, which must never be throttled
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        result = await self.limiter.hit(client_ip, scope["path"])
+        headers = {
+            "X-RateLimit-Limit": str(result.limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+            "X-RateLimit-Reset": str(math.ceil(result.reset_after))
+        }
+
         # Check rate limit
-        if len(self.calls[client_ip]) >= self.calls_limit:
-            return JSONResponse(
+        if not result.allowed:
+            headers["Retry-After"] = headers["X-RateLimit-Reset"]
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "success": False,
                     "error": "Rate limit exceeded",
-                    "details": f"Maximum {self.calls_limit} requests per {self.time_window} seconds"
-                }
+                    "details": f"Maximum {result.limit} requests per {self.limiter.window} seconds"
+                },
+                headers=headers
             )
-        
-        # Add current request
-        self.calls[client_ip].append(now)
-        
-        response = await call_next(request)
-        return response
+            await response(scope, receive, send)
+            return
+
+        raw_headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + raw_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
 
+class ErrorHandlingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking_start(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
 
-class ErrorHandlingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         try:
-            response = await call_next(request)
-            return response
-        except HTTPException:
-            raise
+            await self.app(scope, receive, send_tracking_start)
         except Exception as e:
             logger.error(f"Unhandled error: {str(e)}", exc_info=True)
-            return JSONResponse(
+            if response_started:
+                # Too late to send an error response; let the server close the connection
+                raise
+            response = JSONResponse(
                 status_code=500,
                 content={
                     "success": False,
@@ -61,19 +88,88 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
                     "details": "An unexpected error occurred"
                 }
             )
+            await response(scope, receive, send)
+
 
+class LoggingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
         start_time = time.time()
-        
-        response = await call_next(request)
-        
-        process_time = time.time() - start_time
-        logger.info(
-            f"{request.method} {request.url.path} - "
-            f"Status: {response.status_code} - "
-            f"Time: {process_time:.3f}s"
-        )
-        
-        return response
\ No newline at end of file
+        status_code = 500
+
+        async def send_capturing_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_capturing_status)
+        finally:
+            process_time = time.time() - start_time
+            logger.info(
+                f"{scope['method']} {scope['path']} - "
+                f"Status: {status_code} - "
+                f"Time: {process_time:.3f}s"
+            )
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        token, timings = metrics.start_request_timings()
+        metrics.http_requests_in_flight.inc()
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    value = metrics.format_server_timing(timings, time.perf_counter() - start_time)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.http_requests_in_flight.dec()
+            metrics.finish_request_timings(token)
+            # The router records the matched endpoint in the scope; use it to keep label cardinality low
+            endpoint = scope.get("endpoint")
+            metrics.http_request_duration.observe(
+                time.perf_counter() - start_time,
+                method=scope["method"],
+                endpoint=endpoint.__name__ if endpoint else "unmatched",
+                status=status_code
+            )
+
+
+class DeadlineMiddleware:
+    """Give each request a total time budget that upstream calls draw down"""
+
+    def __init__(self, app: ASGIApp, budget: float):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.budget:
+            await self.app(scope, receive, send)
+            return
+
+        with deadline(self.budget):
+            await self.app(scope, receive, send)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional, Literal, get_args
 from datetime import datetime
 
 
@@ -25,6 +25,19 @@ class Location(BaseModel):
     photo_url: Optional[str] = None
 
 
+class LocationSuggestion(BaseModel):
+    """A location as recommended by the model, before geocoding"""
+    name: str
+    description: str
+    category: LocationCategory
+    address: str
+    
+    @field_validator('category', mode='before')
+    @classmethod
+    def unknown_category_is_other(cls, value):
+        return value if value in get_args(LocationCategory) else 'other'
+
+
 class ChatMessage(BaseModel):
     id: str
     type: Literal['user', 'assistant', 'system']
@@ -44,6 +57,10 @@ class ChatRequest(BaseModel):
     message: str = Field(..., max_length=500)
     city: Optional[str] = None
     context: Optional[dict] = None
+    # Skip place photos (and their details field) when the client won't show them
+    include_photos: bool = True
+    # Continue a conversation kept on the server; omitted starts a new one
+    session_id: Optional[str] = Field(None, max_length=64, pattern=r"^[\w-]+$")
 
 
 class ChatResponse(BaseModel):
@@ -51,6 +68,48 @@ class ChatResponse(BaseModel):
     chat_response: str
     locations: List[Location]
     map_bounds: Optional[MapBounds] = None
+    cache_status: Optional[Literal['hit', 'similar', 'coalesced', 'miss', 'bypass']] = None
+    session_id: Optional[str] = None
+
+
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest] = Field(..., min_length=1, max_length=10)
+
+
+class ChatBatchItem(BaseModel):
+    success: bool
+    chat_response: Optional[str] = None
+    locations: List[Location] = []
+    map_bounds: Optional[MapBounds] = None
+    cache_status: Optional[Literal['hit', 'similar', 'coalesced', 'miss', 'bypass']] = None
+    session_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ChatBatchResponse(BaseModel):
+    success: bool
+    results: List[ChatBatchItem]
+    map_bounds: Optional[MapBounds] = None
+
+
+class ChatStreamEvent(BaseModel):
+    type: Literal['text', 'location', 'done', 'error']
+    delta: Optional[str] = None
+    location: Optional[Location] = None
+    map_bounds: Optional[MapBounds] = None
+    chat_response: Optional[str] = None
+    locations: Optional[List[Location]] = None
+    session_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ChatSessionResponse(BaseModel):
+    session_id: str
+    city: Optional[str] = None
+    turns: int
+    summary: List[str]
+    recommended_locations: List[str]
+    history_tokens: int
 
 
 class ErrorResponse(BaseModel):
@@ -76,4 +135,78 @@ class Trip(BaseModel):
     
 class TripResponse(BaseModel):
     success: bool
-    trip: Trip
\ No newline at end of file
+    trip: Trip
+
+# Location search models
+class NearbyLocation(BaseModel):
+    location: Location
+    distance_m: float
+
+
+class NearbyLocationsResponse(BaseModel):
+    success: bool
+    locations: List[NearbyLocation]
+
+
+class LocationsResponse(BaseModel):
+    success: bool
+    locations: List[Location]
+
+
+# Route optimization models
+class TripDay(BaseModel):
+    day: int
+    items: List[TripItem]
+    distance_m: float
+    visit_minutes: float
+    travel_minutes: float
+
+
+class TripRouteResponse(BaseModel):
+    success: bool
+    trip_id: str
+    items: List[TripItem]
+    distance_m: float
+    original_distance_m: float
+    days: Optional[List[TripDay]] = None
+
+
+# Admin models
+class PrefetchTargetStatus(BaseModel):
+    city: str
+    category: Optional[str] = None
+    message: str
+    refreshes: int
+    failures: int
+    last_error: Optional[str] = None
+    last_refreshed: Optional[float] = None
+    next_refresh: float
+    locations: int
+    geocoded: int
+    duration_s: Optional[float] = None
+
+
+class ModelRouteStats(BaseModel):
+    requests: int
+    avg_seconds: float
+    avg_prompt_tokens: float
+    avg_completion_tokens: float
+    truncated: int
+
+
+class ModelRoutesResponse(BaseModel):
+    enabled: bool
+    models: Dict[str, str]
+    routes: Dict[str, ModelRouteStats]
+
+
+class PrefetchStatusResponse(BaseModel):
+    enabled: bool
+    running: bool = False
+    # False in workers waiting for another process's prefetch lock
+    leader: bool = False
+    started_at: Optional[float] = None
+    deferrals: int = 0
+    prefetch_hits: int = 0
+    hit_contribution: float = 0.0
+    targets: List[PrefetchTargetStatus] = []
@@ -0,0 +1,105 @@
+"""Production server: N uvicorn worker processes sharing one listening socket.
+
+Each worker is a separate process with its own event loop, service registry
+and in-memory caches. State that must agree across workers lives in shared
+backends: trips in SQLite (TRIP_STORE_BACKEND=sqlite), rate limits in Redis
+(RATE_LIMIT_BACKEND=redis) and chat sessions in SQLite (SESSION_DB_PATH).
+The Maps and recommendation cache files (MAPS_CACHE_DB_PATH,
+RECOMMENDATION_CACHE_DB_PATH) can be shared too: they run in WAL mode and
+are written from a background thread in each worker.
+
+On SIGTERM/SIGINT each worker first drains: /ready answers 503 for
+DRAIN_DELAY seconds while requests are still served, so load balancers stop
+routing to it. Then it stops accepting connections and gives open requests
+up to GRACEFUL_TIMEOUT seconds to finish before the app shuts down.
+
+Usage: python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import asyncio
+import logging
+from types import FrameType
+from typing import Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from config import settings
+from services.lifecycle import lifecycle
+
+logger = logging.getLogger("serve")
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that reports not ready for `drain_delay` seconds before shutting down"""
+
+    def __init__(self, config: uvicorn.Config, drain_delay: float):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        if lifecycle.draining or not self.started or self.drain_delay <= 0:
+            # A second signal (or nothing to drain) stops right away
+            super().handle_exit(sig, frame)
+            return
+        lifecycle.draining = True
+        logger.info(f"Draining for {self.drain_delay:g}s before shutdown")
+        asyncio.get_running_loop().call_later(self.drain_delay, super().handle_exit, sig, frame)
+
+
+class DrainingSupervisor(Multiprocess):
+    """Signals every worker before waiting on any, so they drain in parallel rather than one by one"""
+
+    def shutdown(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        logger.info(f"Stopped {len(self.processes)} workers")
+
+
+def shared_state_warnings(workers: int) -> list:
+    """Settings that keep state in one process, which workers would then disagree on"""
+    if workers <= 1:
+        return []
+    warnings = []
+    if settings.trip_store_backend == "memory":
+        warnings.append("TRIP_STORE_BACKEND=memory: each worker has its own trips; use sqlite")
+    if settings.rate_limit_backend == "memory":
+        warnings.append(f"RATE_LIMIT_BACKEND=memory: each worker counts separately (up to {workers}x the limit); use redis")
+    if not settings.session_db_path:
+        warnings.append("SESSION_DB_PATH unset: chat sessions only continue on the worker that started them")
+    if settings.prefetch_enabled and not settings.prefetch_lock_path:
+        warnings.append("PREFETCH_LOCK_PATH unset: every worker runs its own prefetcher")
+    return warnings
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO)
+    for warning in shared_state_warnings(args.workers):
+        logger.warning(warning)
+
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        access_log=False
+    )
+    server = DrainingServer(config, drain_delay=settings.drain_delay)
+    if args.workers <= 1:
+        server.run()
+        return
+    # Workers are spawned processes sharing the parent's socket; on SIGTERM the
+    # parent signals each of them and waits for them to drain and exit
+    sock = config.bind_socket()
+    DrainingSupervisor(config, target=server.run, sockets=[sock]).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=settings.workers)
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    main(parser.parse_args())
@@ -0,0 +1,407 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_key(*parts: Optional[str]) -> str:
+    """Build a case/whitespace/punctuation-insensitive cache key"""
+    text = " ".join(part for part in parts if part)
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _connect_cache_db(path: str, busy_timeout_ms: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout_ms / 1000)
+    conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class TTLCache:
+    """Size-bounded LRU cache with per-entry TTL and an optional SQLite tier.
+
+    Values must be JSON serializable when a db_path is given. The SQLite tier
+    is shared by namespace, so several caches (and several worker processes)
+    can use the same file; it runs in WAL mode so readers don't wait for
+    writers. Disk writes happen on a background thread, batched into one
+    transaction per burst, so `set` never blocks the event loop on disk I/O.
+    Reads that miss memory go to disk with a short busy timeout; any SQLite
+    error there counts as a miss. `compact`, if given, is applied to values
+    before they are held in memory (e.g. to share strings between entries).
+    """
+
+    # Reads run on the caller's thread (often the event loop): give up quickly
+    READ_BUSY_TIMEOUT_MS = 100
+    WRITE_BUSY_TIMEOUT_MS = 5000
+    # Most queued writes committed in one transaction
+    WRITE_BATCH = 500
+
+    def __init__(
+        self,
+        namespace: str,
+        max_size: int = 1000,
+        ttl: float = 3600,
+        db_path: Optional[str] = None,
+        compact: Optional[Callable[[Any], Any]] = None
+    ):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.compact = compact
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_errors = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        if db_path:
+            writer_db = _connect_cache_db(db_path, self.WRITE_BUSY_TIMEOUT_MS)
+            with writer_db:
+                writer_db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+                )
+            self._db = _connect_cache_db(db_path, self.READ_BUSY_TIMEOUT_MS)
+            self._writer = threading.Thread(
+                target=self._write_loop, args=(writer_db,), name=f"cache-{namespace}", daemon=True
+            )
+            self._writer.start()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._read(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", key
+                )
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    if self.compact is not None:
+                        value = self.compact(value)
+                    self._store(key, value, row[1])
+                    self.hits += 1
+                    return value
+                if row:
+                    self._writes.put(("delete", key))
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def expires_in(self, key: str) -> Optional[float]:
+        """Seconds until a live entry expires, or None if there is none; doesn't count as a lookup"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            expires_at = entry[1] if entry is not None else None
+            if expires_at is None and self._db is not None:
+                row = self._read("SELECT expires_at FROM cache WHERE namespace = ? AND key = ?", key)
+                expires_at = row[0] if row else None
+        if expires_at is None or expires_at <= now:
+            return None
+        return expires_at - now
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value if self.compact is None else self.compact(value), expires_at)
+            if self._db is not None:
+                try:
+                    # Serialized now, so later changes to `value` don't reach the disk
+                    self._writes.put(("set", key, json.dumps(value), expires_at))
+                except TypeError as e:
+                    logger.warning(f"Cache disk write failed for {self.namespace}: {str(e)}")
+
+    def _store(self, key: str, value: Any, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read(self, sql: str, key: str) -> Optional[tuple]:
+        try:
+            return self._db.execute(sql, (self.namespace, key)).fetchone()
+        except sqlite3.Error as e:
+            # Locked or damaged file: fall back to a miss rather than failing the request
+            self.disk_errors += 1
+            logger.warning(f"Cache disk read failed for {self.namespace}: {str(e)}")
+            return None
+
+    def _write_loop(self, db: sqlite3.Connection):
+        """Apply queued writes, committing everything queued so far in one transaction"""
+        while True:
+            ops = [self._writes.get()]
+            while ops[-1] is not None and len(ops) < self.WRITE_BATCH:
+                try:
+                    ops.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = ops[-1] is None
+            try:
+                with db:
+                    for op in ops:
+                        if op is None:
+                            continue
+                        if op[0] == "set":
+                            db.execute(
+                                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) "
+                                "VALUES (?, ?, ?, ?)",
+                                (self.namespace, op[1], op[2], op[3])
+                            )
+                        elif op[0] == "delete":
+                            db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, op[1]))
+                        else:
+                            db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                logger.warning(f"Cache disk write failed for {self.namespace}: {str(e)}")
+            finally:
+                for _ in ops:
+                    self._writes.task_done()
+            if stop:
+                db.close()
+                return
+
+    def flush(self):
+        """Wait until queued disk writes are committed"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._writes.put(("clear",))
+
+    def close(self):
+        """Commit queued writes and close the SQLite tier"""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "disk_errors": self.disk_errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class ByteCache:
+    """LRU cache for binary blobs (e.g. images), bounded by total bytes.
+
+    Each entry carries a content type and an expiry. With a `directory`,
+    entries also go to disk (one file per key, bounded by `max_disk_bytes`,
+    least recently read evicted first), so they survive restarts and can be
+    shared by workers on the same host. Disk reads, writes and eviction run
+    in worker threads, never on the event loop or under the memory lock.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_bytes: int = 32 * 2 ** 20,
+        ttl: float = 7 * 24 * 3600,
+        directory: Optional[str] = None,
+        max_disk_bytes: int = 512 * 2 ** 20
+    ):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        # key -> (data, content_type, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._directory: Optional[Path] = None
+        # Guards the disk counters; file I/O itself runs outside any lock
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        self._evicting = False
+        if directory:
+            self._directory = Path(directory) / namespace
+            self._directory.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(path.stat().st_size for path in self._directory.glob("*.bin"))
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """(data, content_type) for a live entry, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                data, content_type, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return data, content_type
+                self._drop(key)
+                self.expirations += 1
+
+        if self._directory is not None:
+            entry = await asyncio.to_thread(self._read_file, key, now)
+            if entry is not None:
+                with self._lock:
+                    self._store(key, *entry)
+                    self.hits += 1
+                return entry[0], entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, data: bytes, content_type: str, ttl: Optional[float] = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                self._store(key, data, content_type, expires_at)
+        if self._directory is not None:
+            await asyncio.to_thread(self._write_file, key, data, content_type, expires_at)
+
+    def _store(self, key: str, data: bytes, content_type: str, expires_at: float):
+        self._drop(key)
+        self._entries[key] = (data, content_type, expires_at)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def _path(self, key: str) -> Path:
+        return self._directory / f"{hashlib.sha256(key.encode()).hexdigest()}.bin"
+
+    def _read_file(self, key: str, now: float) -> Optional[tuple]:
+        """Files hold a JSON header line (content type, expiry) followed by the data"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache disk read failed for {self.namespace}: {str(e)}")
+            return None
+        if header["expires_at"] <= now:
+            self._remove_file(path)
+            with self._disk_lock:
+                self.expirations += 1
+            return None
+        # Reads refresh the modification time, which orders disk eviction
+        path.touch()
+        return data, header["content_type"], header["expires_at"]
+
+    def _write_file(self, key: str, data: bytes, content_type: str, expires_at: float):
+        path = self._path(key)
+        header = json.dumps({"key": key, "content_type": content_type, "expires_at": expires_at}).encode()
+        temp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            previous = path.stat().st_size if path.exists() else 0
+            with open(temp, "wb") as f:
+                f.write(header + b"\n" + data)
+            os.replace(temp, path)
+            size = path.stat().st_size
+        except OSError as e:
+            logger.warning(f"Cache disk write failed for {self.namespace}: {str(e)}")
+            return
+        with self._disk_lock:
+            self._disk_bytes += size - previous
+            # One eviction pass at a time; writes meanwhile are caught by the next one
+            evict = self._disk_bytes > self.max_disk_bytes and not self._evicting
+            self._evicting = self._evicting or evict
+        if evict:
+            try:
+                self._evict_files()
+            finally:
+                self._evicting = False
+
+    def _evict_files(self):
+        """Remove least recently read files until the directory is back under 90% of its limit"""
+        files = []
+        for path in self._directory.glob("*.bin"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        with self._disk_lock:
+            self._disk_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            self._remove_file(path)
+            with self._disk_lock:
+                self.evictions += 1
+
+    def _remove_file(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._disk_lock:
+            self._disk_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_bytes": self._disk_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from models.schemas import Location
+from services import metrics
+from services.cache import normalize_key
+from services.resilience import DeadlineExceeded, wait_timeout
+
+# (normalized name and address, include_photos)
+LookupKey = Tuple[str, bool]
+
+
+@dataclass
+class _Lookup:
+    loc_data: dict
+    include_photos: bool
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.perf_counter)
+    waiters: int = 0
+    task: Optional[asyncio.Task] = None
+    # Spans the lookup recorded, added to each waiter's Server-Timing
+    timings: List[Tuple[str, float]] = field(default_factory=list)
+
+
+class GeocodeBatcher:
+    """Gather location lookups from all in-flight requests and resolve each place once.
+
+    Lookups submitted within `window` seconds of the first one in a batch (or
+    until `max_batch` distinct places are waiting) form one batch. Places are
+    deduplicated by normalized name and address, both within the batch and
+    against lookups from earlier batches that are still running. Each distinct
+    place is resolved with `resolve`, at most `concurrency` at a time across
+    all requests, and every waiting request gets the result with its own
+    name, description and category.
+
+    Lookups run in a fresh context, not the one of the request that happened
+    to flush the batch, so they carry no request's deadline. Each waiting
+    request applies its own deadline to its wait instead, and gets the
+    lookup's spans in its Server-Timing.
+    As with SingleFlight, a request that is cancelled or out of time only
+    stops waiting; a lookup is dropped once nobody is waiting on it any more.
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[dict, bool], Awaitable[Optional[Location]]],
+        window: float = 0.01,
+        max_batch: int = 50,
+        concurrency: int = 10
+    ):
+        self.resolve = resolve
+        self.window = window
+        self.max_batch = max_batch
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Waiting for the window to close
+        self._pending: Dict[LookupKey, _Lookup] = {}
+        # Flushed and not yet resolved (queued on the semaphore or running)
+        self._running: Dict[LookupKey, _Lookup] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.resolved = 0
+
+    async def submit(self, loc_data: dict, include_photos: bool = True) -> Optional[Location]:
+        key = (normalize_key(loc_data.get('name'), loc_data.get('address')), include_photos)
+        self.submitted += 1
+        lookup = self._pending.get(key) or self._running.get(key)
+        if lookup is not None:
+            self.deduplicated += 1
+            metrics.geocode_batch_deduplicated.inc()
+        else:
+            lookup = _Lookup(loc_data, include_photos, asyncio.get_running_loop().create_future())
+            self._pending[key] = lookup
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+            self._update_gauges()
+
+        lookup.waiters += 1
+        try:
+            location = await asyncio.wait_for(asyncio.shield(lookup.future), wait_timeout())
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if not lookup.future.done() and lookup.waiters == 1:
+                self._abandon(key, lookup)
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded(f"Geocoding {loc_data.get('name')} ran out of request budget") from e
+            raise
+        finally:
+            lookup.waiters -= 1
+            if lookup.future.done():
+                metrics.add_request_timings(lookup.timings)
+        if location is None or lookup.loc_data is loc_data:
+            return location
+        # Same place, described by another request
+        return location.model_copy(update={
+            'name': loc_data['name'],
+            'description': loc_data['description'],
+            'category': loc_data['category']
+        })
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self.batches += 1
+        metrics.geocode_batch_size.observe(len(batch))
+        for key, lookup in batch.items():
+            self._running[key] = lookup
+            task, lookup.timings = metrics.detached_task(self._run(lookup))
+            lookup.task = task
+            self._tasks.add(task)
+            task.add_done_callback(lambda task, key=key, lookup=lookup: self._finish(key, lookup, task))
+        self._update_gauges()
+
+    def _abandon(self, key: LookupKey, lookup: _Lookup):
+        if self._pending.get(key) is lookup:
+            del self._pending[key]
+            lookup.future.cancel()
+            self._update_gauges()
+        elif lookup.task is not None:
+            # Forget it now, so nobody joins a lookup that is being cancelled
+            if self._running.get(key) is lookup:
+                del self._running[key]
+                self._update_gauges()
+            lookup.task.cancel()
+
+    async def _run(self, lookup: _Lookup):
+        async with self._semaphore:
+            metrics.geocode_queue_wait.observe(time.perf_counter() - lookup.queued_at)
+            return await self.resolve(lookup.loc_data, lookup.include_photos)
+
+    def _finish(self, key: LookupKey, lookup: _Lookup, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._running.get(key) is lookup:
+            del self._running[key]
+        if task.cancelled():
+            lookup.future.cancel()
+        elif task.exception() is not None:
+            lookup.future.set_exception(task.exception())
+            # Retrieve it so a lookup nobody waits on doesn't log "never retrieved"
+            lookup.future.exception()
+        else:
+            lookup.future.set_result(task.result())
+        self.resolved += 1
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.geocode_queue_depth.set(len(self._pending), state="pending")
+        metrics.geocode_queue_depth.set(len(self._running), state="running")
+
+    def queue_depth(self) -> Dict[str, int]:
+        return {"pending": len(self._pending), "running": len(self._running)}
+
+    def close(self):
+        """Cancel the open batch and running lookups; their waiters get CancelledError"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for task in list(self._tasks):
+            task.cancel()
+        for lookup in self._pending.values():
+            lookup.future.cancel()
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "resolved": self.resolved,
+            **self.queue_depth()
+        }
@@ -0,0 +1,154 @@
+import json
+import logging
+from typing import List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationStreamParser:
+    """Incrementally scan a streamed `{"chat_response": ..., "locations": [...]}` reply.
+
+    `feed()` returns the events that became available with the new chunk:
+    ("text", delta) while the chat_response string is being written, and
+    ("location", dict) as soon as each object in the locations array closes.
+    Anything before the first `{` (markdown fences, preamble) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.chat_response = ""
+        self.locations: List[dict] = []
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._locations_depth: Optional[int] = None
+        self._object_start: Optional[int] = None
+        self._text_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self.buffer += chunk
+        events: List[Tuple[str, object]] = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(i, events)
+                continue
+
+            if not self._stack:
+                if char == "{":
+                    self._stack.append("{")
+                    self._expect_key = True
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+                if len(self._stack) == 1 and not self._expect_key and self._last_key == "chat_response":
+                    self._text_start = i + 1
+            elif char == ":":
+                self._expect_key = False
+            elif char == ",":
+                self._expect_key = self._stack[-1] == "{"
+            elif char in "{[":
+                if (char == "[" and len(self._stack) == 1 and self._last_key == "locations"
+                        and self._locations_depth is None):
+                    self._locations_depth = 2
+                if char == "{" and len(self._stack) == self._locations_depth:
+                    self._object_start = i
+                self._stack.append(char)
+                self._expect_key = char == "{"
+            elif char in "}]":
+                self._stack.pop()
+                if (char == "}" and self._object_start is not None
+                        and len(self._stack) == self._locations_depth):
+                    self._emit_location(buffer[self._object_start:i + 1], events)
+                    self._object_start = None
+                elif char == "]" and len(self._stack) + 1 == self._locations_depth:
+                    self._locations_depth = -1
+                self._expect_key = False
+
+        self._pos = len(buffer)
+
+        # Stream the part of chat_response written so far
+        if self._in_string and self._text_start is not None:
+            self._emit_text(buffer[self._text_start:], events)
+
+        return events
+
+    @property
+    def found_json(self) -> bool:
+        """Whether a top-level JSON object with at least one key was seen"""
+        return self._last_key is not None
+
+    def _close_string(self, end: int, events: List[Tuple[str, object]]):
+        if len(self._stack) == 1 and self._expect_key:
+            self._last_key = json.loads(self.buffer[self._string_start:end + 1])
+        elif self._text_start is not None:
+            self._emit_text(self.buffer[self._text_start:end], events)
+            self._text_start = None
+
+    def _emit_text(self, raw: str, events: List[Tuple[str, object]]):
+        try:
+            text = json.loads(f'"{raw}"', strict=False)
+        except json.JSONDecodeError:
+            # An escape sequence is still being streamed; wait for the next chunk
+            return
+        if len(text) > len(self.chat_response):
+            events.append(("text", text[len(self.chat_response):]))
+            self.chat_response = text
+
+    def _emit_location(self, raw: str, events: List[Tuple[str, object]]):
+        try:
+            location = json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping malformed streamed location: {raw[:100]}")
+            return
+        if isinstance(location, dict):
+            self.locations.append(location)
+            events.append(("location", location))
+
+
+def _strip_fence(text: str) -> str:
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text
+
+
+def parse_recommendations(content: str) -> Tuple[Optional[str], List[dict], bool]:
+    """Parse a complete (or cut-off) reply into (chat_response, locations, complete).
+
+    chat_response is None when the reply contains no JSON object at all.
+    Valid JSON, optionally inside a markdown fence, takes the json.loads fast
+    path; anything else goes through the incremental parser, which recovers
+    the chat_response and every location object that was fully written.
+    """
+    text = content.strip()
+    try:
+        data = json.loads(_strip_fence(text), strict=False)
+        if isinstance(data, dict):
+            locations = data.get('locations') or []
+            return data.get('chat_response', ''), [loc for loc in locations if isinstance(loc, dict)], True
+    except json.JSONDecodeError:
+        pass
+
+    parser = RecommendationStreamParser()
+    parser.feed(text)
+    if not parser.found_json:
+        return None, [], False
+    return parser.chat_response, parser.locations, False
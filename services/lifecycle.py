@@ -0,0 +1,23 @@
+import time
+
+
+class Lifecycle:
+    """Where this worker process is in its life, for the /live and /ready probes.
+
+    `ready` is set once the app lifespan has started its services and cleared
+    when it shuts down. `draining` is set when the server is asked to stop
+    (see serve.py): the worker keeps serving but reports not ready, so load
+    balancers move new traffic to other workers first.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.ready = False
+        self.draining = False
+
+    def uptime(self) -> float:
+        return time.time() - self.started_at
+
+
+# Global instance, one per worker process
+lifecycle = Lifecycle()
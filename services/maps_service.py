@@ -1,77 +1,305 @@
+import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Tuple
 import googlemaps
+import requests
 from config import settings
 from models.schemas import Location, AdditionalInfo, MapBounds
+from services import metrics
+from services.cache import TTLCache, normalize_key
+from services.geocode_batcher import GeocodeBatcher
+from services.place_store import intern_strings
+from services.resilience import CircuitBreaker, ResilientUpstream, RetryPolicy
+from services.singleflight import SingleFlight
+from services.spatial_index import SpatialIndex
 
 
 logger = logging.getLogger(__name__)
 
+PLACE_FIELDS = [
+    'name', 'formatted_address', 'geometry', 'opening_hours',
+    'price_level', 'rating', 'website', 'business_status'
+]
+
+
+class PhotoNotFound(Exception):
+    """Google doesn't know the photo reference"""
+
+
+def is_retriable_maps_error(error: BaseException) -> bool:
+    if isinstance(error, (
+        googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError,
+        requests.ConnectionError, requests.Timeout
+    )):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, googlemaps.exceptions.ApiError) and error.status in ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")
+
+
+def create_maps_upstream() -> ResilientUpstream:
+    return ResilientUpstream(
+        "maps",
+        timeout=settings.maps_call_timeout,
+        retry=RetryPolicy(attempts=settings.maps_max_retries + 1, base_delay=settings.retry_base_delay),
+        breaker=CircuitBreaker(
+            "maps",
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_timeout=settings.circuit_reset_timeout
+        ),
+        is_retriable=is_retriable_maps_error,
+        hedge_delay=settings.maps_hedge_delay or None
+    )
+
 
 class GoogleMapsService:
-    def __init__(self):
-        self.client = googlemaps.Client(key=settings.google_maps_api_key)
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        index: Optional[SpatialIndex] = None,
+        upstream: Optional[ResilientUpstream] = None,
+        batch_window: Optional[float] = None
+    ):
+        self.client = googlemaps.Client(
+            key=settings.google_maps_api_key,
+            timeout=settings.maps_call_timeout,
+            # Over-quota responses are retried with jittered backoff by self.upstream;
+            # 5xx retries inside the client stop at the per-call timeout
+            retry_timeout=settings.maps_call_timeout,
+            retry_over_query_limit=False,
+            queries_per_second=settings.maps_queries_per_second,
+            requests_session=session,
+            base_url=settings.google_maps_base_url
+        )
+        self.upstream = upstream or create_maps_upstream()
+        # googlemaps.Client is synchronous, so upstream calls run in a bounded
+        # worker pool instead of blocking the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.maps_concurrency_limit,
+            thread_name_prefix="maps"
+        )
+        self._semaphore = asyncio.Semaphore(settings.maps_concurrency_limit)
+        
+        # Cached results share their strings (addresses, opening hours, keys) with each
+        # other and with the spatial index's place records
+        cache_options = dict(
+            max_size=settings.maps_cache_size,
+            ttl=settings.maps_cache_ttl,
+            db_path=settings.maps_cache_db_path or None,
+            compact=intern_strings
+        )
+        self.search_cache = TTLCache("place_search", **cache_options)
+        self.details_cache = TTLCache("place_details", **cache_options)
+        self.geocode_cache = TTLCache("geocode", **cache_options)
+        # Concurrent cache misses for the same query share one upstream call
+        self._flight = SingleFlight()
+        # Places geocoded before are answered without upstream calls
+        self.index = index
+        self.index_hits = 0
+        # Lookups from concurrent requests are batched and deduplicated before they
+        # reach the caches and upstream calls
+        batch_window = settings.geocode_batch_window if batch_window is None else batch_window
+        self.batcher = GeocodeBatcher(
+            self._resolve_location,
+            window=batch_window,
+            max_batch=settings.geocode_batch_max_size,
+            concurrency=settings.geocode_batch_concurrency
+        ) if batch_window > 0 else None
     
-    async def geocode_locations(self, locations: List[dict]) -> List[Location]:
-        geocoded_locations = []
+    async def geocode_locations(self, locations: List[dict], include_photos: bool = True) -> List[Location]:
+        # Resolve all locations concurrently, keeping the original order
+        results = await asyncio.gather(
+            *(self._geocode_single_location(loc_data, include_photos) for loc_data in locations),
+            return_exceptions=True
+        )
         
-        for loc_data in locations:
-            try:
-                location = await self._geocode_single_location(loc_data)
-                if location:
-                    geocoded_locations.append(location)
-            except Exception as e:
-                logger.warning(f"Failed to geocode location {loc_data.get('name', 'Unknown')}: {str(e)}")
+        geocoded_locations = []
+        for loc_data, result in zip(locations, results):
+            # Includes CancelledError from lookups cancelled under a batch
+            if isinstance(result, BaseException):
+                logger.warning(
+                    f"Failed to geocode location {loc_data.get('name', 'Unknown')}: {str(result) or type(result).__name__}"
+                )
                 continue
+            if result:
+                geocoded_locations.append(result)
         
         return geocoded_locations
     
-    async def _geocode_single_location(self, loc_data: dict) -> Optional[Location]:
+    async def geocode_location(self, loc_data: dict, include_photos: bool = True) -> Optional[Location]:
+        return await self._geocode_single_location(loc_data, include_photos)
+    
+    async def fetch_photo(self, photo_reference: str, max_width: int) -> Tuple[bytes, str]:
+        """Image bytes and content type of a place photo"""
+        return await self._call(self.place_photo, photo_reference=photo_reference, max_width=max_width)
+    
+    def place_photo(self, photo_reference: str, max_width: int) -> Tuple[bytes, str]:
+        # Blocking; Google answers with a redirect to the image host, which requests follows
+        response = self.client.session.get(
+            f"{settings.google_maps_base_url}/maps/api/place/photo",
+            params={"photoreference": photo_reference, "maxwidth": max_width, "key": self.client.key},
+            timeout=settings.maps_call_timeout
+        )
+        if response.status_code in (400, 404):
+            raise PhotoNotFound(photo_reference)
+        response.raise_for_status()
+        return response.content, response.headers.get("Content-Type", "image/jpeg")
+    
+    async def _call(self, method, hedge: bool = False, **kwargs):
+        """Run a blocking client call in the worker pool, with timeouts, retries and the circuit breaker"""
+        loop = asyncio.get_running_loop()
+        
+        async def attempt():
+            async with self._semaphore:
+                return await loop.run_in_executor(self._executor, functools.partial(method, **kwargs))
+        
+        with metrics.span("maps", method.__name__):
+            return await self.upstream.call(method.__name__, attempt, hedge=hedge)
+    
+    async def _shared(self, call: str, key: str, fn):
+        """Join an identical in-flight lookup instead of starting another one"""
+        if self._flight.in_flight((call, key)):
+            metrics.upstream_coalesced.inc(upstream="maps", call=call)
+        return await self._flight.do((call, key), fn)
+    
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for cache in (self.search_cache, self.details_cache, self.geocode_cache):
+            cache.close()
+    
+    def cache_stats(self) -> dict:
+        return {
+            "place_search": self.search_cache.stats(),
+            "place_details": self.details_cache.stats(),
+            "geocode": self.geocode_cache.stats()
+        }
+    
+    def flight_stats(self) -> dict:
+        return {"upstream_calls": self._flight.calls, "coalesced": self._flight.coalesced}
+    
+    def batch_stats(self) -> Optional[dict]:
+        return self.batcher.stats() if self.batcher is not None else None
+    
+    async def _geocode_single_location(self, loc_data: dict, include_photos: bool = True) -> Optional[Location]:
+        # Places already in the index don't need to wait for a batch
+        known = self._known_location(loc_data, include_photos)
+        if known is not None:
+            return known
+        if self.batcher is not None:
+            return await self.batcher.submit(loc_data, include_photos)
+        return await self._resolve_location(loc_data, include_photos)
+    
+    def _known_location(self, loc_data: dict, include_photos: bool = True) -> Optional[Location]:
+        if self.index is None:
+            return None
+        known = self.index.lookup(loc_data.get('name', ''), loc_data.get('address', ''))
+        # An entry indexed without a photo may have been looked up with photos skipped
+        if known is None or not (known.photo_url or not include_photos):
+            return None
+        self.index_hits += 1
+        return known.model_copy(update={
+            'name': loc_data['name'],
+            'description': loc_data['description'],
+            'category': loc_data['category'],
+            'photo_url': known.photo_url if include_photos else None
+        })
+    
+    async def _resolve_location(self, loc_data: dict, include_photos: bool = True) -> Optional[Location]:
         try:
             address = loc_data.get('address', '')
             name = loc_data.get('name', '')
             
             # First try Places API for more detailed info
-            place_result = await self._search_place(name, address)
+            location = None
+            place_result = await self._search_place(name, address, include_photos)
             if place_result:
-                return self._create_location_from_place(loc_data, place_result)
+                location = self._create_location_from_place(loc_data, place_result, include_photos)
+            else:
+                # Fallback to Geocoding API
+                geocode_result = await self._geocode_address(address)
+                if geocode_result:
+                    location = self._create_location_from_geocode(loc_data, geocode_result)
             
-            # Fallback to Geocoding API
-            geocode_result = self.client.geocode(address)
-            if geocode_result:
-                return self._create_location_from_geocode(loc_data, geocode_result[0])
-            
-            return None
+            if location is not None and self.index is not None:
+                self.index.add(location, aliases=[(name, address)])
+            return location
             
         except Exception as e:
             logger.error(f"Geocoding error for {loc_data.get('name', 'Unknown')}: {str(e)}")
             return None
     
-    async def _search_place(self, name: str, address: str) -> Optional[dict]:
+    async def _geocode_address(self, address: str) -> Optional[dict]:
+        cache_key = normalize_key(address)
+        cached = self.geocode_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        return await self._shared("geocode", cache_key, lambda: self._fetch_geocode(address, cache_key))
+    
+    async def _fetch_geocode(self, address: str, cache_key: str) -> Optional[dict]:
+        geocode_result = await self._call(self.client.geocode, address=address)
+        if geocode_result:
+            self.geocode_cache.set(cache_key, geocode_result[0])
+            return geocode_result[0]
+        return None
+    
+    async def _search_place(self, name: str, address: str, include_photos: bool = True) -> Optional[dict]:
         try:
             # Search for place by name and address
-            query = f"{name} {address}"
-            places_result = self.client.places(query=query)
+            query_key = normalize_key(name, address)
+            place_id = self.search_cache.get(query_key)
             
-            if places_result['results']:
-                place_id = places_result['results'][0]['place_id']
-                
-                # Get detailed place information
-                place_details = self.client.place(
-                    place_id=place_id,
-                    fields=['name', 'formatted_address', 'geometry', 'opening_hours', 
-                           'price_level', 'rating', 'website', 'business_status', 'photo']
+            if place_id is None:
+                place_id = await self._shared(
+                    "places", query_key, lambda: self._fetch_place_id(f"{name} {address}", query_key)
                 )
-                
-                return place_details['result']
+                if place_id is None:
+                    return None
             
-            return None
+            return await self._get_place_details(place_id, include_photos)
             
         except Exception as e:
             logger.warning(f"Places API search failed: {str(e)}")
             return None
     
-    def _create_location_from_place(self, loc_data: dict, place_result: dict) -> Location:
+    async def _fetch_place_id(self, query: str, query_key: str) -> Optional[str]:
+        places_result = await self._call(self.client.places, query=query)
+        if not places_result['results']:
+            return None
+        place_id = places_result['results'][0]['place_id']
+        self.search_cache.set(query_key, place_id)
+        return place_id
+    
+    async def _get_place_details(self, place_id: str, include_photos: bool = True) -> Optional[dict]:
+        # Details fetched with photos also answer lookups that skip them
+        cached = self.details_cache.get(place_id)
+        if cached is None and not include_photos:
+            cached = self.details_cache.get(f"{place_id}:basic")
+        if cached is not None:
+            return cached
+        
+        key = place_id if include_photos else f"{place_id}:basic"
+        return await self._shared("place", key, lambda: self._fetch_place_details(place_id, key, include_photos))
+    
+    async def _fetch_place_details(self, place_id: str, cache_key: str, include_photos: bool) -> Optional[dict]:
+        # Get detailed place information
+        place_details = await self._call(
+            self.client.place,
+            hedge=True,
+            place_id=place_id,
+            fields=PLACE_FIELDS + (['photo'] if include_photos else [])
+        )
+        
+        result = place_details.get('result')
+        if result:
+            self.details_cache.set(cache_key, result)
+        return result
+    
+    def _create_location_from_place(self, loc_data: dict, place_result: dict, include_photos: bool = True) -> Location:
         geometry = place_result.get('geometry', {})
         location_coords = geometry.get('location', {})
         
@@ -94,12 +322,13 @@ class GoogleMapsService:
         if 'website' in place_result:
             additional_info.website = place_result['website']
         
-        # Get photo URL if available
+        # Photos are served through /api/photos, which fetches them on demand
+        # and keeps the API key out of the response
         photo_url = None
-        if 'photos' in place_result and place_result['photos']:
+        if include_photos and place_result.get('photos'):
             photo_reference = place_result['photos'][0]['photo_reference']
-            # Create photo URL (max width 200px for info cards)
-            photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=200&photoreference={photo_reference}&key={self.client.key}"
+            # Max width 200px for info cards
+            photo_url = f"{settings.public_base_url.rstrip('/')}/api/photos/{photo_reference}?maxwidth=200"
         
         return Location(
             name=loc_data['name'],
@@ -0,0 +1,273 @@
+import asyncio
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Coroutine, Dict, Iterator, List, Optional, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans recorded while handling the current request, for the Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.label_names, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Run `collector` before each scrape, e.g. to copy cache stats into gauges"""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint", ("method", "endpoint", "status")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled"
+))
+upstream_call_duration = registry.register(Histogram(
+    "upstream_call_duration_seconds", "Latency of calls to upstream services", ("upstream", "call", "outcome")
+))
+upstream_coalesced = registry.register(Counter(
+    "upstream_coalesced_total", "Upstream calls avoided by joining an identical in-flight call", ("upstream", "call")
+))
+upstream_retries = registry.register(Counter(
+    "upstream_retries_total", "Upstream calls retried after a transient failure", ("upstream", "call")
+))
+upstream_hedges = registry.register(Counter(
+    "upstream_hedges_total", "Hedged second attempts started for slow upstream calls", ("upstream", "call")
+))
+upstream_circuit_state = registry.register(Gauge(
+    "upstream_circuit_state", "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)", ("upstream",)
+))
+openai_tokens = registry.register(Counter(
+    "openai_tokens_total", "Tokens reported by OpenAI responses", ("model", "type")
+))
+openai_route_duration = registry.register(Histogram(
+    "openai_route_duration_seconds", "OpenAI completion time by route and model", ("route", "model")
+))
+openai_route_tokens = registry.register(Counter(
+    "openai_route_tokens_total", "OpenAI tokens by route (estimated for streams)", ("route", "type")
+))
+openai_route_truncated = registry.register(Counter(
+    "openai_route_truncated_total", "Replies cut off by the route's max_tokens", ("route",)
+))
+chat_history_tokens = registry.register(Histogram(
+    "chat_history_tokens", "Estimated tokens of session history sent with each prompt",
+    buckets=(0, 50, 100, 200, 400, 800, 1600, 3200)
+))
+chat_sessions = registry.register(Gauge(
+    "chat_sessions", "Conversation sessions held in memory"
+))
+cache_requests = registry.register(Gauge(
+    "cache_requests", "Cache lookups by cache and result", ("cache", "result")
+))
+cache_hit_ratio = registry.register(Gauge(
+    "cache_hit_ratio", "Cache hit ratio since startup", ("cache",)
+))
+prefetch_refreshes = registry.register(Counter(
+    "prefetch_refreshes_total", "Background prefetch refreshes by outcome", ("outcome",)
+))
+geocode_queue_depth = registry.register(Gauge(
+    "geocode_queue_depth", "Distinct places waiting for the batch window or a lookup slot", ("state",)
+))
+geocode_queue_wait = registry.register(Histogram(
+    "geocode_queue_wait_seconds", "Time a place waited in the geocode batcher before its lookup started"
+))
+geocode_batch_size = registry.register(Histogram(
+    "geocode_batch_size", "Distinct places per geocode batch", buckets=(1, 2, 5, 10, 20, 50, 100)
+))
+geocode_batch_deduplicated = registry.register(Counter(
+    "geocode_batch_deduplicated_total", "Location lookups answered by another request's queued or running lookup"
+))
+rate_limit_rejections = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter", ("route",)
+))
+rate_limit_backend_errors = registry.register(Counter(
+    "rate_limit_backend_errors_total", "Requests let through unchecked because the rate-limit backend failed"
+))
+
+
+@contextmanager
+def span(upstream: str, call: str) -> Iterator[None]:
+    """Time an upstream call: `with span("maps", "places"): ...`"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except TimeoutError:
+        outcome = "timeout"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_call_duration.observe(elapsed, upstream=upstream, call=call, outcome=outcome)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((f"{upstream}.{call}", elapsed))
+
+
+def record_token_usage(model: str, usage) -> None:
+    if usage is None:
+        return
+    openai_tokens.inc(usage.prompt_tokens or 0, model=model, type="prompt")
+    openai_tokens.inc(usage.completion_tokens or 0, model=model, type="completion")
+
+
+def record_cache_stats(name: str, stats: dict) -> None:
+    cache_requests.set(stats.get("hits", 0), cache=name, result="hit")
+    cache_requests.set(stats.get("misses", 0), cache=name, result="miss")
+    cache_hit_ratio.set(stats.get("hit_rate", 0.0), cache=name)
+
+
+def start_request_timings() -> Tuple[contextvars.Token, List[Tuple[str, float]]]:
+    """Collect spans for the current request; tasks it spawns append to the same list"""
+    timings: List[Tuple[str, float]] = []
+    return _request_timings.set(timings), timings
+
+
+def finish_request_timings(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def detached_task(coro: Coroutine) -> Tuple[asyncio.Task, List[Tuple[str, float]]]:
+    """Run `coro` as a task that belongs to no request, for work shared between requests.
+
+    It starts from an empty context, so it carries no request's deadline, and
+    its spans go to a list of their own. Each request that waits for it adds
+    them to its Server-Timing with `add_request_timings`.
+    """
+    context = contextvars.Context()
+    timings: List[Tuple[str, float]] = []
+    context.run(_request_timings.set, timings)
+    return asyncio.get_running_loop().create_task(coro, context=context), timings
+
+
+def add_request_timings(timings: List[Tuple[str, float]]):
+    """Add spans recorded by shared work to the current request's Server-Timing"""
+    own = _request_timings.get()
+    if own is not None and own is not timings:
+        own.extend(timings)
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,219 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, get_args
+from config import settings
+from models.schemas import LocationCategory
+
+
+# The prompt used for every request before routing; kept for openai_routing_enabled=false
+DEFAULT_SYSTEM_PROMPT = """You are an expert travel assistant. When users ask about places to visit, respond with a conversational message AND provide structured location data.
+
+Requirements:
+1. Provide 3-5 specific location recommendations
+2. Include exact addresses for geocoding
+3. Write engaging descriptions (50-100 words each)
+4. Categorize each location (museum, restaurant, landmark, activity, shopping)
+5. Consider user's interests and travel style
+
+Response format: JSON with 'chat_response' and 'locations' array. Each location must have: name, description, category, address.
+Example categories: museum, restaurant, landmark, activity, shopping, other"""
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "a couple of": 2, "a few": 3, "several": 5
+}
+PLACE_NOUNS = (
+    r"places|spots|restaurants|museums|things|ideas|locations|attractions|sights|bars|cafes|cafés|"
+    r"shops|stops|activities|landmarks|options|recommendations|galleries|parks|markets|hotels"
+)
+# "5 places", "three good restaurants", "a few hidden cafes"
+REQUESTED_COUNT = re.compile(
+    rf"\b(\d{{1,2}}|{'|'.join(NUMBER_WORDS)})\s+(?:[\w'-]+\s+){{0,2}}?(?:{PLACE_NOUNS})\b", re.IGNORECASE
+)
+# Questions that need a plan or comparison rather than a short list
+DETAILED_WORDS = re.compile(
+    r"\b(itinerary|itineraries|plan|planning|schedule|route|day trip|\d+\s*-?\s*days?|weekend|week|"
+    r"compare|versus|vs)\b",
+    re.IGNORECASE
+)
+# "in Paris", "near Shibuya": a place named in the message itself
+NAMED_PLACE = re.compile(r"\b(?:in|near|around|at|of)\s+[A-Z][\w'-]+")
+
+# Rough output tokens per JSON location (name, address, category, punctuation)
+# on top of its description, and for the chat message and the wrapper. Words
+# are counted generously: models overshoot a requested word range
+TOKENS_PER_LOCATION = 45
+TOKENS_PER_WORD = 1.6
+TOKENS_BASE = 110
+
+
+@dataclass(frozen=True)
+class Route:
+    """How to ask for one kind of request: which model, how long a reply, and what to ask for"""
+    name: str
+    model: str
+    max_tokens: int
+    locations: Tuple[int, int]
+    description_words: Tuple[int, int]
+
+
+@dataclass
+class RequestFeatures:
+    chars: int
+    names_place: bool
+    requested: Optional[int]
+    detailed: bool
+    history_turns: int
+
+
+def extract_features(
+    user_message: str,
+    city: Optional[str] = None,
+    context: Optional[dict] = None,
+    history: Optional[List[dict]] = None
+) -> RequestFeatures:
+    match = REQUESTED_COUNT.search(user_message)
+    requested = None
+    if match:
+        word = match.group(1).lower()
+        requested = int(word) if word.isdigit() else NUMBER_WORDS[word]
+    return RequestFeatures(
+        chars=len(user_message),
+        names_place=bool(city or (context or {}).get("city") or NAMED_PLACE.search(user_message)),
+        requested=requested,
+        detailed=bool(DETAILED_WORDS.search(user_message)),
+        history_turns=sum(1 for message in history or [] if message["role"] == "user")
+    )
+
+
+def reply_budget(locations: int, words: int) -> int:
+    """max_tokens for a reply of `locations` places with descriptions up to `words` words"""
+    return int(TOKENS_BASE + locations * (TOKENS_PER_LOCATION + words * TOKENS_PER_WORD))
+
+
+class ModelRouter:
+    """Pick a model tier and reply budget for each request.
+
+    "quick": a short question about a named place asking for a handful of
+    spots; a small model, 20-40 word descriptions. "detailed": itineraries,
+    comparisons, long questions or more than five places; the large model and
+    a bigger budget. Everything else is "standard". max_tokens is sized to
+    the places and description length the prompt asks for, so a reply is
+    rarely cut off and never pays for room it won't use. Tiers without their
+    own model use openai_model.
+
+    Also keeps per-route counts, latency and token usage for /api/admin.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        default_model: Optional[str] = None,
+        quick_model: Optional[str] = None,
+        detailed_model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        detailed_max_tokens: Optional[int] = None
+    ):
+        self.enabled = enabled
+        self.default_model = default_model or settings.openai_model
+        self.quick_model = quick_model or self.default_model
+        self.detailed_model = detailed_model or self.default_model
+        self.max_tokens = max_tokens or settings.openai_max_tokens
+        self.detailed_max_tokens = detailed_max_tokens or settings.openai_max_tokens_detailed
+        self._prompts: Dict[Tuple[str, Tuple[int, int], Tuple[int, int], str], str] = {}
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        return cls(
+            enabled=settings.openai_routing_enabled,
+            quick_model=settings.openai_model_quick or None,
+            detailed_model=settings.openai_model_detailed or None
+        )
+
+    def route(
+        self,
+        user_message: str,
+        city: Optional[str] = None,
+        context: Optional[dict] = None,
+        history: Optional[List[dict]] = None
+    ) -> Route:
+        if not self.enabled:
+            return Route("default", self.default_model, self.max_tokens, (3, 5), (50, 100))
+
+        features = extract_features(user_message, city, context, history)
+        requested = min(features.requested, 10) if features.requested else None
+        if features.detailed or (requested or 0) > 5 or features.chars > 300:
+            count = (requested, requested) if requested else (5, 8)
+            words = (30, 50)
+            return Route(
+                "detailed", self.detailed_model,
+                min(reply_budget(count[1], words[1]), self.detailed_max_tokens), count, words
+            )
+        if features.chars <= 80 and features.names_place and not features.history_turns and (requested or 3) <= 3:
+            count = (requested, requested) if requested else (3, 3)
+            words = (20, 40)
+            return Route("quick", self.quick_model, min(reply_budget(count[1], words[1]), self.max_tokens), count, words)
+        count = (requested, requested) if requested else (3, 5)
+        words = (40, 70)
+        return Route("standard", self.default_model, min(reply_budget(count[1], words[1]), self.max_tokens), count, words)
+
+    def system_prompt(self, route: Route, output_mode: str) -> str:
+        """Instructions for the route, without the format text when a function schema carries it"""
+        if route.name == "default":
+            return DEFAULT_SYSTEM_PROMPT
+        key = (route.name, route.locations, route.description_words, output_mode)
+        prompt = self._prompts.get(key)
+        if prompt is None:
+            low, high = route.locations
+            count = f"{low}" if low == high else f"{low}-{high}"
+            lines = [
+                "You are an expert travel assistant. Reply with a short conversational message and structured location data.",
+                f"- Recommend {count} specific locations, with exact addresses for geocoding",
+                f"- Descriptions of {route.description_words[0]}-{route.description_words[1]} words each",
+                f"- Category: one of {', '.join(get_args(LocationCategory))}"
+            ]
+            if route.name != "quick":
+                lines.append("- Consider the traveller's interests and travel style")
+            if route.name == "detailed":
+                lines.append("- For itineraries, list places in visiting order and mention the day or time in each description")
+            if output_mode != "function":
+                lines.append(
+                    'Respond with JSON: {"chat_response": "...", "locations": '
+                    '[{"name": "...", "description": "...", "category": "...", "address": "..."}]}'
+                )
+            prompt = self._prompts[key] = "\n".join(lines)
+        return prompt
+
+    def record(
+        self,
+        route: Route,
+        seconds: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        truncated: bool = False
+    ):
+        with self._lock:
+            stats = self._stats.setdefault(route.name, {
+                "requests": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "truncated": 0
+            })
+            stats["requests"] += 1
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["truncated"] += int(truncated)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {
+                    "requests": stats["requests"],
+                    "avg_seconds": round(stats["seconds"] / stats["requests"], 4),
+                    "avg_prompt_tokens": round(stats["prompt_tokens"] / stats["requests"], 1),
+                    "avg_completion_tokens": round(stats["completion_tokens"] / stats["requests"], 1),
+                    "truncated": stats["truncated"]
+                }
+                for name, stats in self._stats.items()
+            }
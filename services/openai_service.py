@@ -1,88 +1,286 @@
+import copy
+import hashlib
 import json
 import logging
-from typing import List, Optional, Tuple
+import time
+from typing import AsyncIterator, List, Optional, Tuple, get_args
+import openai
 from openai import AsyncOpenAI
+from pydantic import ValidationError
 from config import settings
-from models.schemas import Location, LocationCategory
+from models.schemas import Location, LocationCategory, LocationSuggestion
+from services import metrics
+from services.json_stream import RecommendationStreamParser, parse_recommendations
+from services.model_router import ModelRouter, Route
+from services.resilience import CircuitBreaker, ResilientUpstream, RetryPolicy, UpstreamUnavailable
+from services.session_store import estimate_tokens
+from services.singleflight import SingleFlight
 
 
 logger = logging.getLogger(__name__)
 
+# Function-calling schema for openai_output_mode="function"
+RECOMMENDATION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "recommend_locations",
+        "description": "Reply to the traveller and list the recommended locations",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "chat_response": {"type": "string"},
+                "locations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "description": {"type": "string"},
+                            "category": {"type": "string", "enum": list(get_args(LocationCategory))},
+                            "address": {"type": "string"}
+                        },
+                        "required": ["name", "description", "category", "address"]
+                    }
+                }
+            },
+            "required": ["chat_response", "locations"]
+        }
+    }
+}
+
+
+def is_retriable_openai_error(error: BaseException) -> bool:
+    return isinstance(error, (
+        openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError
+    ))
 
-class OpenAIService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.system_prompt = """You are an expert travel assistant. When users ask about places to visit, respond with a conversational message AND provide structured location data.
 
-Requirements:
-1. Provide 3-5 specific location recommendations
-2. Include exact addresses for geocoding
-3. Write engaging descriptions (50-100 words each)
-4. Categorize each location (museum, restaurant, landmark, activity, shopping)
-5. Consider user's interests and travel style
+def create_openai_upstream() -> ResilientUpstream:
+    return ResilientUpstream(
+        "openai",
+        timeout=settings.openai_timeout,
+        retry=RetryPolicy(attempts=settings.openai_max_retries + 1, base_delay=settings.retry_base_delay),
+        breaker=CircuitBreaker(
+            "openai",
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_timeout=settings.circuit_reset_timeout
+        ),
+        is_retriable=is_retriable_openai_error
+    )
 
-Response format: JSON with 'chat_response' and 'locations' array. Each location must have: name, description, category, address.
-Example categories: museum, restaurant, landmark, activity, shopping, other"""
+
+class OpenAIService:
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        upstream: Optional[ResilientUpstream] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        # Retries happen in self.upstream, where they respect the request deadline
+        self.client = client or AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
+        self.upstream = upstream or create_openai_upstream()
+        # Picks the model, max_tokens and instructions for each request
+        self.router = router or ModelRouter.from_settings()
+        # Identical prompts sent while one is already in flight share its completion
+        self._flight = SingleFlight()
 
     async def get_travel_recommendations(
         self, 
         user_message: str, 
         city: Optional[str] = None,
-        context: Optional[dict] = None
+        context: Optional[dict] = None,
+        history: Optional[List[dict]] = None
     ) -> Tuple[str, List[dict]]:
+        route = self.router.route(user_message, city, context, history)
+        messages = self._build_messages(user_message, city, context, history, route)
+        key = self._prompt_key(messages, route)
+        if self._flight.in_flight(key):
+            metrics.upstream_coalesced.inc(upstream="openai", call="chat.completions")
+        chat_response, locations = await self._flight.do(key, lambda: self._complete(messages, route))
+        return chat_response, copy.deepcopy(locations)
+    
+    async def _complete(self, messages: List[dict], route: Route) -> Tuple[str, List[dict]]:
         try:
-            user_context = f"Current city: {city or 'Not specified'}\n"
-            if context and context.get('previous_locations'):
-                user_context += f"Previous recommendations: {len(context['previous_locations'])} locations\n"
-            
-            prompt = f"{user_context}User question: {user_message}\n\nProvide travel recommendations in JSON format."
-            
-            response = await self.client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=settings.openai_temperature,
-                max_tokens=settings.openai_max_tokens,
-            )
+            start = time.perf_counter()
+            with metrics.span("openai", "chat.completions"):
+                response = await self.upstream.call("chat.completions", lambda: self.client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=settings.openai_temperature,
+                    max_tokens=route.max_tokens,
+                    **self._output_options()
+                ))
+            usage = getattr(response, 'usage', None)
+            metrics.record_token_usage(route.model, usage)
             
-            content = response.choices[0].message.content
+            choice = response.choices[0]
+            content = self._reply_text(choice.message)
             logger.info(f"OpenAI raw response: {content}")
+            truncated = choice.finish_reason == "length"
+            if truncated:
+                logger.warning(f"OpenAI response was cut off at max_tokens={route.max_tokens} ({route.name} route)")
+            self._record_route(
+                route,
+                time.perf_counter() - start,
+                usage.prompt_tokens if usage else sum(estimate_tokens(m["content"]) for m in messages),
+                usage.completion_tokens if usage else estimate_tokens(content or ""),
+                truncated
+            )
             
-            # Try to parse as JSON
-            try:
-                data = json.loads(content)
-                chat_response = data.get('chat_response', '')
-                locations = data.get('locations', [])
-                
-                # Validate and clean locations
-                valid_locations = []
-                for loc in locations:
-                    if self._validate_location(loc):
-                        valid_locations.append(loc)
-                    else:
-                        logger.warning(f"Invalid location data: {loc}")
-                
-                return chat_response, valid_locations
-                
-            except json.JSONDecodeError:
-                # Fallback: treat entire response as chat_response
-                logger.warning("Failed to parse JSON from OpenAI response")
-                return content, []
+            return self._parse_reply(content)
             
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"OpenAI service error: {str(e)}")
+            raise Exception(f"Failed to get AI recommendations: {str(e)}")
+    
+    async def stream_travel_recommendations(
+        self, 
+        user_message: str, 
+        city: Optional[str] = None,
+        context: Optional[dict] = None,
+        history: Optional[List[dict]] = None
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """Yield ("text", delta) and ("location", dict) events while the completion streams,
+        then a final ("done", chat_response) event"""
+        route = self.router.route(user_message, city, context, history)
+        messages = self._build_messages(user_message, city, context, history, route)
+        start = time.perf_counter()
+        try:
+            # Measures time until the stream opens; the reply itself arrives incrementally.
+            # Only opening the stream is retried: nothing has been sent to the client yet
+            with metrics.span("openai", "chat.completions.stream"):
+                stream = await self.upstream.call("chat.completions.stream", lambda: self.client.chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=settings.openai_temperature,
+                    max_tokens=route.max_tokens,
+                    stream=True,
+                    **self._output_options()
+                ))
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             logger.error(f"OpenAI service error: {str(e)}")
             raise Exception(f"Failed to get AI recommendations: {str(e)}")
+        
+        parser = RecommendationStreamParser()
+        truncated = False
+        async for chunk in stream:
+            if chunk.choices and getattr(chunk.choices[0], "finish_reason", None) == "length":
+                truncated = True
+            text = self._reply_text(chunk.choices[0].delta) if chunk.choices else None
+            if not text:
+                continue
+            
+            for event_type, payload in parser.feed(text):
+                if event_type == "location":
+                    payload = self._validate_location(payload)
+                    if payload is None:
+                        continue
+                yield event_type, payload
+        
+        logger.info(f"OpenAI streamed response: {parser.buffer}")
+        # Streams don't report usage; estimate it
+        self._record_route(
+            route,
+            time.perf_counter() - start,
+            sum(estimate_tokens(message["content"]) for message in messages),
+            estimate_tokens(parser.buffer),
+            truncated
+        )
+        
+        # Fallback: a reply without JSON is treated as the chat response
+        if not parser.chat_response and not parser.locations:
+            yield "text", parser.buffer
+            yield "done", parser.buffer
+        else:
+            yield "done", parser.chat_response
+    
+    def _build_messages(
+        self, 
+        user_message: str, 
+        city: Optional[str] = None,
+        context: Optional[dict] = None,
+        history: Optional[List[dict]] = None,
+        route: Optional[Route] = None
+    ) -> List[dict]:
+        """System prompt, then earlier conversation from the session store, then this question"""
+        route = route or self.router.route(user_message, city, context, history)
+        if route.name == "default":
+            user_context = f"Current city: {city or 'Not specified'}\n"
+        else:
+            # Routed prompts leave out what adds nothing; the system prompt already asks for JSON
+            user_context = f"Current city: {city}\n" if city else ""
+        if context and context.get('previous_locations'):
+            user_context += f"Previous recommendations: {len(context['previous_locations'])} locations\n"
+        
+        prompt = f"{user_context}User question: {user_message}"
+        if route.name == "default":
+            prompt += "\n\nProvide travel recommendations in JSON format."
+        
+        return [
+            {"role": "system", "content": self.router.system_prompt(route, settings.openai_output_mode)},
+            *(history or []),
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _prompt_key(self, messages: List[dict], route: Route) -> str:
+        """Everything that goes into the request, so only truly identical calls are shared"""
+        payload = json.dumps([
+            messages, route.model, settings.openai_temperature,
+            route.max_tokens, settings.openai_output_mode
+        ])
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _record_route(self, route: Route, seconds: float, prompt_tokens: int, completion_tokens: int, truncated: bool):
+        self.router.record(route, seconds, prompt_tokens, completion_tokens, truncated)
+        metrics.openai_route_duration.observe(seconds, route=route.name, model=route.model)
+        metrics.openai_route_tokens.inc(prompt_tokens, route=route.name, type="prompt")
+        metrics.openai_route_tokens.inc(completion_tokens, route=route.name, type="completion")
+        if truncated:
+            metrics.openai_route_truncated.inc(route=route.name)
     
-    def _validate_location(self, location: dict) -> bool:
-        required_fields = ['name', 'description', 'category', 'address']
-        if not all(field in location for field in required_fields):
-            return False
+    def _output_options(self) -> dict:
+        """Request arguments for the configured openai_output_mode"""
+        mode = settings.openai_output_mode
+        if mode == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        if mode == "function":
+            return {
+                "tools": [RECOMMENDATION_TOOL],
+                "tool_choice": {"type": "function", "function": {"name": "recommend_locations"}}
+            }
+        return {}
+    
+    def _reply_text(self, message) -> Optional[str]:
+        """Text of a message or stream delta; function arguments in function mode"""
+        if getattr(message, 'tool_calls', None):
+            return message.tool_calls[0].function.arguments
+        return message.content
+    
+    def _parse_reply(self, content: str) -> Tuple[str, List[dict]]:
+        chat_response, locations, complete = parse_recommendations(content or "")
+        if chat_response is None:
+            # Fallback: treat entire response as chat_response
+            logger.warning("Failed to parse JSON from OpenAI response")
+            return content, []
+        if not complete:
+            logger.warning(f"Recovered {len(locations)} locations from incomplete JSON response")
         
-        # Validate category
-        valid_categories = ['museum', 'restaurant', 'landmark', 'activity', 'shopping', 'other']
-        if location['category'] not in valid_categories:
-            location['category'] = 'other'
+        # Validate and clean locations
+        valid_locations = []
+        for loc in locations:
+            location = self._validate_location(loc)
+            if location is not None:
+                valid_locations.append(location)
         
-        return True
\ No newline at end of file
+        return chat_response, valid_locations
+    
+    def _validate_location(self, location: dict) -> Optional[dict]:
+        try:
+            return LocationSuggestion.model_validate(location).model_dump()
+        except ValidationError:
+            logger.warning(f"Invalid location data: {location}")
+            return None
@@ -0,0 +1,64 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Tuple
+from services import metrics
+from services.cache import ByteCache
+from services.maps_service import GoogleMapsService
+from services.singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+# Requested widths are rounded up to one of these, so clients share cache entries
+PHOTO_WIDTHS = (100, 200, 400, 800, 1600)
+
+
+def photo_width(requested: int) -> int:
+    return next((width for width in PHOTO_WIDTHS if width >= requested), PHOTO_WIDTHS[-1])
+
+
+def photo_etag(reference: str, width: int) -> str:
+    """A photo reference always names the same image, so the ETag needs no image bytes"""
+    return '"' + hashlib.sha256(f"{reference}:{width}".encode()).hexdigest()[:32] + '"'
+
+
+@dataclass
+class Photo:
+    data: bytes
+    content_type: str
+    etag: str
+
+
+class PhotoService:
+    """Place photos served from our own URL and fetched from Google at most once.
+
+    Images are kept in a ByteCache (memory, optionally disk); concurrent
+    requests for a photo that isn't cached yet share one download.
+    """
+
+    def __init__(self, maps: GoogleMapsService, cache: ByteCache):
+        self.maps = maps
+        self.cache = cache
+        self._flight = SingleFlight()
+
+    async def get(self, reference: str, max_width: int) -> Photo:
+        width = photo_width(max_width)
+        key = f"{reference}:{width}"
+        cached = await self.cache.get(key)
+        if cached is None:
+            if self._flight.in_flight(key):
+                metrics.upstream_coalesced.inc(upstream="maps", call="place_photo")
+            cached = await self._flight.do(key, lambda: self._fetch(key, reference, width))
+        data, content_type = cached
+        return Photo(data, content_type, photo_etag(reference, width))
+
+    async def _fetch(self, key: str, reference: str, width: int) -> Tuple[bytes, str]:
+        data, content_type = await self.maps.fetch_photo(reference, width)
+        await self.cache.set(key, data, content_type)
+        return data, content_type
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        stats.update({"upstream_calls": self._flight.calls, "coalesced": self._flight.coalesced})
+        return stats
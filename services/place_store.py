@@ -0,0 +1,161 @@
+import sys
+import weakref
+from dataclasses import dataclass
+from typing import Any, Optional, get_args
+from models.schemas import Location, LocationCategory
+from services.cache import normalize_key
+
+
+# One shared string per category instead of one per parsed location
+_CATEGORIES = {category: category for category in get_args(LocationCategory)}
+
+
+def _intern(text: Optional[str]) -> Optional[str]:
+    return sys.intern(text) if text else text
+
+
+def intern_strings(value: Any) -> Any:
+    """A copy of JSON-shaped data with every string and key interned.
+
+    For cache entries that must stay JSON (they round-trip through SQLite):
+    a place's name, address and the like, and the keys of every entry, are
+    then held once across the caches and the place records.
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return {sys.intern(key) if isinstance(key, str) else key: intern_strings(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [intern_strings(item) for item in value]
+    return value
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class PlaceRecord:
+    """What geocoding found out about a place; shared by every location that refers to it"""
+    name: str
+    address: str
+    lat: float
+    lng: float
+    photo_url: Optional[str] = None
+    # None when the place has no additional_info at all
+    opening_hours: Optional[str] = None
+    price_range: Optional[str] = None
+    estimated_visit_time: Optional[str] = None
+    rating: Optional[float] = None
+    website: Optional[str] = None
+    has_info: bool = False
+
+    def additional_info(self) -> Optional[dict]:
+        if not self.has_info:
+            return None
+        return {
+            "opening_hours": self.opening_hours,
+            "price_range": self.price_range,
+            "estimated_visit_time": self.estimated_visit_time,
+            "rating": self.rating,
+            "website": self.website
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class LocationRecord:
+    """A place as one recommendation or trip item describes it"""
+    place: PlaceRecord
+    name: str
+    description: str
+    category: str
+
+    @property
+    def address(self) -> str:
+        return self.place.address
+
+    @property
+    def lat(self) -> float:
+        return self.place.lat
+
+    @property
+    def lng(self) -> float:
+        return self.place.lng
+
+    @property
+    def photo_url(self) -> Optional[str]:
+        return self.place.photo_url
+
+    def as_dict(self) -> dict:
+        place = self.place
+        return {
+            "name": self.name,
+            "description": self.description,
+            "category": self.category,
+            "address": place.address,
+            "lat": place.lat,
+            "lng": place.lng,
+            "additional_info": place.additional_info(),
+            "photo_url": place.photo_url
+        }
+
+    def to_location(self) -> Location:
+        # Validating a dict runs in pydantic-core and beats model_construct
+        return Location.model_validate(self.as_dict())
+
+
+class PlaceStore:
+    """Interned place data, keyed by normalized name and address.
+
+    The spatial index keeps compact records that point at one shared
+    PlaceRecord per place instead of each holding its own copy of the
+    Pydantic models; models are built again only for responses. Places
+    are held weakly, so one disappears once nothing refers to it. When a
+    place comes back with different data (a new rating, a photo), later
+    records share the new version and existing ones keep theirs.
+    Not thread-safe: use it from the event loop.
+    """
+
+    def __init__(self):
+        self._places: "weakref.WeakValueDictionary[str, PlaceRecord]" = weakref.WeakValueDictionary()
+        self.interned = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def place(self, location: Location) -> PlaceRecord:
+        info = location.additional_info
+        record = PlaceRecord(
+            name=_intern(location.name),
+            address=_intern(location.address),
+            lat=location.lat,
+            lng=location.lng,
+            photo_url=_intern(location.photo_url),
+            opening_hours=_intern(info.opening_hours) if info else None,
+            price_range=_intern(info.price_range) if info else None,
+            estimated_visit_time=_intern(info.estimated_visit_time) if info else None,
+            rating=info.rating if info else None,
+            website=_intern(info.website) if info else None,
+            has_info=info is not None
+        )
+        key = normalize_key(location.name, location.address)
+        self.interned += 1
+        existing = self._places.get(key)
+        if existing == record:
+            self.shared += 1
+            return existing
+        self._places[key] = record
+        return record
+
+    def location(self, location: Location) -> LocationRecord:
+        place = self.place(location)
+        return LocationRecord(
+            place=place,
+            name=place.name if location.name == place.name else location.name,
+            description=_intern(location.description),
+            category=_CATEGORIES.get(location.category, location.category)
+        )
+
+    def stats(self) -> dict:
+        return {"places": len(self._places), "interned": self.interned, "shared": self.shared}
+
+
+# Shared by the spatial indexes
+place_store = PlaceStore()
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from services import metrics
+from services.maps_service import GoogleMapsService
+from services.recommendation_cache import RecommendationCache
+from services.resilience import UpstreamUnavailable
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every worker prefetches
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# How each category is asked for; the recommendation cache normalizes the
+# question to the same key as a user's "best museums in Paris"
+CATEGORY_QUESTIONS = {
+    "museum": "museums",
+    "restaurant": "restaurants",
+    "landmark": "landmarks",
+    "activity": "activities",
+    "shopping": "shopping"
+}
+
+
+def parse_targets(text: str) -> List["PrefetchTarget"]:
+    """Read "Paris:museum,Paris:restaurant,Tokyo" (a city alone means general recommendations)"""
+    targets = []
+    for part in text.split(","):
+        city, _, category = part.strip().partition(":")
+        city, category = city.strip(), category.strip().lower() or None
+        if not city:
+            continue
+        if category is not None and category not in CATEGORY_QUESTIONS:
+            raise ValueError(f"Unknown prefetch category {category!r} for {city}")
+        targets.append(PrefetchTarget(city=city, category=category))
+    return targets
+
+
+@dataclass
+class PrefetchTarget:
+    city: str
+    category: Optional[str] = None
+    # Monotonic time the target is next due; 0 means as soon as possible
+    due: float = 0.0
+    refreshes: int = 0
+    failures: int = 0
+    last_refreshed: Optional[float] = None
+    last_error: Optional[str] = None
+    locations: int = 0
+    geocoded: int = 0
+    duration: Optional[float] = None
+
+    @property
+    def message(self) -> str:
+        if self.category is None:
+            return f"Best places to visit in {self.city}"
+        return f"Best {CATEGORY_QUESTIONS[self.category]} in {self.city}"
+
+
+class Prefetcher:
+    """Background job keeping recommendations for popular destinations warm.
+
+    For each (city, category) target it asks OpenAI through the
+    recommendation cache and geocodes the reply, so a live request for it is
+    a cache hit all the way down. Each target is refreshed `refresh_margin`
+    seconds before its cached reply expires (whoever cached it). It runs one
+    target at a time, at most `max_per_minute` a minute, and waits while
+    more than `busy_threshold` live requests are in flight, so it only uses
+    spare upstream capacity.
+
+    With a `lock_path`, only the worker process holding an exclusive lock on
+    that file prefetches; the others retry the lock every `lock_retry`
+    seconds and take over if the holder exits.
+    """
+
+    def __init__(
+        self,
+        recommendations: RecommendationCache,
+        maps: GoogleMapsService,
+        targets: List[PrefetchTarget],
+        max_per_minute: float = 6,
+        refresh_margin: float = 900,
+        busy_threshold: int = 4,
+        in_flight: Callable[[], float] = lambda: metrics.http_requests_in_flight.value(),
+        failure_backoff: float = 60,
+        lock_path: Optional[str] = None,
+        lock_retry: float = 30
+    ):
+        self.recommendations = recommendations
+        self.maps = maps
+        self.targets = targets
+        self.min_interval = 60 / max_per_minute
+        self.refresh_margin = refresh_margin
+        self.busy_threshold = busy_threshold
+        self.in_flight = in_flight
+        self.failure_backoff = failure_backoff
+        self.lock_path = lock_path
+        self.lock_retry = lock_retry
+        self._lock_fd: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_start = float("-inf")
+        self.started_at: Optional[float] = None
+        self.deferrals = 0
+
+    def start(self):
+        if self.targets and self._task is None:
+            self.started_at = time.time()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Prefetching recommendations for {len(self.targets)} targets")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @property
+    def leader(self) -> bool:
+        """Whether this process is the one prefetching"""
+        return self.running and (self.lock_path is None or fcntl is None or self._lock_fd is not None)
+
+    def _try_lock(self) -> bool:
+        if self.lock_path is None or fcntl is None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self):
+        while not self._try_lock():
+            await asyncio.sleep(self.lock_retry)
+        logger.info(f"Prefetcher active in process {os.getpid()}")
+
+        loop = asyncio.get_running_loop()
+        for target in self.targets:
+            # Skip ahead to shortly before expiry if a reply is already cached (e.g. on disk)
+            expires_in = self.recommendations.expires_in(target.message, target.city)
+            if expires_in is not None:
+                target.due = loop.time() + max(0.0, expires_in - self.refresh_margin)
+
+        while True:
+            target = min(self.targets, key=lambda t: t.due)
+            wait = target.due - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._pace()
+            await self.refresh(target)
+
+    async def _pace(self):
+        """Wait for the rate limit and for live traffic to calm down"""
+        loop = asyncio.get_running_loop()
+        wait = self._last_start + self.min_interval - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        deferred = False
+        while self.in_flight() > self.busy_threshold:
+            deferred = True
+            await asyncio.sleep(1)
+        if deferred:
+            self.deferrals += 1
+        self._last_start = loop.time()
+
+    async def refresh(self, target: PrefetchTarget):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            _, locations = await self.recommendations.refresh(target.message, target.city)
+            geocoded = 0
+            # One lookup at a time, to leave the Maps pool to live requests
+            for location in locations:
+                if await self.maps.geocode_location(location) is not None:
+                    geocoded += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            target.failures += 1
+            target.last_error = str(e) or type(e).__name__
+            retry_after = (e.retry_after or 0.0) if isinstance(e, UpstreamUnavailable) else 0.0
+            backoff = min(self.failure_backoff * 2 ** (target.failures - 1), 3600)
+            target.due = loop.time() + max(retry_after, backoff)
+            metrics.prefetch_refreshes.inc(outcome="error")
+            logger.warning(f"Prefetch for {target.message} failed: {target.last_error}")
+            return
+
+        target.refreshes += 1
+        target.failures = 0
+        target.last_error = None
+        target.last_refreshed = time.time()
+        target.locations = len(locations)
+        target.geocoded = geocoded
+        target.duration = time.perf_counter() - start
+        expires_in = self.recommendations.expires_in(target.message, target.city)
+        if expires_in is None:
+            # Replies without locations aren't cached; try again later
+            expires_in = self.failure_backoff + self.refresh_margin
+        target.due = loop.time() + max(self.min_interval, expires_in - self.refresh_margin)
+        metrics.prefetch_refreshes.inc(outcome="ok")
+        logger.info(f"Prefetched {target.message}: {geocoded}/{len(locations)} locations in {target.duration:.1f}s")
+
+    def status(self) -> dict:
+        loop_time = asyncio.get_running_loop().time()
+        now = time.time()
+        stats = self.recommendations.stats()
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "running": self.running,
+            "leader": self.leader,
+            "started_at": self.started_at,
+            "deferrals": self.deferrals,
+            "prefetch_hits": stats["prefetch_hits"],
+            # Share of all recommendation lookups answered by prefetched entries
+            "hit_contribution": stats["prefetch_hits"] / lookups if lookups else 0.0,
+            "targets": [
+                {
+                    "city": target.city,
+                    "category": target.category,
+                    "message": target.message,
+                    "refreshes": target.refreshes,
+                    "failures": target.failures,
+                    "last_error": target.last_error,
+                    "last_refreshed": target.last_refreshed,
+                    "next_refresh": now + max(0.0, target.due - loop_time),
+                    "locations": target.locations,
+                    "geocoded": target.geocoded,
+                    "duration_s": round(target.duration, 3) if target.duration is not None else None
+                }
+                for target in self.targets
+            ]
+        }
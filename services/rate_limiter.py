@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+
+
+def _sliding_window_count(previous: int, current: int, now: float, window: int) -> float:
+    """Weight the previous fixed window by how much of it still overlaps the sliding window"""
+    elapsed = now % window
+    return previous * (window - elapsed) / window + current
+
+
+class InMemoryRateLimitBackend:
+    """Sliding-window counter per key: O(1) state per key, idle keys evicted in the background"""
+
+    def __init__(self, idle_ttl: int = 300, sweep_interval: int = 60):
+        # key -> [window length, window index, current count, previous count]
+        self._counters: Dict[str, List[int]] = {}
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        self._ensure_sweeper()
+        now = time.time()
+        index = int(now // window)
+
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [window, index, 0, 0]
+        elif counter[1] != index:
+            # Roll forward; anything older than one window no longer counts
+            counter[3] = counter[2] if counter[1] == index - 1 else 0
+            counter[2] = 0
+            counter[1] = index
+
+        count = _sliding_window_count(counter[3], counter[2], now, window)
+        reset_after = window - now % window
+        if count >= limit:
+            return RateLimitResult(False, limit, 0, reset_after)
+
+        counter[2] += 1
+        return RateLimitResult(True, limit, max(0, int(limit - count - 1)), reset_after)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.evict_idle()
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop keys whose last window ended more than idle_ttl seconds ago"""
+        now = now or time.time()
+        stale = [
+            key for key, (window, index, _, _) in self._counters.items()
+            if now - (index + 1) * window > self.idle_ttl
+        ]
+        for key in stale:
+            del self._counters[key]
+        return len(stale)
+
+    async def ping(self):
+        pass
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+
+
+class RedisRateLimitBackend:
+    """Sliding-window counter shared by every worker through Redis.
+
+    Each fixed window is one Redis key that expires after two windows, so
+    idle clients cost nothing once their keys expire.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 0.5) -> "RedisRateLimitBackend":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for rate_limit_backend=redis")
+        # Every request waits on the limiter: a hung Redis must fail fast, not hang the request
+        return cls(redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout))
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = time.time()
+        index = int(now // window)
+        current_key = f"ratelimit:{key}:{index}"
+
+        pipe = self.client.pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, window * 2)
+        pipe.get(f"ratelimit:{key}:{index - 1}")
+        current, _, previous = await pipe.execute()
+
+        count = _sliding_window_count(int(previous or 0), int(current) - 1, now, window)
+        reset_after = window - now % window
+        if count >= limit:
+            await self.client.decr(current_key)
+            return RateLimitResult(False, limit, 0, reset_after)
+        return RateLimitResult(True, limit, max(0, int(limit - count - 1)), reset_after)
+
+    async def ping(self):
+        await self.client.ping()
+
+    async def close(self):
+        await self.client.close()
+
+
+class RateLimiter:
+    """Per-route limits on top of a backend. Routes are matched by longest path prefix.
+
+    Fails open: if the backend errors, the request is let through unchecked
+    rather than failing because the limiter is unavailable.
+    """
+
+    def __init__(self, backend, default_limit: int, window: int = 60, route_limits: Optional[Dict[str, int]] = None):
+        self.backend = backend
+        self.default_limit = default_limit
+        self.window = window
+        self.route_limits = sorted((route_limits or {}).items(), key=lambda item: -len(item[0]))
+        self.rejections = 0
+        self.backend_errors = 0
+        self._backend_failing = False
+
+    def limit_for(self, path: str) -> Tuple[str, int]:
+        for prefix, limit in self.route_limits:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "*", self.default_limit
+
+    async def hit(self, client_id: str, path: str) -> RateLimitResult:
+        route, limit = self.limit_for(path)
+        try:
+            result = await self.backend.hit(f"{route}:{client_id}", limit, self.window)
+        except Exception as e:
+            self.backend_errors += 1
+            metrics.rate_limit_backend_errors.inc()
+            if not self._backend_failing:
+                self._backend_failing = True
+                logger.warning(f"Rate limit backend failed, letting requests through: {str(e) or type(e).__name__}")
+            return RateLimitResult(True, limit, limit, self.window)
+        if self._backend_failing:
+            self._backend_failing = False
+            logger.info("Rate limit backend recovered")
+        if not result.allowed:
+            self.rejections += 1
+            metrics.rate_limit_rejections.inc(route=route)
+        return result
+
+    async def ping(self):
+        """Raise if the shared backend can't be reached"""
+        await self.backend.ping()
+
+    async def close(self):
+        await self.backend.close()
+
+
+def parse_route_limits(value: str) -> Dict[str, int]:
+    """Parse "/api/chat=10,/api/trip=60" into {"/api/chat": 10, "/api/trip": 60}"""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            prefix, limit = item.split("=", 1)
+            limits[prefix.strip()] = int(limit)
+    return limits
+
+
+def create_rate_limiter(settings) -> RateLimiter:
+    if settings.rate_limit_backend == "redis":
+        backend = RedisRateLimitBackend.from_url(settings.redis_url)
+    else:
+        backend = InMemoryRateLimitBackend(idle_ttl=settings.rate_limit_idle_ttl)
+    route_limits = {
+        "/api/photos": settings.rate_limit_photos_per_minute,
+        "/api/chat/batch": settings.rate_limit_chat_batch_per_minute
+    }
+    route_limits.update(parse_route_limits(settings.rate_limit_routes))
+    return RateLimiter(
+        backend,
+        default_limit=settings.max_requests_per_minute,
+        window=60,
+        route_limits=route_limits
+    )
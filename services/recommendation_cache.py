@@ -0,0 +1,229 @@
+import copy
+import hashlib
+import logging
+import math
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Protocol, Tuple
+from config import settings
+from services.cache import TTLCache
+from services.model_router import Route
+from services.openai_service import OpenAIService
+from services.place_store import intern_strings
+from services.singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+# Words that don't change what the user is asking for
+STOPWORDS = {
+    'a', 'an', 'the', 'in', 'of', 'on', 'at', 'to', 'for', 'and', 'or', 'me', 'my', 'i',
+    'is', 'are', 'what', 'which', 'where', 'some', 'any', 'please', 'can', 'you', 'show',
+    'give', 'recommend', 'suggest', 'best', 'top', 'good', 'great', 'most', 'popular'
+}
+
+
+class Embedder(Protocol):
+    def embed(self, text: str) -> List[float]:
+        ...
+
+
+class HashingEmbedder:
+    """Offline embedder: hashed character trigrams projected into a fixed-size unit vector"""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in text.split():
+            padded = f" {token} "
+            for i in range(len(padded) - 2):
+                digest = hashlib.md5(padded[i:i + 3].encode()).digest()
+                vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+
+def normalize_message(text: Optional[str]) -> str:
+    tokens = re.sub(r"[^\w\s]", " ", (text or "").lower()).split()
+    return " ".join(sorted({token for token in tokens if token not in STOPWORDS}))
+
+
+class RecommendationCache:
+    """Cache OpenAI recommendations by a normalized request fingerprint.
+
+    Lookups try the exact fingerprint first and, when an embedder is
+    configured, the most similar cached message for the same city/route/
+    temperature scope. The route (tier, model and max_tokens) is the one the
+    OpenAI service's router picks for the request, so replies written for
+    different tiers never answer each other. Concurrent misses for the same fingerprint share one
+    upstream call. Results report a cache status of "hit", "similar",
+    "coalesced" or "miss".
+    """
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        embedder: Optional[Embedder] = None,
+        max_size: int = 1000,
+        ttl: float = 3600,
+        similarity_threshold: float = 0.9,
+        db_path: Optional[str] = None
+    ):
+        self.openai_service = openai_service
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        # Replies recommending the same places share their names, addresses and keys
+        self.cache = TTLCache("recommendations", max_size=max_size, ttl=ttl, db_path=db_path, compact=intern_strings)
+        self._vectors: Dict[str, "OrderedDict[str, List[float]]"] = {}
+        self._flight = SingleFlight()
+        self.similar_hits = 0
+        # Keys filled by the prefetcher, to count the hits it contributes
+        self._prefetched: set = set()
+        self.prefetch_hits = 0
+
+    def fingerprint(
+        self,
+        user_message: str,
+        city: Optional[str] = None,
+        context: Optional[dict] = None
+    ) -> Tuple[str, str, str]:
+        """Return (key, scope, normalized message) for a request"""
+        previous = len(context.get('previous_locations') or []) if context else 0
+        route = self._route(user_message, city, context)
+        scope = "|".join([
+            normalize_message(city),
+            route.name,
+            route.model,
+            str(route.max_tokens),
+            f"{settings.openai_temperature:.2f}",
+            str(previous)
+        ])
+        message = normalize_message(user_message)
+        # Drop the city from the message so "museums paris" matches city="Paris"
+        city_tokens = set(normalize_message(city).split())
+        if city_tokens:
+            message = " ".join(t for t in message.split() if t not in city_tokens)
+        key = hashlib.sha256(f"{scope}|{message}".encode()).hexdigest()
+        return key, scope, message
+
+    async def get_travel_recommendations(
+        self,
+        user_message: str,
+        city: Optional[str] = None,
+        context: Optional[dict] = None
+    ) -> Tuple[str, List[dict], str]:
+        key, scope, message = self.fingerprint(user_message, city, context)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count_prefetch_hit(key)
+            return cached['chat_response'], copy.deepcopy(cached['locations']), "hit"
+
+        similar = self._find_similar(scope, message)
+        if similar is not None:
+            similar_key, similar = similar
+            self.similar_hits += 1
+            self._count_prefetch_hit(similar_key)
+            return similar['chat_response'], copy.deepcopy(similar['locations']), "similar"
+
+        status = "coalesced" if self._flight.in_flight(key) else "miss"
+        chat_response, locations = await self._flight.do(
+            key, lambda: self._fetch(key, scope, message, user_message, city, context)
+        )
+        return chat_response, copy.deepcopy(locations), status
+
+    async def refresh(self, user_message: str, city: Optional[str] = None) -> Tuple[str, List[dict]]:
+        """Fetch a fresh reply and cache it in place of any cached one (used by the prefetcher).
+
+        The reply is also cached for the same message sent without `city`,
+        which is how most clients ask ("museums in Paris").
+        """
+        key, scope, message = self.fingerprint(user_message, city)
+        self._prefetched.add(key)
+        chat_response, locations = await self._flight.do(
+            key, lambda: self._fetch(key, scope, message, user_message, city, None)
+        )
+        # Only when the message routes the same way without the city
+        if city and chat_response and locations and self._route(user_message) == self._route(user_message, city):
+            alias_key, alias_scope, alias_message = self.fingerprint(user_message)
+            self._prefetched.add(alias_key)
+            self.cache.set(alias_key, {'chat_response': chat_response, 'locations': locations})
+            self._remember(alias_scope, alias_key, alias_message)
+        return chat_response, locations
+
+    def _route(self, user_message: str, city: Optional[str] = None, context: Optional[dict] = None) -> Route:
+        return self.openai_service.router.route(user_message, city, context)
+
+    def expires_in(self, user_message: str, city: Optional[str] = None) -> Optional[float]:
+        """Seconds until the cached reply for a request expires, or None if none is cached"""
+        return self.cache.expires_in(self.fingerprint(user_message, city)[0])
+
+    def _count_prefetch_hit(self, key: str):
+        if key in self._prefetched:
+            self.prefetch_hits += 1
+
+    async def _fetch(
+        self,
+        key: str,
+        scope: str,
+        message: str,
+        user_message: str,
+        city: Optional[str],
+        context: Optional[dict]
+    ) -> Tuple[str, List[dict]]:
+        chat_response, locations = await self.openai_service.get_travel_recommendations(
+            user_message=user_message,
+            city=city,
+            context=context
+        )
+        # Replies that failed to parse into locations are not worth reusing
+        if chat_response and locations:
+            self.cache.set(key, {'chat_response': chat_response, 'locations': locations})
+            self._remember(scope, key, message)
+        return chat_response, locations
+
+    def _remember(self, scope: str, key: str, message: str):
+        if self.embedder is None:
+            return
+        vectors = self._vectors.setdefault(scope, OrderedDict())
+        vectors[key] = self.embedder.embed(message)
+        vectors.move_to_end(key)
+        while len(vectors) > self.max_size:
+            vectors.popitem(last=False)
+
+    def _find_similar(self, scope: str, message: str) -> Optional[Tuple[str, dict]]:
+        vectors = self._vectors.get(scope)
+        if self.embedder is None or not vectors:
+            return None
+
+        query = self.embedder.embed(message)
+        best_key, best_score = None, self.similarity_threshold
+        for key, vector in vectors.items():
+            score = sum(a * b for a, b in zip(query, vector))
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+
+        cached = self.cache.get(best_key)
+        if cached is None:
+            # Expired or evicted from the cache tier
+            del vectors[best_key]
+            return None
+        return best_key, cached
+
+    def close(self):
+        self.cache.close()
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        stats.update({
+            "similar_hits": self.similar_hits,
+            "prefetch_hits": self.prefetch_hits,
+            "upstream_calls": self._flight.calls,
+            "coalesced": self._flight.coalesced
+        })
+        return stats
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import httpx
+import requests
+from openai import AsyncOpenAI
+from requests.adapters import HTTPAdapter
+from services.cache import ByteCache
+from services.maps_service import GoogleMapsService
+from services.openai_service import OpenAIService
+from services.photo_service import PhotoService
+from services.prefetch import Prefetcher, parse_targets
+from services.recommendation_cache import HashingEmbedder, RecommendationCache
+from services.session_store import SessionStore
+from services.spatial_index import SpatialIndex
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Owns one pooled connection set per upstream and the services built on them.
+
+    Created in the app lifespan: `start()` opens the pools and warms them up,
+    `close()` releases them. Routes get the services through the dependencies
+    in api.dependencies, so tests can point the registry at local fakes or
+    override a single dependency.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.openai_http: httpx.AsyncClient = None
+        self.maps_session: requests.Session = None
+        self.openai: OpenAIService = None
+        self.maps: GoogleMapsService = None
+        self.photos: PhotoService = None
+        self.recommendations: RecommendationCache = None
+        self.prefetcher: Prefetcher = None
+        # Places geocoded through Maps; the Maps service reuses these instead of looking them up again
+        self.places = SpatialIndex(max_size=settings.spatial_index_size)
+        self.sessions = SessionStore(
+            max_sessions=settings.session_max_sessions,
+            ttl=settings.session_ttl,
+            max_turns=settings.session_max_turns,
+            max_locations=settings.session_max_locations,
+            db_path=settings.session_db_path or None
+        )
+
+    async def start(self):
+        settings = self.settings
+
+        self.openai_http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.openai_pool_size,
+                max_keepalive_connections=settings.openai_pool_size,
+                keepalive_expiry=settings.client_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout, connect=settings.client_connect_timeout)
+        )
+        self.openai = OpenAIService(client=AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url or None,
+            http_client=self.openai_http,
+            # Retried by OpenAIService.upstream instead, within the request deadline
+            max_retries=0
+        ))
+
+        self.maps_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.maps_concurrency_limit)
+        self.maps_session.mount("https://", adapter)
+        self.maps_session.mount("http://", adapter)
+        self.maps = GoogleMapsService(session=self.maps_session, index=self.places)
+        self.photos = PhotoService(self.maps, ByteCache(
+            "photos",
+            max_bytes=settings.photo_cache_memory_bytes,
+            ttl=settings.photo_cache_ttl,
+            directory=settings.photo_cache_dir or None,
+            max_disk_bytes=settings.photo_cache_disk_bytes
+        ))
+
+        self.recommendations = RecommendationCache(
+            self.openai,
+            embedder=HashingEmbedder() if settings.recommendation_cache_similarity > 0 else None,
+            max_size=settings.recommendation_cache_size,
+            ttl=settings.recommendation_cache_ttl,
+            similarity_threshold=settings.recommendation_cache_similarity,
+            db_path=settings.recommendation_cache_db_path or None
+        )
+
+        if settings.prefetch_enabled and settings.recommendation_cache_enabled:
+            self.prefetcher = Prefetcher(
+                self.recommendations,
+                self.maps,
+                parse_targets(settings.prefetch_targets),
+                max_per_minute=settings.prefetch_max_per_minute,
+                refresh_margin=settings.prefetch_refresh_margin,
+                busy_threshold=settings.prefetch_busy_threshold,
+                lock_path=settings.prefetch_lock_path or None
+            )
+
+        if settings.client_warm_up:
+            await self.warm_up()
+
+    async def warm_up(self):
+        """Open a connection to each upstream so the first requests skip the TCP/TLS handshake"""
+        timeout = self.settings.client_connect_timeout
+        results = await asyncio.gather(
+            asyncio.wait_for(self.openai_http.head(str(self.openai.client.base_url)), timeout),
+            asyncio.wait_for(
+                asyncio.to_thread(self.maps_session.head, self.settings.google_maps_base_url, timeout=timeout),
+                timeout
+            ),
+            return_exceptions=True
+        )
+        for name, result in zip(("OpenAI", "Google Maps"), results):
+            if isinstance(result, Exception):
+                logger.warning(f"{name} warm-up failed: {str(result) or type(result).__name__}")
+
+    def circuit_states(self) -> dict:
+        return {
+            "openai": self.openai.upstream.breaker.state,
+            "maps": self.maps.upstream.breaker.state
+        }
+    
+    async def close(self):
+        if self.prefetcher:
+            await self.prefetcher.stop()
+        if self.maps:
+            self.maps.close()
+        if self.recommendations:
+            self.recommendations.close()
+        if self.maps_session:
+            self.maps_session.close()
+        if self.openai_http:
+            await self.openai_http.aclose()
+        self.sessions.close()
@@ -0,0 +1,259 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, Optional
+from services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Absolute loop time by which the current request must be answered
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+# Shortest Retry-After we suggest: "0" just invites clients to hammer a struggling upstream
+MIN_RETRY_AFTER = 1.0
+
+
+class UpstreamUnavailable(Exception):
+    """An upstream call was refused or could not finish in time"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        # Seconds a client should wait before trying again, when we can tell
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} circuit is open", retry_after)
+        self.upstream = upstream
+
+
+class UpstreamTimeout(UpstreamUnavailable, TimeoutError):
+    """Every attempt at an upstream call timed out"""
+
+
+class DeadlineExceeded(UpstreamUnavailable, TimeoutError):
+    """The request's deadline budget ran out"""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give everything called inside the block at most `seconds` in total.
+
+    Nested blocks can only shorten the deadline, never extend it.
+    """
+    expires = asyncio.get_running_loop().time() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none"""
+    expires = _deadline.get()
+    if expires is None:
+        return None
+    return expires - asyncio.get_running_loop().time()
+
+
+def wait_timeout() -> Optional[float]:
+    """How long the current request may wait for shared work (None: no deadline)"""
+    left = remaining()
+    return None if left is None else max(left, 0.0)
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream keeps failing.
+
+    Opens after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds one probe call is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._publish()
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._probing:
+            self._state = self.HALF_OPEN
+            self._probing = True
+            self._publish()
+            return
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def retry_after(self) -> float:
+        """Seconds until a call is worth trying again (at least MIN_RETRY_AFTER)"""
+        if self._state == self.CLOSED:
+            return MIN_RETRY_AFTER
+        return max(MIN_RETRY_AFTER, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        if self._state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+            self._state = self.CLOSED
+            self._publish()
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._publish()
+
+    def record_abandoned(self):
+        """The call was cancelled before it finished; let another probe through"""
+        self._probing = False
+
+    def _publish(self):
+        metrics.upstream_circuit_state.set(
+            {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self._state], upstream=self.name
+        )
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+    attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class ResilientUpstream:
+    """Deadlines, retries, a circuit breaker and optional hedging for one upstream.
+
+    `call` runs `fn` (a factory for one attempt) with a per-attempt timeout,
+    capped by the request deadline. Errors for which `is_retriable` is true,
+    and timeouts of the full per-attempt length, count against the breaker
+    and are retried after a jittered backoff if the deadline leaves room. An
+    attempt cut short by the deadline raises DeadlineExceeded without
+    counting against the breaker. Once retries are used up the last error is
+    raised as UpstreamTimeout (timeouts) or UpstreamUnavailable, carrying a
+    Retry-After hint. Other errors are raised at once and don't affect the
+    breaker. With `hedge=True` a second attempt is started
+    if the first hasn't answered after `hedge_delay` seconds, and whichever
+    succeeds first wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        retry: RetryPolicy,
+        breaker: CircuitBreaker,
+        is_retriable: Callable[[BaseException], bool],
+        hedge_delay: Optional[float] = None
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.retry = retry
+        self.breaker = breaker
+        self.is_retriable = is_retriable
+        self.hedge_delay = hedge_delay
+
+    async def call(self, call: str, fn: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        for attempt in range(self.retry.attempts):
+            self.breaker.before_call()
+            timeout = self._attempt_timeout()
+            try:
+                if hedge and self.hedge_delay is not None:
+                    result = await asyncio.wait_for(self._hedged(call, fn), timeout)
+                else:
+                    result = await asyncio.wait_for(fn(), timeout)
+            except asyncio.CancelledError:
+                self.breaker.record_abandoned()
+                raise
+            except Exception as e:
+                if not isinstance(e, asyncio.TimeoutError) and not self.is_retriable(e):
+                    self.breaker.record_abandoned()
+                    raise
+                if isinstance(e, asyncio.TimeoutError) and timeout < self.timeout:
+                    # Cut short by the request's own budget: says nothing about the upstream
+                    self.breaker.record_abandoned()
+                    raise DeadlineExceeded(f"{self.name}.{call} ran out of request budget") from e
+                self.breaker.record_failure()
+
+                delay = self.retry.backoff(attempt)
+                left = remaining()
+                if attempt + 1 == self.retry.attempts or (left is not None and delay >= left):
+                    message = f"{self.name}.{call} failed after {attempt + 1} attempts: {str(e) or type(e).__name__}"
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise UpstreamTimeout(message, self.breaker.retry_after()) from e
+                    raise UpstreamUnavailable(message, self.breaker.retry_after()) from e
+                logger.warning(f"{self.name}.{call} failed ({str(e) or type(e).__name__}), retrying in {delay:.2f}s")
+                metrics.upstream_retries.inc(upstream=self.name, call=call)
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _attempt_timeout(self) -> float:
+        left = remaining()
+        if left is None:
+            return self.timeout
+        if left <= 0:
+            raise DeadlineExceeded(f"{self.name} call skipped: request budget exhausted")
+        return min(self.timeout, left)
+
+    async def _hedged(self, call: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done:
+            return first.result()
+
+        metrics.upstream_hedges.inc(upstream=self.name, call=call)
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (first, second):
+                task.cancel()
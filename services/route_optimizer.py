@@ -0,0 +1,235 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+import numpy as np
+from models.schemas import Location, Trip, TripDay, TripRouteResponse
+from services.spatial_index import EARTH_RADIUS_M
+
+
+def distance_matrix(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances in metres"""
+    lat, lng = np.radians(lats), np.radians(lngs)
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def parse_visit_minutes(text: Optional[str], default: float) -> float:
+    """Read "2 hours", "1-2 hrs", "45 min" or "1.5h" as minutes; ranges use their midpoint"""
+    if not text:
+        return default
+    match = re.search(r"(\d+(?:\.\d+)?)(?:\s*(?:-|to|–)\s*(\d+(?:\.\d+)?))?\s*(h|hr|hour|m|min|minute)", text.lower())
+    if not match:
+        return default
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    value = (low + high) / 2
+    return value * 60 if match.group(3).startswith("h") else value
+
+
+@dataclass
+class RoutePlan:
+    order: List[int]
+    # Path length of the optimized and the original order, in metres
+    distance_m: float
+    original_distance_m: float
+    # Distance from each stop to the next one; the last stop gets 0
+    legs_m: List[float]
+
+
+def _path_length(route: Sequence[int], dist: np.ndarray) -> float:
+    route = np.asarray(route)
+    return float(dist[route[:-1], route[1:]].sum()) if len(route) > 1 else 0.0
+
+
+def nearest_neighbor(dist: np.ndarray, start: int) -> List[int]:
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    route = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[route[-1]])
+        nxt = int(np.argmin(row))
+        route.append(nxt)
+        visited[nxt] = True
+    return route
+
+
+def _two_opt_pass(path: np.ndarray, dist: np.ndarray) -> bool:
+    """Reverse path[i+1..j] wherever that shortens the path; the ends stay fixed"""
+    improved = False
+    m = len(path)
+    for i in range(m - 3):
+        a, b = path[i], path[i + 1]
+        c, d = path[i + 2:m - 1], path[i + 3:m]
+        delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+        k = int(np.argmin(delta))
+        if delta[k] < -1e-6:
+            j = i + 2 + k
+            path[i + 1:j + 1] = path[i + 1:j + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def _or_opt_pass(path: np.ndarray, dist: np.ndarray, max_segment: int = 3) -> bool:
+    """Move runs of 1-3 stops (optionally reversed) to the cheapest other edge"""
+    improved = False
+    edges = dist[path[:-1], path[1:]]
+    for length in range(1, max_segment + 1):
+        start = 1
+        while start + length < len(path):
+            end = start + length - 1
+            prev, first, last, nxt = path[start - 1], path[start], path[end], path[end + 1]
+            gain = dist[prev, first] + dist[last, nxt] - dist[prev, nxt]
+
+            # Cost of inserting the run into edge p (path[p] -> path[p + 1]); dist is symmetric,
+            # so rows are gathered instead of columns
+            forward = dist[first, path[:-1]] + dist[last, path[1:]] - edges
+            backward = dist[last, path[:-1]] + dist[first, path[1:]] - edges
+            # Edges touching the run itself aren't insertion points
+            forward[start - 1:end + 1] = backward[start - 1:end + 1] = np.inf
+
+            k_forward, k_backward = int(np.argmin(forward)), int(np.argmin(backward))
+            reverse = backward[k_backward] < forward[k_forward]
+            k = k_backward if reverse else k_forward
+            cost = backward[k] if reverse else forward[k]
+            if cost < gain - 1e-6:
+                segment = path[start:end + 1][::-1] if reverse else path[start:end + 1]
+                if k < start:
+                    moved = [path[:k + 1], segment, path[k + 1:start], path[end + 1:]]
+                else:
+                    moved = [path[:start], path[end + 1:k + 1], segment, path[k + 1:]]
+                path[:] = np.concatenate(moved)
+                edges = dist[path[:-1], path[1:]]
+                improved = True
+            else:
+                start += 1
+    return improved
+
+
+def optimize_route(
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    start: Optional[int] = None,
+    max_passes: int = 50
+) -> RoutePlan:
+    """Order stops to shorten an open walking path.
+
+    Builds a nearest-neighbour tour, then improves it with 2-opt and Or-opt
+    moves until neither finds a shorter path. Without `start` both ends of
+    the path are free: a zero-distance dummy stop is pinned at each end so
+    the moves can pick the best first and last stops.
+    """
+    n = len(lats)
+    dist = distance_matrix(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+    original = _path_length(range(n), dist)
+    if n < 3:
+        order = list(range(n)) if start is None else [start] + [i for i in range(n) if i != start]
+        return RoutePlan(order, _path_length(order, dist), original, _legs(order, dist))
+
+    # Index n is the dummy stop, zero distance from everything
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = dist
+    if start is None:
+        # Start from an extreme stop so the greedy tour doesn't double back across the city
+        first = int(np.argmax(dist.sum(axis=1)))
+        path = np.array([n] + nearest_neighbor(dist, first) + [n])
+    else:
+        path = np.array(nearest_neighbor(dist, start) + [n])
+
+    for _ in range(max_passes):
+        improved = _two_opt_pass(path, padded)
+        improved = _or_opt_pass(path, padded) or improved
+        if not improved:
+            break
+
+    order = [int(i) for i in path if i != n]
+    return RoutePlan(order, _path_length(order, dist), original, _legs(order, dist))
+
+
+def _legs(order: List[int], dist: np.ndarray) -> List[float]:
+    return [float(dist[a, b]) for a, b in zip(order, order[1:])] + ([0.0] if order else [])
+
+
+def split_days(
+    locations: List[Location],
+    legs_m: List[float],
+    hours_per_day: float,
+    travel_speed_kmh: float,
+    default_visit_minutes: float
+) -> List[List[int]]:
+    """Cut an ordered route into days of at most `hours_per_day` of visiting and travel.
+
+    Returns positions into `locations`. A stop that alone exceeds the budget
+    still gets a day of its own.
+    """
+    budget = hours_per_day * 60
+    days: List[List[int]] = [[]]
+    used = 0.0
+    for position, location in enumerate(locations):
+        info = location.additional_info
+        visit = parse_visit_minutes(info.estimated_visit_time if info else None, default_visit_minutes)
+        travel = legs_m[position - 1] / 1000 / travel_speed_kmh * 60 if position and days[-1] else 0.0
+        if days[-1] and used + travel + visit > budget:
+            days.append([])
+            used, travel = 0.0, 0.0
+        days[-1].append(position)
+        used += travel + visit
+    return days if days[0] else []
+
+
+def plan_trip(
+    trip: Trip,
+    start_item_id: Optional[str] = None,
+    hours_per_day: Optional[float] = None,
+    travel_speed_kmh: float = 15.0,
+    default_visit_minutes: float = 60
+) -> TripRouteResponse:
+    """Suggest a visiting order for a trip's items, optionally split into days"""
+    items = trip.items
+    start = None
+    if start_item_id is not None:
+        positions = [i for i, item in enumerate(items) if item.id == start_item_id]
+        if not positions:
+            raise ValueError(f"Item {start_item_id} not found in trip")
+        start = positions[0]
+
+    plan = optimize_route(
+        [item.location.lat for item in items],
+        [item.location.lng for item in items],
+        start=start
+    )
+    ordered = [items[i] for i in plan.order]
+
+    days = None
+    if hours_per_day:
+        locations = [item.location for item in ordered]
+        days = []
+        for number, positions in enumerate(
+            split_days(locations, plan.legs_m, hours_per_day, travel_speed_kmh, default_visit_minutes), start=1
+        ):
+            distance = sum(plan.legs_m[p] for p in positions[:-1])
+            visit = sum(
+                parse_visit_minutes(
+                    locations[p].additional_info.estimated_visit_time if locations[p].additional_info else None,
+                    default_visit_minutes
+                )
+                for p in positions
+            )
+            days.append(TripDay(
+                day=number,
+                items=[ordered[p] for p in positions],
+                distance_m=round(distance, 1),
+                visit_minutes=round(visit, 1),
+                travel_minutes=round(distance / 1000 / travel_speed_kmh * 60, 1)
+            ))
+
+    return TripRouteResponse(
+        success=True,
+        trip_id=trip.id,
+        items=ordered,
+        distance_m=round(plan.distance_m, 1),
+        original_distance_m=round(plan.original_distance_m, 1),
+        days=days
+    )
@@ -0,0 +1,343 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from services.cache import normalize_key
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+@dataclass
+class Turn:
+    """One exchange: the user's message and our reply"""
+    user_message: str
+    chat_response: str
+    location_names: List[str]
+    tokens: int = 0
+
+    def __post_init__(self):
+        self.tokens = sum(estimate_tokens(message["content"]) for message in self.messages())
+
+    def messages(self) -> List[dict]:
+        reply = self.chat_response
+        if self.location_names:
+            reply += f"\nRecommended: {', '.join(self.location_names)}"
+        return [{"role": "user", "content": self.user_message}, {"role": "assistant", "content": reply}]
+
+    def summary_line(self) -> str:
+        line = f"- Asked: {_clip(self.user_message, 100)}"
+        if self.location_names:
+            line += f" (recommended {', '.join(self.location_names)})"
+        return line
+
+
+@dataclass
+class ConversationSession:
+    id: str
+    city: Optional[str] = None
+    # Most recent turns, oldest first
+    turns: List[Turn] = field(default_factory=list)
+    # One line per turn folded out of `turns`, oldest first
+    summary: List[str] = field(default_factory=list)
+    # normalized name and address -> name, oldest first
+    locations: "OrderedDict[str, str]" = field(default_factory=OrderedDict)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "city": self.city,
+            "turns": [[turn.user_message, turn.chat_response, turn.location_names] for turn in self.turns],
+            "summary": self.summary,
+            "locations": list(self.locations.items()),
+            "updated_at": self.updated_at
+        })
+
+    @classmethod
+    def from_json(cls, session_id: str, text: str) -> "ConversationSession":
+        data = json.loads(text)
+        return cls(
+            id=session_id,
+            city=data["city"],
+            turns=[Turn(*turn) for turn in data["turns"]],
+            summary=data["summary"],
+            locations=OrderedDict(data["locations"]),
+            updated_at=data["updated_at"]
+        )
+
+
+class SessionStore:
+    """Server-side chat history, so clients only send a session id.
+
+    Memory is bounded at every level: at most `max_sessions` sessions (least
+    recently used evicted first, idle ones expire after `ttl` seconds), at
+    most `max_turns` full turns per session (older turns are folded into
+    one-line summaries, of which `max_summary_lines` are kept) and
+    `max_locations` remembered place names. Not thread-safe: use it from the
+    event loop.
+
+    With a `db_path`, sessions are also written to SQLite and always read
+    back from it, so every worker process sharing the file sees the same
+    conversations. Concurrent turns on one session from two workers are
+    last-writer-wins. SQLite work runs on one background thread, in the
+    order it was issued: saves are queued without waiting, reads and
+    deletes are awaited. `len()` counts the table's rows as of the last
+    trim plus what this process has added or removed since, so it is only
+    approximate while several workers share the file.
+    """
+
+    # Off the event loop, but a locked file still shouldn't hold up chat turns for long
+    BUSY_TIMEOUT_MS = 1000
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        ttl: float = 3600,
+        max_turns: int = 6,
+        max_summary_lines: int = 20,
+        max_locations: int = 50,
+        max_message_chars: int = 600,
+        db_path: Optional[str] = None
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.max_summary_lines = max_summary_lines
+        self.max_locations = max_locations
+        self.max_message_chars = max_message_chars
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stored = 0
+        if db_path:
+            self._db = sqlite3.connect(
+                db_path, check_same_thread=False, isolation_level=None, timeout=self.BUSY_TIMEOUT_MS / 1000
+            )
+            self._db.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}")
+            # Readers don't block the writer, and several processes share the file
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Sessions are cheap to lose on power failure; an fsync per turn isn't worth it
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at)")
+            self._stored = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            # One thread, so every query sees the writes issued before it
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions")
+
+    def __len__(self) -> int:
+        if self._db is not None:
+            return self._stored
+        return len(self._sessions)
+
+    async def get(self, session_id: str) -> Optional[ConversationSession]:
+        if self._db is not None:
+            # Another worker may have moved the conversation on since we last saw it
+            row = await self._run(self._fetch, "SELECT data FROM sessions WHERE id = ?", (session_id,))
+            if row is None:
+                self._sessions.pop(session_id, None)
+                return None
+            self._sessions[session_id] = ConversationSession.from_json(session_id, row[0])
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.time() - session.updated_at > self.ttl:
+            await self.delete(session_id)
+            self.expirations += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def get_or_create(self, session_id: Optional[str] = None, city: Optional[str] = None) -> ConversationSession:
+        """The live session with this id, or a new one (with a fresh id if none is given)"""
+        session = await self.get(session_id) if session_id else None
+        if session is None:
+            session = ConversationSession(id=session_id or uuid.uuid4().hex, city=city)
+            self._sessions[session.id] = session
+            self._stored += 1
+            self._save(session)
+            await self._prune()
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        deleted = self._sessions.pop(session_id, None) is not None
+        if self._db is not None:
+            deleted = await self._run(self._execute, "DELETE FROM sessions WHERE id = ?", (session_id,)) > 0
+            if deleted:
+                self._stored -= 1
+        return deleted
+
+    def record_turn(
+        self,
+        session: ConversationSession,
+        user_message: str,
+        chat_response: str,
+        locations: List[dict],
+        city: Optional[str] = None
+    ):
+        """Append an exchange, folding the oldest turns into the summary beyond max_turns"""
+        names = [location["name"] for location in locations]
+        session.turns.append(Turn(
+            user_message=_clip(user_message, self.max_message_chars),
+            chat_response=_clip(chat_response, self.max_message_chars),
+            location_names=names
+        ))
+        while len(session.turns) > self.max_turns:
+            session.summary.append(session.turns.pop(0).summary_line())
+        del session.summary[:-self.max_summary_lines]
+
+        for location in locations:
+            key = normalize_key(location["name"], location.get("address"))
+            session.locations[key] = location["name"]
+            session.locations.move_to_end(key)
+        while len(session.locations) > self.max_locations:
+            session.locations.popitem(last=False)
+
+        session.city = city or session.city
+        session.updated_at = time.time()
+        if session.id in self._sessions:
+            self._sessions.move_to_end(session.id)
+        self._save(session)
+
+    def _save(self, session: ConversationSession):
+        if self._db is None:
+            return
+        # Serialized now, so later turns don't race the write; not awaited
+        self._executor.submit(
+            self._write,
+            "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+            (session.id, session.to_json(), session.updated_at)
+        )
+        self._writes += 1
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _fetch(self, sql: str, params: tuple) -> Optional[tuple]:
+        return self._db.execute(sql, params).fetchone()
+
+    def _execute(self, sql: str, params: tuple) -> int:
+        return self._db.execute(sql, params).rowcount
+
+    def _write(self, sql: str, params: tuple):
+        try:
+            self._db.execute(sql, params)
+        except sqlite3.Error as e:
+            # Nobody is waiting on a queued save: the turn stays in memory, log and move on
+            logger.warning(f"Session write failed: {str(e)}")
+
+    def _trim(self, now: float) -> int:
+        """Drop expired and least recently used rows; the number of rows left"""
+        self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM sessions WHERE id IN "
+            "(SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+        return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def prompt_messages(self, session: ConversationSession, budget: int) -> List[dict]:
+        """History messages for the next prompt, estimated at no more than `budget` tokens.
+
+        The newest turns go in verbatim while they fit. Turns that don't, and
+        turns already folded away, are compacted into one "conversation so
+        far" note together with the places already recommended; the note
+        keeps its newest lines and is dropped entirely if nothing fits.
+        """
+        recent: List[Turn] = []
+        used = 0
+        for turn in reversed(session.turns):
+            if used + turn.tokens > budget:
+                break
+            recent.insert(0, turn)
+            used += turn.tokens
+
+        lines = session.summary + [turn.summary_line() for turn in session.turns[:len(session.turns) - len(recent)]]
+        # Places named in the verbatim turns don't need repeating in the note
+        shown = {name for turn in recent for name in turn.location_names}
+        places = [name for name in session.locations.values() if name not in shown]
+        note = self._note(lines, places, budget - used)
+
+        messages = [{"role": "system", "content": note}] if note else []
+        for turn in recent:
+            messages.extend(turn.messages())
+        return messages
+
+    def _note(self, lines: List[str], places: List[str], budget: int) -> Optional[str]:
+        header = "Conversation so far:"
+        places_line = ""
+        # Newest places first, as many as fit in half the budget
+        for count in range(len(places), 0, -1):
+            candidate = f"Already recommended (suggest other places unless asked): {', '.join(places[-count:])}"
+            if estimate_tokens(candidate) <= budget // 2:
+                places_line = candidate
+                break
+
+        kept: List[str] = []
+        used = estimate_tokens(header) + estimate_tokens(places_line)
+        for line in reversed(lines):
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            kept.insert(0, line)
+            used += cost
+
+        if (not kept and not places_line) or used > budget:
+            return None
+        return "\n".join([header] + kept + ([places_line] if places_line else []))
+
+    async def _prune(self):
+        now = time.time()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.updated_at > self.ttl:
+                self._sessions.popitem(last=False)
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            else:
+                break
+
+        # The shared table is trimmed every so often rather than on each new session
+        if self._db is not None and self._writes >= 100:
+            self._writes = 0
+            self._stored = await self._run(self._trim, now)
+
+    def close(self):
+        """Finish queued writes and close the SQLite file"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self),
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+from services import metrics
+from services.resilience import DeadlineExceeded, wait_timeout
+
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller starts the work as a task; later callers with the same
+    key await that task instead of starting their own. Results and exceptions
+    are delivered to every waiter. The task runs outside the first caller's
+    context, so it carries no request's deadline; each caller applies its own
+    deadline to its wait, and gets the call's spans in its Server-Timing. A
+    caller that gets cancelled or runs out of time only stops waiting: the
+    shared call keeps running for the others, and is cancelled only once
+    nobody is waiting on it any more.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._timings: Dict[Hashable, List[Tuple[str, float]]] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task, timings = metrics.detached_task(fn())
+            self._calls[key] = task
+            self._timings[key] = timings
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.calls += 1
+        else:
+            timings = self._timings[key]
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), wait_timeout())
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if task.done():
+                # The shared call itself was cancelled or timed out
+                raise
+            # Only this caller stops waiting; drop the shared call once nobody is left
+            if self._calls.get(key) is task and self._waiters[key] == 1:
+                task.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded("Shared call ran out of request budget") from e
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+            if task.done():
+                metrics.add_request_timings(timings)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._timings[key]
+            del self._waiters[key]
+        # Retrieve the exception so an abandoned call doesn't log "never retrieved"
+        if not task.cancelled():
+            task.exception()
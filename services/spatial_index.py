@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, get_args
+import numpy as np
+from models.schemas import Location, LocationCategory
+from services.cache import normalize_key
+from services.place_store import LocationRecord, PlaceStore, place_store
+
+
+EARTH_RADIUS_M = 6371000.0
+CATEGORIES = get_args(LocationCategory)
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+
+
+def haversine_m(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distance in metres from one point to many"""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Locations we have already geocoded, searchable by distance and bounding box.
+
+    Coordinates are kept in NumPy arrays sorted by latitude, so a query
+    binary-searches the latitude band it covers and runs the exact distance
+    or longitude test on that slice only. Entries are keyed by normalized
+    name and address; `aliases` let the Maps service find a place again by
+    the name and address the model used for it. The oldest entries are
+    evicted once `max_size` is reached. Locations are held as compact
+    records in the shared place store and returned as models. Not
+    thread-safe: use it from the event loop.
+    """
+
+    def __init__(self, max_size: int = 50000, places: Optional[PlaceStore] = None):
+        self.max_size = max_size
+        self.places = places if places is not None else place_store
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lngs = np.empty(0, dtype=np.float64)
+        self._categories = np.empty(0, dtype=np.int8)
+        # Keys in the same (latitude) order as the arrays
+        self._keys: List[str] = []
+        # key -> location, oldest first for eviction
+        self._locations: "OrderedDict[str, LocationRecord]" = OrderedDict()
+        self._aliases: Dict[str, str] = {}
+        self._aliases_by_key: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def add(self, location: Location, aliases: Iterable[Tuple[str, str]] = ()):
+        """Index a location, replacing any entry with the same name and address"""
+        key = normalize_key(location.name, location.address)
+        if key in self._locations:
+            self._remove_position(key, self._locations[key])
+
+        position = int(np.searchsorted(self._lats, location.lat, side="right"))
+        self._lats = np.insert(self._lats, position, location.lat)
+        self._lngs = np.insert(self._lngs, position, location.lng)
+        self._categories = np.insert(self._categories, position, _CATEGORY_CODES[location.category])
+        self._keys.insert(position, key)
+        self._locations[key] = self.places.location(location)
+        self._locations.move_to_end(key)
+
+        for name, address in aliases:
+            alias = normalize_key(name, address)
+            if alias != key and self._aliases.get(alias) != key:
+                self._aliases[alias] = key
+                self._aliases_by_key.setdefault(key, []).append(alias)
+
+        while len(self._locations) > self.max_size:
+            oldest_key, oldest = self._locations.popitem(last=False)
+            self._remove_position(oldest_key, oldest)
+            self._drop_aliases(oldest_key)
+
+    def extend(self, locations: Iterable[Location]):
+        """Index many locations at once, sorting the arrays a single time"""
+        for location in locations:
+            key = normalize_key(location.name, location.address)
+            self._locations[key] = self.places.location(location)
+            self._locations.move_to_end(key)
+        while len(self._locations) > self.max_size:
+            oldest_key, _ = self._locations.popitem(last=False)
+            self._drop_aliases(oldest_key)
+
+        keys = list(self._locations)
+        lats = np.fromiter((loc.lat for loc in self._locations.values()), dtype=np.float64, count=len(keys))
+        order = np.argsort(lats, kind="stable")
+        self._lats = lats[order]
+        self._lngs = np.fromiter(
+            (loc.lng for loc in self._locations.values()), dtype=np.float64, count=len(keys)
+        )[order]
+        self._categories = np.fromiter(
+            (_CATEGORY_CODES[loc.category] for loc in self._locations.values()), dtype=np.int8, count=len(keys)
+        )[order]
+        self._keys = [keys[i] for i in order]
+
+    def lookup(self, name: str, address: str) -> Optional[Location]:
+        """Find a location by its own or an aliased name and address"""
+        key = normalize_key(name, address)
+        record = self._locations.get(key)
+        if record is None and key in self._aliases:
+            record = self._locations.get(self._aliases[key])
+        return record.to_location() if record is not None else None
+
+    def nearby(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        category: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Tuple[Location, float]]:
+        """Locations within `radius_m` metres, nearest first, with their distances"""
+        delta = np.degrees(radius_m / EARTH_RADIUS_M)
+        start, end = self._band(lat - delta, lat + delta)
+        distances = haversine_m(lat, lng, self._lats[start:end], self._lngs[start:end])
+        mask = distances <= radius_m
+        if category is not None:
+            mask &= self._categories[start:end] == _CATEGORY_CODES[category]
+
+        matches = np.flatnonzero(mask)
+        nearest = matches[np.argsort(distances[matches], kind="stable")[:limit]]
+        return [(self._locations[self._keys[start + i]].to_location(), float(distances[i])) for i in nearest]
+
+    def within_bounds(
+        self,
+        north: float,
+        south: float,
+        east: float,
+        west: float,
+        category: Optional[str] = None,
+        limit: int = 500
+    ) -> List[Location]:
+        """Locations inside a bounding box; west > east means it crosses the antimeridian"""
+        start, end = self._band(south, north)
+        lngs = self._lngs[start:end]
+        if west <= east:
+            mask = (lngs >= west) & (lngs <= east)
+        else:
+            mask = (lngs >= west) | (lngs <= east)
+        if category is not None:
+            mask &= self._categories[start:end] == _CATEGORY_CODES[category]
+        return [self._locations[self._keys[start + i]].to_location() for i in np.flatnonzero(mask)[:limit]]
+
+    def stats(self) -> dict:
+        return {"size": len(self._locations), "max_size": self.max_size, "aliases": len(self._aliases)}
+
+    def _band(self, south: float, north: float) -> Tuple[int, int]:
+        return (
+            int(np.searchsorted(self._lats, south, side="left")),
+            int(np.searchsorted(self._lats, north, side="right"))
+        )
+
+    def _remove_position(self, key: str, location: LocationRecord):
+        start, end = self._band(location.lat, location.lat)
+        position = start + self._keys[start:end].index(key)
+        self._lats = np.delete(self._lats, position)
+        self._lngs = np.delete(self._lngs, position)
+        self._categories = np.delete(self._categories, position)
+        del self._keys[position]
+
+    def _drop_aliases(self, key: str):
+        for alias in self._aliases_by_key.pop(key, []):
+            if self._aliases.get(alias) == key:
+                del self._aliases[alias]
@@ -1,72 +1,150 @@
-from typing import Dict, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
+import asyncio
 import uuid
+from config import settings
+from services import metrics
+from services.cache import TTLCache
 from models.schemas import Trip, TripItem, Location
+from services.trip_store import TripStore, create_trip_store
+
+
+ANONYMOUS_USER = "anonymous"
 
 
 class TripService:
-    def __init__(self):
-        # Simple in-memory storage (would be database in production)
-        self.trips: Dict[str, Trip] = {}
-        self.default_trip_id = self._create_default_trip()
-    
-    def _create_default_trip(self) -> str:
-        """Create a default trip for users"""
-        trip_id = str(uuid.uuid4())
-        self.trips[trip_id] = Trip(
-            id=trip_id,
-            name="My Trip",
+    def __init__(self, store: TripStore, default_trip_cache_size: int = 10000, default_trip_cache_ttl: int = 3600):
+        self.store = store
+        # user id -> id of the trip created for them on first use. User ids come from a
+        # client header, so this is bounded; an evicted user's trip is found in the store again
+        self.default_trip_ids = TTLCache(
+            "default_trips", max_size=default_trip_cache_size, ttl=default_trip_cache_ttl
+        )
+        self._default_lock = asyncio.Lock()
+
+    async def create_trip(self, name: str = "My Trip", user_id: str = ANONYMOUS_USER) -> Trip:
+        """Create a new empty trip owned by the user"""
+        trip = Trip(
+            id=str(uuid.uuid4()),
+            name=name,
             created_at=datetime.now(),
             items=[]
         )
-        return trip_id
-    
-    def get_trip(self, trip_id: Optional[str] = None) -> Optional[Trip]:
-        """Get trip by ID, or default trip if no ID provided"""
+        with metrics.span("trip_store", "create_trip"):
+            return await self.store.create_trip(trip, user_id)
+
+    async def get_default_trip_id(self, user_id: str = ANONYMOUS_USER) -> str:
+        """Get the user's default trip ID, creating the trip on first use"""
+        trip_id = self.default_trip_ids.get(user_id)
+        if trip_id:
+            return trip_id
+
+        async with self._default_lock:
+            trip_id = self.default_trip_ids.get(user_id)
+            if trip_id is None:
+                trips = await self.store.list_trips(user_id)
+                if not trips:
+                    await self.create_trip(user_id=user_id)
+                    # Another worker may have created one at the same moment; all settle on the oldest
+                    trips = await self.store.list_trips(user_id)
+                trip_id = trips[0].id
+                self.default_trip_ids.set(user_id, trip_id)
+            return trip_id
+
+    async def list_trips(self, user_id: str = ANONYMOUS_USER) -> List[Trip]:
+        """List the trips owned by a user"""
+        with metrics.span("trip_store", "list_trips"):
+            return await self.store.list_trips(user_id)
+
+    async def get_trip(self, trip_id: Optional[str] = None, user_id: str = ANONYMOUS_USER) -> Optional[Trip]:
+        """Get trip by ID, or the user's default trip if no ID provided"""
         if trip_id is None:
-            trip_id = self.default_trip_id
-        return self.trips.get(trip_id)
-    
-    def add_location_to_trip(self, location: Location, trip_id: Optional[str] = None) -> Trip:
-        """Add a location to a trip"""
+            trip_id = await self.get_default_trip_id(user_id)
+        elif await self.store.get_owner(trip_id) != user_id:
+            return None
+        with metrics.span("trip_store", "get_trip"):
+            return await self.store.get_trip(trip_id)
+
+    async def get_trip_version(
+        self,
+        trip_id: Optional[str] = None,
+        user_id: str = ANONYMOUS_USER
+    ) -> Optional[Tuple[str, int]]:
+        """(trip id, version) of a trip or the user's default trip, without loading its items"""
         if trip_id is None:
-            trip_id = self.default_trip_id
-        
-        trip = self.trips.get(trip_id)
-        if not trip:
-            raise ValueError(f"Trip {trip_id} not found")
-        
-        # Check if location already exists in trip
-        for item in trip.items:
-            if item.location.name == location.name and item.location.address == location.address:
-                return trip  # Already exists, don't add duplicate
-        
-        # Add new trip item
-        trip_item = TripItem(
-            id=str(uuid.uuid4()),
-            location=location,
-            added_at=datetime.now()
-        )
-        
-        trip.items.append(trip_item)
-        return trip
-    
-    def remove_location_from_trip(self, item_id: str, trip_id: Optional[str] = None) -> Trip:
+            trip_id = await self.get_default_trip_id(user_id)
+        elif await self.store.get_owner(trip_id) != user_id:
+            return None
+        version = await self.store.get_version(trip_id)
+        return None if version is None else (trip_id, version)
+
+    async def add_location_to_trip(
+        self,
+        location: Location,
+        trip_id: Optional[str] = None,
+        user_id: str = ANONYMOUS_USER
+    ) -> Trip:
+        """Add a location to a trip"""
+        return await self.add_locations_to_trip([location], trip_id, user_id)
+
+    async def add_locations_to_trip(
+        self,
+        locations: List[Location],
+        trip_id: Optional[str] = None,
+        user_id: str = ANONYMOUS_USER
+    ) -> Trip:
+        """Add several locations to a trip, skipping ones already in it"""
+        trip_id = await self._resolve_trip_id(trip_id, user_id)
+        now = datetime.now()
+        items = [
+            TripItem(id=str(uuid.uuid4()), location=location, added_at=now)
+            for location in locations
+        ]
+        with metrics.span("trip_store", "add_items"):
+            return await self.store.add_items(trip_id, items)
+
+    async def remove_location_from_trip(
+        self,
+        item_id: str,
+        trip_id: Optional[str] = None,
+        user_id: str = ANONYMOUS_USER
+    ) -> Trip:
         """Remove a location from a trip"""
+        return await self.remove_locations_from_trip([item_id], trip_id, user_id)
+
+    async def remove_locations_from_trip(
+        self,
+        item_ids: List[str],
+        trip_id: Optional[str] = None,
+        user_id: str = ANONYMOUS_USER
+    ) -> Trip:
+        """Remove several items from a trip"""
+        trip_id = await self._resolve_trip_id(trip_id, user_id)
+        with metrics.span("trip_store", "remove_items"):
+            return await self.store.remove_items(trip_id, item_ids)
+
+    async def owned_locations(self, user_id: str = ANONYMOUS_USER) -> List[Location]:
+        """Every location saved in the user's own trips"""
+        return [item.location for trip in await self.list_trips(user_id) for item in trip.items]
+
+    async def _resolve_trip_id(self, trip_id: Optional[str], user_id: str) -> str:
         if trip_id is None:
-            trip_id = self.default_trip_id
-            
-        trip = self.trips.get(trip_id)
-        if not trip:
+            return await self.get_default_trip_id(user_id)
+        if await self.store.get_owner(trip_id) != user_id:
+            # Don't reveal trips that belong to someone else
             raise ValueError(f"Trip {trip_id} not found")
-        
-        trip.items = [item for item in trip.items if item.id != item_id]
-        return trip
-    
-    def get_default_trip_id(self) -> str:
-        """Get the default trip ID"""
-        return self.default_trip_id
+        return trip_id
+
+    async def ping(self):
+        await self.store.ping()
+
+    async def close(self):
+        await self.store.close()
 
 
 # Global instance
-trip_service = TripService()
\ No newline at end of file
+trip_service = TripService(
+    create_trip_store(settings),
+    default_trip_cache_size=settings.default_trip_cache_size,
+    default_trip_cache_ttl=settings.default_trip_cache_ttl
+)
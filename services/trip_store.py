@@ -0,0 +1,379 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from models.schemas import Trip, TripItem, Location
+
+
+def location_key(location: Location) -> str:
+    """Identity used to detect duplicate locations within a trip"""
+    return f"{location.name}\x1f{location.address}"
+
+
+class TripStore(ABC):
+    """Storage backend for trips. All methods are safe to call concurrently."""
+
+    @abstractmethod
+    async def create_trip(self, trip: Trip, owner_id: str) -> Trip:
+        ...
+
+    @abstractmethod
+    async def get_trip(self, trip_id: str) -> Optional[Trip]:
+        ...
+
+    @abstractmethod
+    async def get_owner(self, trip_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def get_version(self, trip_id: str) -> Optional[int]:
+        """Counter bumped whenever the trip's items change; None if there is no such trip"""
+        ...
+
+    @abstractmethod
+    async def list_trips(self, owner_id: str) -> List[Trip]:
+        ...
+
+    @abstractmethod
+    async def add_items(self, trip_id: str, items: List[TripItem]) -> Trip:
+        """Append items, skipping any whose location is already in the trip"""
+        ...
+
+    @abstractmethod
+    async def remove_items(self, trip_id: str, item_ids: List[str]) -> Trip:
+        """Remove items by id; unknown ids are ignored"""
+        ...
+
+    @abstractmethod
+    async def all_locations(self) -> List[Location]:
+        """Every location saved in any trip, without duplicates"""
+        ...
+
+    async def add_item(self, trip_id: str, item: TripItem) -> Trip:
+        return await self.add_items(trip_id, [item])
+
+    async def remove_item(self, trip_id: str, item_id: str) -> Trip:
+        return await self.remove_items(trip_id, [item_id])
+
+    async def ping(self):
+        """Raise if the store can't be reached"""
+        pass
+
+    async def close(self):
+        pass
+
+
+class _TripIndex:
+    """Secondary indexes kept in step with a trip's items.
+
+    `items` is insertion-ordered, so it doubles as the item_id -> position
+    index: lookups, appends and deletes are O(1) and order is preserved.
+    """
+
+    __slots__ = ("items", "keys")
+
+    def __init__(self, items: List[TripItem]):
+        self.items: Dict[str, TripItem] = {item.id: item for item in items}
+        self.keys: Dict[str, str] = {location_key(item.location): item.id for item in items}
+
+
+class InMemoryTripStore(TripStore):
+    """Process-local store, indexed by trip id, owner, item id and location key.
+
+    A Trip handed to a caller is never changed afterwards: a change stores a
+    shallow copy with the new item list, sharing the unchanged item models.
+    """
+
+    def __init__(self):
+        self.trips: Dict[str, Trip] = {}
+        self.owners: Dict[str, str] = {}
+        self.trips_by_owner: Dict[str, Set[str]] = {}
+        self.indexes: Dict[str, _TripIndex] = {}
+        self.versions: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+
+    async def create_trip(self, trip: Trip, owner_id: str) -> Trip:
+        async with self._lock:
+            self.trips[trip.id] = trip
+            self.owners[trip.id] = owner_id
+            self.trips_by_owner.setdefault(owner_id, set()).add(trip.id)
+            self.indexes[trip.id] = _TripIndex(trip.items)
+            self.versions[trip.id] = 0
+            return trip
+
+    async def get_trip(self, trip_id: str) -> Optional[Trip]:
+        return self.trips.get(trip_id)
+
+    async def get_owner(self, trip_id: str) -> Optional[str]:
+        return self.owners.get(trip_id)
+
+    async def get_version(self, trip_id: str) -> Optional[int]:
+        return self.versions.get(trip_id)
+
+    async def list_trips(self, owner_id: str) -> List[Trip]:
+        trip_ids = self.trips_by_owner.get(owner_id, set())
+        return sorted((self.trips[trip_id] for trip_id in trip_ids), key=lambda trip: trip.created_at)
+
+    async def add_items(self, trip_id: str, items: List[TripItem]) -> Trip:
+        async with self._lock:
+            trip = self._require(trip_id)
+            index = self.indexes[trip_id]
+            changed = False
+            for item in items:
+                key = location_key(item.location)
+                if key in index.keys:
+                    continue  # Already exists, don't add duplicate
+                index.keys[key] = item.id
+                index.items[item.id] = item
+                changed = True
+            return self._replace_items(trip, index) if changed else trip
+
+    async def remove_items(self, trip_id: str, item_ids: List[str]) -> Trip:
+        async with self._lock:
+            trip = self._require(trip_id)
+            index = self.indexes[trip_id]
+            changed = False
+            for item_id in item_ids:
+                item = index.items.pop(item_id, None)
+                if item is not None:
+                    del index.keys[location_key(item.location)]
+                    changed = True
+            return self._replace_items(trip, index) if changed else trip
+
+    async def all_locations(self) -> List[Location]:
+        locations = {}
+        for index in self.indexes.values():
+            for item in index.items.values():
+                locations.setdefault(location_key(item.location), item.location)
+        return list(locations.values())
+
+    def _require(self, trip_id: str) -> Trip:
+        trip = self.trips.get(trip_id)
+        if not trip:
+            raise ValueError(f"Trip {trip_id} not found")
+        return trip
+
+    def _replace_items(self, trip: Trip, index: _TripIndex) -> Trip:
+        # Copies the list of item references only; no item is validated or rebuilt
+        trip = self.trips[trip.id] = trip.model_copy(update={"items": list(index.items.values())})
+        self.versions[trip.id] += 1
+        return trip
+
+
+class _ConnectionPool:
+    def __init__(self, path: str, size: int):
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._connections.put(conn)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._connections.get().close()
+
+
+class SQLiteTripStore(TripStore):
+    """Durable store shared by every process that opens the same database file.
+
+    Runs in WAL mode so readers don't block the writer; blocking sqlite calls
+    are made from worker threads with pooled connections.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trips (
+            id TEXT PRIMARY KEY,
+            owner_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_trips_owner ON trips (owner_id, created_at);
+        CREATE TABLE IF NOT EXISTS trip_items (
+            id TEXT PRIMARY KEY,
+            trip_id TEXT NOT NULL REFERENCES trips (id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            location_key TEXT NOT NULL,
+            added_at TEXT NOT NULL,
+            notes TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_trip_items_trip ON trip_items (trip_id, position);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_trip_items_location ON trip_items (trip_id, location_key);
+    """
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self._pool = _ConnectionPool(path, pool_size)
+        self._write_lock = threading.Lock()
+        with self._pool.connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    async def create_trip(self, trip: Trip, owner_id: str) -> Trip:
+        await self._run(self._create_trip, trip, owner_id)
+        return trip
+
+    def _create_trip(self, trip: Trip, owner_id: str):
+        with self._write_lock, self._pool.connection() as conn, conn:
+            conn.execute(
+                "INSERT INTO trips (id, owner_id, name, created_at) VALUES (?, ?, ?, ?)",
+                (trip.id, owner_id, trip.name, trip.created_at.isoformat())
+            )
+            for position, item in enumerate(trip.items):
+                self._insert_item(conn, trip.id, position, item)
+
+    async def get_trip(self, trip_id: str) -> Optional[Trip]:
+        return await self._run(self._get_trip, trip_id)
+
+    def _get_trip(self, trip_id: str) -> Optional[Trip]:
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT id, name, created_at FROM trips WHERE id = ?", (trip_id,)
+            ).fetchone()
+            if not row:
+                return None
+            return self._load_trip(conn, row)
+
+    async def get_owner(self, trip_id: str) -> Optional[str]:
+        return await self._run(self._get_owner, trip_id)
+
+    def _get_owner(self, trip_id: str) -> Optional[str]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT owner_id FROM trips WHERE id = ?", (trip_id,)).fetchone()
+            return row[0] if row else None
+
+    async def get_version(self, trip_id: str) -> Optional[int]:
+        return await self._run(self._get_version, trip_id)
+
+    async def ping(self):
+        await self._run(self._ping)
+
+    def _ping(self):
+        with self._pool.connection() as conn:
+            conn.execute("SELECT 1 FROM trips LIMIT 1").fetchone()
+
+    def _get_version(self, trip_id: str) -> Optional[int]:
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT version FROM trips WHERE id = ?", (trip_id,)).fetchone()
+            return row[0] if row else None
+
+    async def list_trips(self, owner_id: str) -> List[Trip]:
+        return await self._run(self._list_trips, owner_id)
+
+    def _list_trips(self, owner_id: str) -> List[Trip]:
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, name, created_at FROM trips WHERE owner_id = ? ORDER BY created_at",
+                (owner_id,)
+            ).fetchall()
+            return [self._load_trip(conn, row) for row in rows]
+
+    async def add_items(self, trip_id: str, items: List[TripItem]) -> Trip:
+        return await self._run(self._add_items, trip_id, items)
+
+    def _add_items(self, trip_id: str, items: List[TripItem]) -> Trip:
+        with self._write_lock, self._pool.connection() as conn:
+            with conn:
+                self._require(conn, trip_id)
+                row = conn.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM trip_items WHERE trip_id = ?",
+                    (trip_id,)
+                ).fetchone()
+                before = conn.total_changes
+                for position, item in enumerate(items, start=row[0]):
+                    self._insert_item(conn, trip_id, position, item)
+                if conn.total_changes != before:
+                    self._bump_version(conn, trip_id)
+            return self._get_trip_with(conn, trip_id)
+
+    async def remove_items(self, trip_id: str, item_ids: List[str]) -> Trip:
+        return await self._run(self._remove_items, trip_id, item_ids)
+
+    def _remove_items(self, trip_id: str, item_ids: List[str]) -> Trip:
+        with self._write_lock, self._pool.connection() as conn:
+            with conn:
+                self._require(conn, trip_id)
+                before = conn.total_changes
+                conn.executemany(
+                    "DELETE FROM trip_items WHERE id = ? AND trip_id = ?",
+                    [(item_id, trip_id) for item_id in item_ids]
+                )
+                if conn.total_changes != before:
+                    self._bump_version(conn, trip_id)
+            return self._get_trip_with(conn, trip_id)
+
+    async def all_locations(self) -> List[Location]:
+        return await self._run(self._all_locations)
+
+    def _all_locations(self) -> List[Location]:
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT location FROM trip_items GROUP BY location_key ORDER BY MIN(rowid)"
+            ).fetchall()
+            return [Location.model_validate(json.loads(row[0])) for row in rows]
+
+    def _require(self, conn: sqlite3.Connection, trip_id: str):
+        if not conn.execute("SELECT 1 FROM trips WHERE id = ?", (trip_id,)).fetchone():
+            raise ValueError(f"Trip {trip_id} not found")
+
+    def _bump_version(self, conn: sqlite3.Connection, trip_id: str):
+        conn.execute("UPDATE trips SET version = version + 1 WHERE id = ?", (trip_id,))
+
+    def _get_trip_with(self, conn: sqlite3.Connection, trip_id: str) -> Trip:
+        row = conn.execute(
+            "SELECT id, name, created_at FROM trips WHERE id = ?", (trip_id,)
+        ).fetchone()
+        return self._load_trip(conn, row)
+
+    def _insert_item(self, conn: sqlite3.Connection, trip_id: str, position: int, item: TripItem):
+        # The unique (trip_id, location_key) index turns duplicates into no-ops
+        conn.execute(
+            "INSERT OR IGNORE INTO trip_items "
+            "(id, trip_id, position, location, location_key, added_at, notes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (item.id, trip_id, position, item.location.model_dump_json(),
+             location_key(item.location), item.added_at.isoformat(), item.notes)
+        )
+
+    def _load_trip(self, conn: sqlite3.Connection, row) -> Trip:
+        items = [
+            TripItem(
+                id=item_id,
+                location=Location.model_validate(json.loads(location)),
+                added_at=datetime.fromisoformat(added_at),
+                notes=notes
+            )
+            for item_id, location, added_at, notes in conn.execute(
+                "SELECT id, location, added_at, notes FROM trip_items "
+                "WHERE trip_id = ? ORDER BY position",
+                (row[0],)
+            )
+        ]
+        return Trip(id=row[0], name=row[1], created_at=datetime.fromisoformat(row[2]), items=items)
+
+    async def close(self):
+        self._pool.close()
+
+
+def create_trip_store(settings) -> TripStore:
+    if settings.trip_store_backend == "sqlite":
+        return SQLiteTripStore(settings.trip_db_path, pool_size=settings.trip_db_pool_size)
+    return InMemoryTripStore()
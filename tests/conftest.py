@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+# The Maps client checks the key format when services are built
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIza-test-key")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
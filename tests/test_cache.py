@@ -0,0 +1,144 @@
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from services.cache import ByteCache, TTLCache
+from services.place_store import intern_strings
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_set_is_written_to_disk_by_the_writer_thread(db_path):
+    cache = TTLCache("places", db_path=db_path)
+    cache.set("louvre", {"lat": 48.86})
+    cache.flush()
+    cache.close()
+
+    reopened = TTLCache("places", db_path=db_path)
+    assert reopened.get("louvre") == {"lat": 48.86}
+    reopened.close()
+
+
+def test_set_does_not_wait_for_a_locked_database(db_path):
+    cache = TTLCache("places", db_path=db_path)
+    # Another worker holds the write lock
+    other = sqlite3.connect(db_path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+
+    start = time.perf_counter()
+    for i in range(100):
+        cache.set(f"key-{i}", i)
+    assert time.perf_counter() - start < 0.5
+    assert cache.get("key-7") == 7
+
+    other.execute("COMMIT")
+    other.close()
+    cache.close()
+    with sqlite3.connect(db_path) as db:
+        assert db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 100
+
+
+def test_database_runs_in_wal_mode(db_path):
+    cache = TTLCache("places", db_path=db_path)
+    assert cache._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert cache._db.execute("PRAGMA busy_timeout").fetchone()[0] == TTLCache.READ_BUSY_TIMEOUT_MS
+    cache.close()
+
+
+def test_read_errors_fall_through_to_a_miss(db_path):
+    cache = TTLCache("places", db_path=db_path)
+
+    class BrokenConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+        def close(self):
+            pass
+
+    cache._db = BrokenConnection()
+    assert cache.get("louvre") is None
+    assert cache.expires_in("louvre") is None
+    assert cache.stats()["disk_errors"] == 2
+    cache.close()
+
+
+def test_expired_disk_entries_are_removed(db_path):
+    cache = TTLCache("places", ttl=-1, db_path=db_path)
+    cache.set("louvre", 1)
+    cache.flush()
+    cache._entries.clear()
+    assert cache.get("louvre") is None
+    cache.close()
+
+    with sqlite3.connect(db_path) as db:
+        assert db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 0
+
+
+def test_namespaces_share_a_file(db_path):
+    search = TTLCache("search", db_path=db_path)
+    details = TTLCache("details", db_path=db_path)
+    search.set("louvre", "search result")
+    details.set("louvre", "details result")
+    search.clear()
+    search.close()
+    details.close()
+
+    search = TTLCache("search", db_path=db_path)
+    details = TTLCache("details", db_path=db_path)
+    assert search.get("louvre") is None
+    assert details.get("louvre") == "details result"
+    search.close()
+    details.close()
+
+
+def test_compacted_entries_share_their_strings(db_path):
+    cache = TTLCache("recommendations", db_path=db_path, compact=intern_strings)
+    # Decoded separately, as two replies naming the same place would be
+    first, second = (json.loads('{"name": "Louvre Museum", "address": "Rue de Rivoli, Paris"}') for _ in range(2))
+    assert first["address"] is not second["address"]
+    cache.set("first", [first])
+    cache.set("second", [second])
+    assert cache.get("first")[0]["address"] is cache.get("second")[0]["address"]
+
+    cache.flush()
+    reopened = TTLCache("recommendations", db_path=db_path, compact=intern_strings)
+    assert reopened.get("first")[0]["name"] is cache.get("second")[0]["name"]
+    cache.close()
+    reopened.close()
+
+
+@pytest.mark.anyio
+async def test_byte_cache_disk_io_runs_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingByteCache(ByteCache):
+        def _read_file(self, key, now):
+            threads.append(threading.current_thread())
+            return super()._read_file(key, now)
+
+        def _write_file(self, key, data, content_type, expires_at):
+            threads.append(threading.current_thread())
+            super()._write_file(key, data, content_type, expires_at)
+
+    await ByteCache("photos", directory=str(tmp_path)).set("louvre:200", b"jpeg", "image/jpeg")
+    # A fresh cache (another worker, or after a restart) finds the file
+    cache = RecordingByteCache("photos", directory=str(tmp_path))
+    assert await cache.get("louvre:200") == (b"jpeg", "image/jpeg")
+    await cache.set("orsay:200", b"png", "image/png")
+    assert len(threads) == 2 and threading.current_thread() not in threads
+
+
+@pytest.mark.anyio
+async def test_byte_cache_evicts_least_recently_read_files(tmp_path):
+    cache = ByteCache("photos", max_bytes=0, directory=str(tmp_path), max_disk_bytes=3000)
+    for i in range(5):
+        await cache.set(f"photo-{i}", b"x" * 1000, "image/jpeg")
+    assert cache.stats()["disk_bytes"] <= 3000
+    assert await cache.get("photo-4") is not None
+    assert await cache.get("photo-0") is None
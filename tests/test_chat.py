@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import chat
+from models.schemas import Location
+from services.maps_service import GoogleMapsService
+from services.resilience import DeadlineExceeded, UpstreamTimeout
+from services.session_store import SessionStore
+
+
+def place(name: str) -> dict:
+    return {"name": name, "description": f"About {name}", "category": "museum", "address": f"{name}, Paris"}
+
+
+class FakeRecommendations:
+    async def get_travel_recommendations(self, user_message, city=None, context=None):
+        return f"Reply to {user_message}", [place("Louvre Museum"), place(f"{city} Museum")], "miss"
+
+
+@pytest.fixture
+def services():
+    maps = GoogleMapsService(batch_window=0)
+
+    async def geocode(loc_data, include_photos=True):
+        if loc_data["name"] == "Lyon Museum":
+            raise DeadlineExceeded("Geocoding Lyon Museum ran out of request budget")
+        return Location(**loc_data, lat=48.86, lng=2.34)
+
+    maps._geocode_single_location = geocode
+    yield SimpleNamespace(maps=maps, sessions=SessionStore(), recommendations=FakeRecommendations())
+    maps.close()
+
+
+@pytest.fixture
+def client(services):
+    app = FastAPI()
+    app.state.services = services
+    app.include_router(chat.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_batch_drops_only_the_places_that_failed_to_geocode(client):
+    response = client.post("/api/chat/batch", json={"requests": [
+        {"message": "museums", "city": "Paris"},
+        {"message": "museums", "city": "Lyon"}
+    ]})
+    assert response.status_code == 200
+    paris, lyon = response.json()["results"]
+    assert [location["name"] for location in paris["locations"]] == ["Louvre Museum", "Paris Museum"]
+    assert [location["name"] for location in lyon["locations"]] == ["Louvre Museum"]
+
+
+def test_upstream_timeout_returns_503_with_retry_after(client, services):
+    async def timed_out(user_message, city=None, context=None):
+        raise UpstreamTimeout("openai.chat.completions failed after 3 attempts", retry_after=1.0)
+
+    services.recommendations.get_travel_recommendations = timed_out
+    response = client.post("/api/chat", json={"message": "museums", "city": "Paris"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from models.schemas import Location
+from services import metrics
+from services.geocode_batcher import GeocodeBatcher
+from services.maps_service import GoogleMapsService
+from services.resilience import DeadlineExceeded, deadline, remaining
+
+pytestmark = pytest.mark.anyio
+
+
+def place(number: int, spelling=str, description: str = "") -> dict:
+    return {
+        "name": spelling(f"Popular Place {number}"),
+        "description": description or f"Place {number}",
+        "category": "landmark",
+        "address": f"{number} Example Avenue, Paris"
+    }
+
+
+class FakeResolver:
+    """Stands in for GoogleMapsService._resolve_location"""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self.deadlines = []
+
+    async def __call__(self, loc_data: dict, include_photos: bool = True) -> Location:
+        self.calls.append(loc_data["address"])
+        self.deadlines.append(remaining())
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            with metrics.span("maps", "places"):
+                await asyncio.sleep(self.latency)
+        finally:
+            self.running -= 1
+        return Location(**loc_data, lat=48.85, lng=2.35)
+
+
+async def test_overlapping_requests_resolve_each_place_once():
+    resolver = FakeResolver()
+    batcher = GeocodeBatcher(resolver, window=0.01, concurrency=4)
+    spellings = (str, str.lower, str.upper, lambda name: f"{name}!")
+
+    async def chat(number: int):
+        # Every chat asks for three of the same five places, spelled its own way
+        places = [place((number + offset) % 5, spellings[number % 4], f"Chat {number}") for offset in range(3)]
+        return places, await asyncio.gather(*(batcher.submit(loc) for loc in places))
+
+    results = await asyncio.gather(*(chat(number) for number in range(40)))
+
+    # 120 lookups from 40 requests: one resolution per place, at most 4 at a time
+    assert sorted(resolver.calls) == sorted(place(number)["address"] for number in range(5))
+    assert resolver.peak <= 4
+    assert batcher.stats()["deduplicated"] == 115
+    for asked, got in results:
+        assert [(loc.name, loc.description) for loc in got] == [(loc["name"], loc["description"]) for loc in asked]
+    batcher.close()
+
+
+async def test_lookups_do_not_inherit_the_flushing_request_context():
+    resolver = FakeResolver()
+    batcher = GeocodeBatcher(resolver, window=0.01)
+    with deadline(5):
+        await batcher.submit(place(1))
+    assert resolver.deadlines == [None]
+
+
+async def test_every_waiter_gets_the_lookup_spans():
+    resolver = FakeResolver()
+    batcher = GeocodeBatcher(resolver, window=0.01)
+
+    async def request(description: str):
+        token, timings = metrics.start_request_timings()
+        try:
+            await batcher.submit(place(1, description=description))
+        finally:
+            metrics.finish_request_timings(token)
+        return timings
+
+    first, second = await asyncio.gather(request("first"), request("second"))
+    assert len(resolver.calls) == 1
+    assert [name for name, _ in first] == ["maps.places"]
+    assert [name for name, _ in second] == ["maps.places"]
+
+
+async def test_each_waiter_keeps_its_own_deadline():
+    resolver = FakeResolver(latency=0.1)
+    batcher = GeocodeBatcher(resolver, window=0.001)
+
+    async def hurried():
+        with deadline(0.02):
+            return await batcher.submit(place(1, description="hurried"))
+
+    hurried_result, patient_result = await asyncio.gather(
+        hurried(), batcher.submit(place(1, description="patient")), return_exceptions=True
+    )
+    assert isinstance(hurried_result, DeadlineExceeded)
+    # The hurried request running out of time didn't cut the lookup short for the other one
+    assert patient_result.description == "patient"
+    assert len(resolver.calls) == 1
+
+
+async def test_cancelled_lookup_is_not_joined_by_later_requests():
+    resolver = FakeResolver(latency=0.1)
+    batcher = GeocodeBatcher(resolver, window=0.001)
+    first = asyncio.ensure_future(batcher.submit(place(1)))
+    await asyncio.sleep(0.02)
+    assert batcher.queue_depth()["running"] == 1
+
+    first.cancel()
+    # Joins nothing: the cancelled lookup is already forgotten
+    second = asyncio.ensure_future(batcher.submit(place(1)))
+    await asyncio.sleep(0)
+    assert (await second).name == "Popular Place 1"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert len(resolver.calls) == 2
+
+
+async def test_geocode_locations_drops_cancelled_lookups():
+    service = GoogleMapsService(batch_window=0)
+
+    async def geocode(loc_data, include_photos=True):
+        if loc_data["name"] == "Popular Place 2":
+            raise asyncio.CancelledError()
+        return Location(**loc_data, lat=48.85, lng=2.35)
+
+    service._geocode_single_location = geocode
+    locations = await service.geocode_locations([place(1), place(2), place(3)])
+    assert [location.name for location in locations] == ["Popular Place 1", "Popular Place 3"]
+    service.close()
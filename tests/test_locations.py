@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import locations, trips
+from models.schemas import Location
+from services.maps_service import GoogleMapsService
+from services.spatial_index import SpatialIndex
+
+FAKE_LOUVRE = {
+    "name": "Louvre Museum",
+    "description": "Saved by a client",
+    "category": "museum",
+    "address": "Rue de Rivoli, Paris",
+    "lat": 10.0,
+    "lng": 10.0,
+    "photo_url": "https://attacker.example/photo.jpg"
+}
+
+
+@pytest.fixture
+def services():
+    return SimpleNamespace(places=SpatialIndex())
+
+
+@pytest.fixture
+def client(services):
+    app = FastAPI()
+    app.state.services = services
+    app.include_router(trips.router, prefix="/api")
+    app.include_router(locations.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_saved_locations_are_not_reused_for_geocoding(client, services):
+    response = client.post("/api/trip/add-location", json={"location": FAKE_LOUVRE},
+                           headers={"X-User-Id": "test-saved-locations"})
+    assert response.status_code == 200
+
+    assert len(services.places) == 0
+    maps = GoogleMapsService(index=services.places)
+    assert maps._known_location({**FAKE_LOUVRE, "description": "Another user's chat"}) is None
+    maps.close()
+
+
+def test_locations_endpoints_list_geocoded_places_and_the_callers_own_saved_places(client, services):
+    geocoded = Location(**{**FAKE_LOUVRE, "lat": 48.8606, "lng": 2.3376, "photo_url": None})
+    services.places.add(geocoded)
+    client.post("/api/trip/add-locations", headers={"X-User-Id": "test-locations-owner"}, json={"locations": [
+        {**FAKE_LOUVRE, "lat": 48.8606, "lng": 2.3376},
+        {**FAKE_LOUVRE, "name": "Musee d'Orsay", "address": "Rue de la Legion d'Honneur, Paris",
+         "lat": 48.86, "lng": 2.3266}
+    ]})
+
+    owner = {"X-User-Id": "test-locations-owner"}
+    params = {"lat": 48.8606, "lng": 2.3376, "radius": 2000}
+    response = client.get("/api/locations/nearby", params=params, headers=owner)
+    found = [(match["location"]["name"], match["location"]["photo_url"]) for match in response.json()["locations"]]
+    # The geocoded Louvre wins over the saved copy of it
+    assert found == [("Louvre Museum", None), ("Musee d'Orsay", FAKE_LOUVRE["photo_url"])]
+
+    bounds = {"north": 49, "south": 48, "east": 3, "west": 2}
+    response = client.get("/api/locations/within", params=bounds, headers=owner)
+    assert sorted(location["name"] for location in response.json()["locations"]) == ["Louvre Museum", "Musee d'Orsay"]
+
+
+def test_other_users_saved_places_are_not_listed(client, services):
+    client.post("/api/trip/add-location", headers={"X-User-Id": "test-locations-attacker"}, json={
+        "location": {**FAKE_LOUVRE, "name": "Fake Gallery", "lat": 48.8606, "lng": 2.3376}
+    })
+
+    for user in ("test-locations-victim", "anonymous"):
+        response = client.get("/api/locations/nearby", params={"lat": 48.8606, "lng": 2.3376, "radius": 2000},
+                              headers={"X-User-Id": user})
+        assert "Fake Gallery" not in [match["location"]["name"] for match in response.json()["locations"]]
+        response = client.get("/api/locations/within", params={"north": 49, "south": 48, "east": 3, "west": 2},
+                              headers={"X-User-Id": user})
+        assert "Fake Gallery" not in [location["name"] for location in response.json()["locations"]]
@@ -0,0 +1,28 @@
+import pytest
+
+from config import settings
+from services.maps_service import GoogleMapsService
+
+PLACE = {"name": "Louvre Museum", "description": "Art", "category": "museum", "address": "Paris"}
+PLACE_RESULT = {
+    "formatted_address": "Rue de Rivoli, 75001 Paris, France",
+    "geometry": {"location": {"lat": 48.8606, "lng": 2.3376}},
+    "photos": [{"photo_reference": "AWU5eFg"}]
+}
+
+
+@pytest.fixture
+def service():
+    service = GoogleMapsService(batch_window=0)
+    yield service
+    service.close()
+
+
+def test_photo_urls_are_absolute_under_the_public_base_url(service, monkeypatch):
+    monkeypatch.setattr(settings, "public_base_url", "https://api.example.com/")
+    location = service._create_location_from_place(PLACE, PLACE_RESULT)
+    assert location.photo_url == "https://api.example.com/api/photos/AWU5eFg?maxwidth=200"
+
+
+def test_no_photo_url_without_photos(service):
+    assert service._create_location_from_place(PLACE, PLACE_RESULT, include_photos=False).photo_url is None
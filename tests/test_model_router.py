@@ -0,0 +1,81 @@
+import pytest
+from openai import AsyncOpenAI
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from services.model_router import DEFAULT_SYSTEM_PROMPT, ModelRouter, reply_budget
+from services.openai_service import OpenAIService
+
+SMALL_MODEL = "small-fast-model"
+LARGE_MODEL = "large-model"
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(
+        default_model="standard-model", quick_model=SMALL_MODEL, detailed_model=LARGE_MODEL,
+        max_tokens=1000, detailed_max_tokens=1600
+    )
+
+
+@pytest.mark.parametrize("message, city, history, tier", [
+    ("3 museums in Paris", None, None, "quick"),
+    ("Good rooftop bars", "Tokyo", None, "quick"),
+    ("Where should I eat tonight?", None, None, "standard"),
+    ("Recommend places", None, None, "standard"),
+    ("Good rooftop bars", "Tokyo", [{"role": "user", "content": "Hi"}], "standard"),
+    ("5 cafes in Rome", None, None, "standard"),
+    ("Plan a 3 day itinerary in Kyoto", None, None, "detailed"),
+    ("Compare the Louvre and the Musée d'Orsay", "Paris", None, "detailed"),
+    ("Give me 8 places in Mexico City", None, None, "detailed"),
+    ("Somewhere quiet to read, " * 15, "London", None, "detailed"),
+])
+def test_requests_are_classified_into_tiers(router, message, city, history, tier):
+    assert router.route(message, city, history=history).name == tier
+
+
+def test_each_tier_gets_its_model_and_reply_budget(router):
+    quick = router.route("3 museums in Paris")
+    assert (quick.model, quick.locations, quick.max_tokens) == (SMALL_MODEL, (3, 3), reply_budget(3, 40))
+
+    standard = router.route("Where should I eat tonight?")
+    assert (standard.model, standard.locations, standard.max_tokens) == ("standard-model", (3, 5), reply_budget(5, 70))
+
+    detailed = router.route("Give me 8 places in Mexico City")
+    assert (detailed.model, detailed.locations, detailed.max_tokens) == (LARGE_MODEL, (8, 8), reply_budget(8, 50))
+
+
+def test_reply_budgets_are_capped_per_tier():
+    router = ModelRouter(default_model="standard-model", max_tokens=200, detailed_max_tokens=300)
+    quick = router.route("3 museums in Paris")
+    assert (quick.model, quick.max_tokens) == ("standard-model", 200)
+    assert router.route("Where should I eat tonight?").max_tokens == 200
+    assert router.route("Plan a weekend in Lisbon").max_tokens == 300
+
+
+def test_disabled_routing_falls_back_to_the_default_route():
+    router = ModelRouter(enabled=False, default_model="standard-model", quick_model=SMALL_MODEL, max_tokens=1000)
+    for message in ("3 museums in Paris", "Plan a 3 day itinerary in Kyoto"):
+        route = router.route(message)
+        assert (route.name, route.model, route.max_tokens) == ("default", "standard-model", 1000)
+        assert router.system_prompt(route, "json") == DEFAULT_SYSTEM_PROMPT
+
+
+@pytest.mark.anyio
+async def test_the_routed_model_and_budget_reach_the_api(router):
+    fake = FakeOpenAIServer(latency=0)
+    with fake as url:
+        client = AsyncOpenAI(api_key="sk-test", base_url=url, max_retries=0)
+        service = OpenAIService(client=client, router=router)
+        try:
+            for message in ("3 museums in Paris", "Where should I eat tonight?", "Plan a weekend in Lisbon"):
+                _, locations = await service.get_travel_recommendations(message)
+                assert locations
+        finally:
+            await client.close()
+
+    sent = [(body["model"], body["max_tokens"]) for body in fake.requests]
+    assert sent == [
+        (SMALL_MODEL, router.route("3 museums in Paris").max_tokens),
+        ("standard-model", router.route("Where should I eat tonight?").max_tokens),
+        (LARGE_MODEL, router.route("Plan a weekend in Lisbon").max_tokens)
+    ]
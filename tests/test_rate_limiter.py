@@ -0,0 +1,184 @@
+import pytest
+
+from config import Settings
+from services import rate_limiter
+from services.rate_limiter import (
+    InMemoryRateLimitBackend, RateLimiter, RedisRateLimitBackend, create_rate_limiter, parse_route_limits
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    # 20 s into a 60 s window
+    def __init__(self, now: float = 1_000_040.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+class FakeRedis:
+    """The commands RedisRateLimitBackend uses, with expiry on the fake clock"""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.values = {}
+        self.expires = {}
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= self.clock.now:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+
+    async def incr(self, key):
+        self.values[key] = int(self._live(key) or 0) + 1
+        return self.values[key]
+
+    async def decr(self, key):
+        self.values[key] = int(self._live(key) or 0) - 1
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        self.expires[key] = self.clock.now + seconds
+        return True
+
+    async def get(self, key):
+        value = self._live(key)
+        return None if value is None else str(value).encode()
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    async def ping(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.client, name)(*args) for name, args in self.commands]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def backend(request, clock):
+    backend = InMemoryRateLimitBackend() if request.param == "memory" else RedisRateLimitBackend(FakeRedis(clock))
+    yield backend
+    await backend.close()
+
+
+async def test_requests_over_the_limit_are_rejected(backend):
+    results = [await backend.hit("client", limit=3, window=60) for _ in range(5)]
+    assert [result.allowed for result in results] == [True, True, True, False, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+
+
+async def test_rejected_requests_do_not_count(backend, clock):
+    for _ in range(10):
+        await backend.hit("client", limit=3, window=60)
+    # Into the next window: the previous one still weighs 2/3, so 3 * 2/3 = 2 count
+    clock.now += 60
+    assert (await backend.hit("client", limit=3, window=60)).allowed
+    assert not (await backend.hit("client", limit=3, window=60)).allowed
+
+
+async def test_previous_window_stops_counting_as_it_slides_out(backend, clock):
+    for _ in range(3):
+        await backend.hit("client", limit=3, window=60)
+    clock.now += 40
+    assert not (await backend.hit("client", limit=3, window=60)).allowed
+    # Two windows on, none of the old requests count
+    clock.now += 120
+    results = [await backend.hit("client", limit=3, window=60) for _ in range(3)]
+    assert all(result.allowed for result in results)
+
+
+async def test_keys_are_limited_separately(backend):
+    for _ in range(3):
+        await backend.hit("client-a", limit=3, window=60)
+    assert not (await backend.hit("client-a", limit=3, window=60)).allowed
+    assert (await backend.hit("client-b", limit=3, window=60)).allowed
+
+
+async def test_routes_get_their_own_limits_and_keys(backend):
+    limiter = RateLimiter(backend, default_limit=1, route_limits={"/api/photos": 3, "/api/chat": 2})
+    assert limiter.limit_for("/api/photos/abc") == ("/api/photos", 3)
+    assert limiter.limit_for("/api/trip") == ("*", 1)
+
+    assert [(await limiter.hit("client", "/api/chat")).allowed for _ in range(3)] == [True, True, False]
+    # Photos and other routes are counted apart from chat
+    assert [(await limiter.hit("client", "/api/photos/abc")).allowed for _ in range(4)] == [True, True, True, False]
+    assert (await limiter.hit("client", "/api/trip")).allowed
+    assert limiter.rejections == 2
+
+
+async def test_redis_keys_expire_after_two_windows(clock):
+    client = FakeRedis(clock)
+    backend = RedisRateLimitBackend(client)
+    await backend.hit("*:client", limit=3, window=60)
+    index = int(clock.now // 60)
+    assert client.expires[f"ratelimit:*:client:{index}"] == clock.now + 120
+
+
+async def test_memory_backend_evicts_idle_keys(clock):
+    backend = InMemoryRateLimitBackend(idle_ttl=300)
+    await backend.hit("client", limit=3, window=60)
+    assert backend.evict_idle(clock.now + 60) == 0
+    assert backend.evict_idle(clock.now + 400) == 1
+    assert len(backend) == 0
+    await backend.close()
+
+
+def test_parse_route_limits():
+    assert parse_route_limits("/api/chat=10, /api/photos=300,bad") == {"/api/chat": 10, "/api/photos": 300}
+
+
+def test_photos_and_chat_batches_have_their_own_default_limits():
+    settings = Settings(max_requests_per_minute=10, rate_limit_routes="/api/chat=5")
+    limiter = create_rate_limiter(settings)
+    assert limiter.limit_for("/api/photos/abc?maxwidth=200") == ("/api/photos", settings.rate_limit_photos_per_minute)
+    assert limiter.limit_for("/api/chat/batch") == ("/api/chat/batch", settings.rate_limit_chat_batch_per_minute)
+    assert limiter.limit_for("/api/chat") == ("/api/chat", 5)
+    assert limiter.limit_for("/api/chat/stream") == ("/api/chat", 5)
+    assert limiter.limit_for("/api/trip") == ("*", 10)
+
+    limiter = create_rate_limiter(Settings(rate_limit_routes="/api/photos=50"))
+    assert limiter.limit_for("/api/photos/abc") == ("/api/photos", 50)
+
+
+async def test_backend_errors_let_requests_through(clock):
+    redis = FakeRedis(clock)
+    limiter = RateLimiter(RedisRateLimitBackend(redis), default_limit=1)
+
+    async def down(*args):
+        raise ConnectionError("Connection refused")
+
+    redis.incr = down
+    results = [await limiter.hit("client", "/api/chat") for _ in range(3)]
+    assert all(result.allowed for result in results)
+    assert limiter.backend_errors == 3
+    assert limiter.rejections == 0
+
+    del redis.incr
+    assert (await limiter.hit("client", "/api/chat")).allowed
+    assert not (await limiter.hit("client", "/api/chat")).allowed
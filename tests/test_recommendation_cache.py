@@ -0,0 +1,64 @@
+import pytest
+
+from services.model_router import ModelRouter
+from services.recommendation_cache import HashingEmbedder, RecommendationCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeOpenAIService:
+    """Answers with the route the request took, like the real service would pick it"""
+
+    def __init__(self, router: ModelRouter):
+        self.router = router
+        self.calls = []
+
+    async def get_travel_recommendations(self, user_message, city=None, context=None):
+        route = self.router.route(user_message, city, context)
+        self.calls.append(route.name)
+        return f"{route.name} reply", [{"name": "Louvre Museum", "description": route.name}]
+
+
+@pytest.fixture
+def openai_service():
+    return FakeOpenAIService(ModelRouter(default_model="gpt-standard", quick_model="gpt-quick"))
+
+
+def test_messages_with_the_same_words_differ_by_route(openai_service):
+    cache = RecommendationCache(openai_service)
+    quick_key, quick_scope, quick_message = cache.fingerprint("museums in Paris")
+    standard_key, standard_scope, standard_message = cache.fingerprint("Paris museums")
+
+    assert quick_message == standard_message
+    assert quick_key != standard_key
+    assert "quick|gpt-quick" in quick_scope and "standard|gpt-standard" in standard_scope
+    # Same route, same words: still one entry
+    assert cache.fingerprint("best museums in Paris")[0] == quick_key
+
+
+async def test_tiers_never_share_an_entry(openai_service):
+    cache = RecommendationCache(openai_service)
+    quick, _, status = await cache.get_travel_recommendations("museums in Paris")
+    assert (quick, status) == ("quick reply", "miss")
+
+    standard, _, status = await cache.get_travel_recommendations("Paris museums")
+    assert (standard, status) == ("standard reply", "miss")
+
+    assert (await cache.get_travel_recommendations("best museums in Paris"))[::2] == ("quick reply", "hit")
+    assert (await cache.get_travel_recommendations("Paris museums please"))[::2] == ("standard reply", "hit")
+    assert openai_service.calls == ["quick", "standard"]
+
+
+async def test_similar_lookups_stay_within_a_route(openai_service):
+    cache = RecommendationCache(openai_service, embedder=HashingEmbedder(), similarity_threshold=0.5)
+    await cache.get_travel_recommendations("museums in Paris")
+    reply, _, status = await cache.get_travel_recommendations("Paris museums and galleries")
+    assert (reply, status) == ("standard reply", "miss")
+
+
+def test_router_settings_change_the_key(openai_service):
+    cache = RecommendationCache(openai_service)
+    other = RecommendationCache(FakeOpenAIService(ModelRouter(default_model="gpt-standard", quick_model="gpt-other")))
+    assert cache.fingerprint("museums in Paris")[0] != other.fingerprint("museums in Paris")[0]
+    unrouted = RecommendationCache(FakeOpenAIService(ModelRouter(enabled=False, default_model="gpt-standard")))
+    assert cache.fingerprint("Paris museums")[0] != unrouted.fingerprint("Paris museums")[0]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientUpstream, RetryPolicy, UpstreamTimeout,
+    UpstreamUnavailable, deadline
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def make_upstream(timeout: float = 0.05) -> ResilientUpstream:
+    return ResilientUpstream(
+        "test",
+        timeout=timeout,
+        retry=RetryPolicy(attempts=1),
+        breaker=CircuitBreaker("test", failure_threshold=1),
+        is_retriable=lambda e: True
+    )
+
+
+async def slow():
+    await asyncio.sleep(1)
+
+
+async def test_upstream_timeout_counts_against_the_breaker():
+    upstream = make_upstream()
+    with pytest.raises(UpstreamTimeout) as raised:
+        await upstream.call("slow", slow)
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    assert raised.value.retry_after >= 1
+
+
+async def test_running_out_of_request_budget_does_not_count():
+    upstream = make_upstream(timeout=5)
+    for _ in range(3):
+        with deadline(0.02), pytest.raises(DeadlineExceeded):
+            await upstream.call("slow", slow)
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_retriable_errors_surface_as_upstream_unavailable_after_the_last_attempt():
+    upstream = make_upstream()
+    upstream.breaker.failure_threshold = 5
+
+    async def failing():
+        raise ConnectionError("connection reset")
+
+    with pytest.raises(UpstreamUnavailable) as raised:
+        await upstream.call("failing", failing)
+    assert isinstance(raised.value.__cause__, ConnectionError)
+    assert raised.value.retry_after >= 1
+
+
+def test_retry_after_has_a_floor_while_a_probe_is_in_flight():
+    now = [0.0]
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 10.0
+    breaker.before_call()  # the half-open probe goes out
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after >= 1
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from services.session_store import SessionStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+async def test_workers_sharing_the_file_see_each_others_turns(db_path):
+    first, second = SessionStore(db_path=db_path), SessionStore(db_path=db_path)
+    try:
+        session = await first.get_or_create(city="Paris")
+        first.record_turn(session, "museums?", "Try the Louvre", [{"name": "Louvre Museum"}])
+
+        seen = await second.get(session.id)
+        assert [turn.user_message for turn in seen.turns] == ["museums?"]
+        assert list(seen.locations.values()) == ["Louvre Museum"]
+    finally:
+        first.close()
+        second.close()
+
+
+async def test_length_is_counted_without_querying_the_table(db_path):
+    store = SessionStore(db_path=db_path)
+    try:
+        sessions = [await store.get_or_create() for _ in range(3)]
+        assert len(store) == 3
+        assert await store.delete(sessions[0].id)
+        assert not await store.delete(sessions[0].id)
+        assert len(store) == 2
+    finally:
+        store.close()
+
+    reopened = SessionStore(db_path=db_path)
+    try:
+        assert len(reopened) == 2
+    finally:
+        reopened.close()
+
+
+async def test_sqlite_runs_off_the_event_loop(db_path, monkeypatch):
+    store = SessionStore(db_path=db_path)
+    threads = set()
+    execute = store._execute
+    fetch = store._fetch
+
+    def record(fn):
+        def wrapper(*args):
+            threads.add(threading.current_thread())
+            return fn(*args)
+        return wrapper
+
+    monkeypatch.setattr(store, "_execute", record(execute))
+    monkeypatch.setattr(store, "_fetch", record(fetch))
+    try:
+        session = await store.get_or_create()
+        await store.get(session.id)
+        await store.delete(session.id)
+        assert threads and threading.main_thread() not in threads
+    finally:
+        store.close()
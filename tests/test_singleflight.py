@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from services import metrics
+from services.metrics import _request_timings
+from services.resilience import DeadlineExceeded, deadline, remaining
+from services.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeUpstream:
+    def __init__(self, latency: float = 0.02, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+        self.deadlines = []
+
+    async def fetch(self):
+        self.calls += 1
+        self.deadlines.append(remaining())
+        try:
+            with metrics.span("fake", "fetch"):
+                await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return {"calls": self.calls}
+
+
+async def test_concurrent_callers_share_one_upstream_call():
+    flight, upstream = SingleFlight(), FakeUpstream()
+    results = await asyncio.gather(*(flight.do("louvre", upstream.fetch) for _ in range(200)))
+    assert upstream.calls == 1
+    assert all(result == {"calls": 1} for result in results)
+    assert (flight.calls, flight.coalesced) == (1, 199)
+    assert not flight.in_flight("louvre")
+
+
+async def test_different_keys_do_not_share():
+    flight, upstream = SingleFlight(), FakeUpstream()
+    await asyncio.gather(flight.do("louvre", upstream.fetch), flight.do("orsay", upstream.fetch))
+    assert upstream.calls == 2
+
+
+async def test_errors_reach_every_waiter():
+    flight, upstream = SingleFlight(), FakeUpstream(error=ValueError("upstream down"))
+    results = await asyncio.gather(*(flight.do("louvre", upstream.fetch) for _ in range(20)), return_exceptions=True)
+    assert upstream.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    # The next caller starts a fresh call
+    with pytest.raises(ValueError):
+        await flight.do("louvre", upstream.fetch)
+    assert upstream.calls == 2
+
+
+async def test_cancelled_caller_does_not_cancel_the_call_for_others():
+    flight, upstream = SingleFlight(), FakeUpstream(latency=0.05)
+    callers = [asyncio.ensure_future(flight.do("louvre", upstream.fetch)) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    for caller in callers[:5]:
+        caller.cancel()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in results[:5])
+    assert results[5:] == [{"calls": 1}] * 5
+    assert upstream.calls == 1 and not upstream.cancelled
+
+
+async def test_call_is_cancelled_once_every_caller_is_gone():
+    flight, upstream = SingleFlight(), FakeUpstream(latency=0.05)
+    callers = [asyncio.ensure_future(flight.do("louvre", upstream.fetch)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert upstream.cancelled
+    assert not flight.in_flight("louvre")
+
+
+async def test_shared_call_does_not_inherit_the_first_callers_deadline():
+    flight, upstream = SingleFlight(), FakeUpstream(latency=0.05)
+
+    async def hurried():
+        with deadline(0.01):
+            return await flight.do("louvre", upstream.fetch)
+
+    hurried_result, patient_result = await asyncio.gather(
+        hurried(), flight.do("louvre", upstream.fetch), return_exceptions=True
+    )
+    assert upstream.deadlines == [None]
+    # The first caller gives up at its own deadline; the call goes on for the other one
+    assert isinstance(hurried_result, DeadlineExceeded)
+    assert patient_result == {"calls": 1}
+    assert not upstream.cancelled
+
+
+async def test_every_waiter_gets_the_shared_spans():
+    flight, upstream = SingleFlight(), FakeUpstream()
+
+    async def request():
+        token, timings = metrics.start_request_timings()
+        try:
+            await flight.do("louvre", upstream.fetch)
+        finally:
+            metrics.finish_request_timings(token)
+        return timings
+
+    first, second = await asyncio.gather(request(), request())
+    assert [name for name, _ in first] == ["fake.fetch"]
+    assert [name for name, _ in second] == ["fake.fetch"]
+    assert _request_timings.get() is None
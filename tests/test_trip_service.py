@@ -0,0 +1,26 @@
+import pytest
+
+from services.trip_service import TripService
+from services.trip_store import InMemoryTripStore
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_default_trip_ids_are_bounded():
+    service = TripService(InMemoryTripStore(), default_trip_cache_size=10)
+    first = await service.get_default_trip_id("user-0")
+    for user in range(1, 100):
+        await service.get_default_trip_id(f"user-{user}")
+
+    assert service.default_trip_ids.stats()["size"] == 10
+    # Evicted users get their existing trip back from the store, not a new one
+    assert await service.get_default_trip_id("user-0") == first
+    assert len(await service.list_trips("user-0")) == 1
+
+
+async def test_each_user_gets_their_own_default_trip():
+    service = TripService(InMemoryTripStore())
+    alice = await service.get_default_trip_id("alice")
+    assert await service.get_default_trip_id("alice") == alice
+    assert await service.get_default_trip_id("bob") != alice
+    assert await service.get_trip(alice, user_id="bob") is None
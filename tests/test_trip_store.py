@@ -0,0 +1,145 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from models.schemas import Location, Trip, TripItem
+from services.trip_store import InMemoryTripStore, SQLiteTripStore
+
+pytestmark = pytest.mark.anyio
+
+
+def make_item(place: int, item_id: str = None) -> TripItem:
+    return TripItem(
+        id=item_id or f"item-{place}",
+        location=Location(
+            name=f"Place {place}",
+            description=f"Description {place}",
+            category="museum",
+            address=f"{place} Example Street, Paris",
+            lat=48.85 + place / 1000,
+            lng=2.35 + place / 1000
+        ),
+        added_at=datetime(2024, 5, 1, 12, 0, place % 60)
+    )
+
+
+def make_trip(trip_id: str = "trip", hour: int = 0) -> Trip:
+    return Trip(id=trip_id, name=f"Trip {trip_id}", created_at=datetime(2024, 5, 1, hour), items=[])
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+async def store(request, tmp_path):
+    if request.param == "memory":
+        store = InMemoryTripStore()
+    else:
+        store = SQLiteTripStore(str(tmp_path / "trips.db"), pool_size=2)
+    yield store
+    await store.close()
+
+
+async def test_duplicate_locations_are_skipped(store):
+    await store.create_trip(make_trip(), "alice")
+    await store.add_items("trip", [make_item(1), make_item(2)])
+    trip = await store.add_items("trip", [make_item(1, "item-1-again"), make_item(3)])
+    assert [item.id for item in trip.items] == ["item-1", "item-2", "item-3"]
+
+
+async def test_sqlite_schema_is_created_complete(tmp_path):
+    path = str(tmp_path / "trips.db")
+    await SQLiteTripStore(path, pool_size=1).close()
+    with sqlite3.connect(path) as conn:
+        trip_columns = {row[1] for row in conn.execute("PRAGMA table_info(trips)")}
+        item_columns = {row[1] for row in conn.execute("PRAGMA table_info(trip_items)")}
+        indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(trip_items)")}
+    assert "version" in trip_columns
+    assert "location_key" in item_columns
+    assert indexes["idx_trip_items_location"] == 1
+
+
+async def test_version_changes_only_when_items_do(store):
+    await store.create_trip(make_trip(), "alice")
+    assert await store.get_version("trip") == 0
+    await store.add_items("trip", [make_item(1)])
+    assert await store.get_version("trip") == 1
+    await store.add_items("trip", [make_item(1, "duplicate")])
+    await store.remove_items("trip", ["unknown"])
+    assert await store.get_version("trip") == 1
+    await store.remove_items("trip", ["item-1"])
+    assert await store.get_version("trip") == 2
+    assert await store.get_version("missing") is None
+
+
+async def test_trips_already_returned_do_not_change(store):
+    created = await store.create_trip(make_trip(), "alice")
+    first = await store.add_items("trip", [make_item(1), make_item(2)])
+    second = await store.add_items("trip", [make_item(3)])
+    third = await store.remove_items("trip", ["item-1"])
+
+    assert created.items == []
+    assert [item.id for item in first.items] == ["item-1", "item-2"]
+    assert [item.id for item in second.items] == ["item-1", "item-2", "item-3"]
+    assert [item.id for item in third.items] == ["item-2", "item-3"]
+    assert [item.id for item in (await store.get_trip("trip")).items] == ["item-2", "item-3"]
+
+
+async def test_trips_are_listed_per_owner_oldest_first(store):
+    await store.create_trip(make_trip("later", hour=2), "alice")
+    await store.create_trip(make_trip("earlier", hour=1), "alice")
+    await store.create_trip(make_trip("other", hour=0), "bob")
+
+    assert [trip.id for trip in await store.list_trips("alice")] == ["earlier", "later"]
+    assert [trip.id for trip in await store.list_trips("bob")] == ["other"]
+    assert await store.list_trips("nobody") == []
+    assert await store.get_owner("later") == "alice"
+    assert await store.get_owner("missing") is None
+
+
+async def test_items_keep_their_order_and_fields(store):
+    await store.create_trip(make_trip(), "alice")
+    await store.add_items("trip", [make_item(place) for place in range(5)])
+    await store.remove_items("trip", ["item-1", "item-3"])
+    trip = await store.add_item("trip", make_item(6))
+
+    assert [item.id for item in trip.items] == ["item-0", "item-2", "item-4", "item-6"]
+    stored = await store.get_trip("trip")
+    assert stored.items == trip.items
+    assert stored.items[1].location == make_item(2).location
+    assert stored.items[1].added_at == make_item(2).added_at
+
+
+async def test_removed_location_can_be_added_again(store):
+    await store.create_trip(make_trip(), "alice")
+    await store.add_item("trip", make_item(1))
+    await store.remove_item("trip", "item-1")
+    trip = await store.add_item("trip", make_item(1, "item-1-again"))
+    assert [item.id for item in trip.items] == ["item-1-again"]
+
+
+async def test_unknown_trip_is_an_error(store):
+    assert await store.get_trip("missing") is None
+    with pytest.raises(ValueError):
+        await store.add_items("missing", [make_item(1)])
+    with pytest.raises(ValueError):
+        await store.remove_items("missing", ["item-1"])
+
+
+async def test_all_locations_are_unique_across_trips(store):
+    await store.create_trip(make_trip("first"), "alice")
+    await store.create_trip(make_trip("second"), "bob")
+    await store.add_items("first", [make_item(1, "a-1"), make_item(2, "a-2")])
+    await store.add_items("second", [make_item(2, "b-2"), make_item(3, "b-3")])
+    assert sorted(location.name for location in await store.all_locations()) == ["Place 1", "Place 2", "Place 3"]
+
+
+async def test_sqlite_trips_are_shared_by_stores_on_one_file(tmp_path):
+    path = str(tmp_path / "trips.db")
+    first, second = SQLiteTripStore(path, pool_size=1), SQLiteTripStore(path, pool_size=1)
+    await first.create_trip(make_trip(), "alice")
+    await first.add_item("trip", make_item(1))
+    # A second worker sees the trip, and its duplicate check holds across both
+    trip = await second.add_items("trip", [make_item(1, "duplicate"), make_item(2)])
+    assert [item.id for item in trip.items] == ["item-1", "item-2"]
+    assert await first.get_version("trip") == 2
+    await first.close()
+    await second.close()